@@ -0,0 +1,328 @@
+import re
+import time
+import socket
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+
+import metrics
+from output_writer import OutputWriter
+from rate_limiter import RateLimiter, retry_after_seconds
+from url_utils import canonicalize_url
+
+# Defaults for the article stage
+ARTICLE_WORKERS = 16 # Concurrent page fetches across all hosts
+PER_HOST_LIMIT = 2 # Concurrent page fetches per host
+FETCH_TIMEOUT = (5, 15) # (connect, read) seconds
+MAX_RETRIES = 2 # For timeouts, connection resets, 429s and 5xx
+MAX_RETRY_WAIT = 10 # seconds; a longer Retry-After counts as unreachable
+MAX_PAGE_BYTES = 5 * 1024 * 1024 # Pages are cut off after this much HTML
+MIN_ARTICLE_CHARS = 200 # Less extracted text than this is treated as no article (paywall, JS-only page)
+
+# Outcomes recorded for each source URL
+OK = "ok" # Article extracted to markdown
+UNREADABLE = "unreadable" # Reachable, but no article text (PDF, paywall, blocked, ...); kept in sources
+DEAD = "dead" # Gone or never resolved; pruned from sources
+
+DEAD_STATUS_CODES = {404, 410}
+# Malformed URLs that can never be fetched
+INVALID_URL_ERRORS = (requests.exceptions.InvalidURL, requests.exceptions.MissingSchema,
+                      requests.exceptions.InvalidSchema)
+HOST_NOT_FOUND = "host not found" # reason of a DEAD result whose host name does not exist
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+BOILERPLATE_TAGS = ["script", "style", "noscript", "template", "svg", "iframe", "nav", "header", "footer",
+                    "aside", "form", "button", "figure"]
+BLOCK_TAGS = ["h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "blockquote", "pre"]
+CONTAINER_TAGS = {"li", "blockquote", "pre"} # Emitted whole; block tags inside them are not repeated
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def article_filename(url):
+    """File name of the markdown extracted from a source URL: its host plus a short hash of the URL."""
+    host = re.sub(r'[^a-z0-9.-]', '_', (urlsplit(url).hostname or "page").lower())
+    return f"article_{host}_{hashlib.sha256(url.encode('utf-8')).hexdigest()[:10]}.md"
+
+
+def _main_content(soup):
+    """The element holding the article: <article>, <main>, or else the parent of the most paragraph text."""
+    for name in ("article", "main"):
+        candidates = soup.find_all(name)
+        if candidates:
+            return max(candidates, key=lambda el: len(el.get_text(" ", strip=True)))
+    scores = {}
+    for p in soup.find_all("p"):
+        parent = p.parent
+        if parent is not None:
+            scores[id(parent)] = (scores.get(id(parent), (0, parent))[0] + len(p.get_text(" ", strip=True)), parent)
+    if not scores:
+        return soup.body or soup
+    return max(scores.values(), key=lambda entry: entry[0])[1]
+
+
+def html_to_markdown(html):
+    """
+    Extracts the main article from an HTML page as (title, markdown).
+    Boilerplate (navigation, headers, footers, scripts, forms) is dropped
+    and headings, paragraphs, list items, quotes and code blocks are kept.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    title = None
+    og_title = soup.find("meta", attrs={"property": "og:title"})
+    if og_title and og_title.get("content"):
+        title = og_title["content"].strip()
+    elif soup.title and soup.title.string:
+        title = soup.title.string.strip()
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+
+    root = _main_content(soup)
+    blocks = []
+    for el in root.find_all(BLOCK_TAGS):
+        if any(parent.name in CONTAINER_TAGS for parent in el.parents if parent is not root):
+            continue
+        if el.name == "pre":
+            code = el.get_text().strip('\n')
+            if code.strip():
+                blocks.append(f"```\n{code}\n```")
+            continue
+        text = WHITESPACE_RE.sub(" ", el.get_text(" ", strip=True)).strip()
+        if not text:
+            continue
+        if el.name[0] == "h":
+            blocks.append("#" * (int(el.name[1]) + 1) + " " + text) # "#" is the page title
+        elif el.name == "li":
+            blocks.append(f"- {text}")
+        elif el.name == "blockquote":
+            blocks.append(f"> {text}")
+        else:
+            blocks.append(text)
+    return title, "\n\n".join(blocks)
+
+
+def format_article_as_markdown(url, final_url, title, body):
+    markdown_content = f"# {title or final_url}\n\n"
+    markdown_content += f"## Original Source URL: {url}\n\n"
+    if final_url != url:
+        markdown_content += f"Redirected to: {final_url}\n\n"
+    markdown_content += body + "\n"
+    return markdown_content
+
+
+def _name_not_resolved(error):
+    """
+    True if error's cause chain (urllib3's NameResolutionError wraps it)
+    says the host name does not exist. Temporary lookup failures, such as
+    EAI_AGAIN while DNS is down, do not count.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, socket.gaierror):
+            return error.errno == socket.EAI_NONAME
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class ArticleFetcher:
+    """
+    Stage that fetches the issue's non-social sources while the tweets are
+    being scraped. submit() hands a URL to a thread pool sharing one
+    keep-alive connection pool, with a per-host concurrency limit and
+    per-host pacing; close() waits for all of them and returns one result
+    dict per submitted URL, in submission order:
+    {"url", "final_url", "status", "file", "reason"}.
+
+    Redirects are followed to the final URL. Only URLs that are invalid,
+    whose host name does not exist or that answer 404/410 are DEAD; if no
+    server answered at all (e.g. the machine is offline), missing hosts
+    are not trusted and stay UNREADABLE. HTML
+    pages with enough article text are written as markdown into output_dir
+    (OK); everything else, such as PDFs, paywalls or pages that keep
+    failing (refused connections, SSL errors, redirect loops, ...), is
+    UNREADABLE and stays in sources.
+
+    Given a RunBudget, URLs not fetched by the time the run budget expires
+    are left UNREADABLE (so they stay in sources) and recorded as skipped:
+    close() stops waiting then, and fetches still running are abandoned.
+    """
+    def __init__(self, output_dir, session=None, max_workers=ARTICLE_WORKERS, per_host_limit=PER_HOST_LIMIT,
+                 timeout=FETCH_TIMEOUT, max_retries=MAX_RETRIES, rate_limiter=None, budget=None):
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+        self.session = session
+        self.output = OutputWriter(output_dir)
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.budget = budget
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="article-fetch")
+        self._futures = [] # (url, future)
+        self._abandoned = threading.Event() # Set once close() has stopped waiting for the budget
+        self._answered = threading.Event() # Set once any server has answered, so name lookups work
+        self._host_limits = {}
+        self._host_limits_lock = threading.Lock()
+
+    def submit(self, url):
+        """Queues url for fetching. Never blocks on I/O."""
+        self._futures.append((url, self._executor.submit(self._fetch, url)))
+
+    def close(self):
+        """
+        Waits for every submitted URL, but not past the run budget, and
+        returns their results in submission order.
+        """
+        timeout = self.budget.remaining() if self.budget else None
+        _, not_done = wait([future for _, future in self._futures], timeout=timeout)
+        if not_done:
+            self._abandoned.set()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            self._executor.shutdown(wait=True)
+        results = []
+        for url, future in self._futures:
+            if future in not_done:
+                result = {"url": url, "final_url": url, "status": UNREADABLE, "file": None,
+                          "reason": "run budget spent"}
+                self.budget.skip(url, "articles", result["reason"])
+            else:
+                result = future.result()
+            results.append(result)
+        if not self._answered.is_set():
+            for result in results:
+                if result["reason"] == HOST_NOT_FOUND:
+                    result["status"] = UNREADABLE
+        for result in results:
+            metrics.incr(f"articles.{result['status']}")
+        return results
+
+    def cancel(self):
+        """Drops the URLs not started yet, e.g. when the build has failed."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _host_limit(self, host):
+        with self._host_limits_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_limits[host]
+
+    def _fetch(self, url):
+        result = {"url": url, "final_url": url, "status": UNREADABLE, "file": None, "reason": None}
+        try:
+            self._fetch_into(url, result)
+        except Exception as e:
+            result["reason"] = f"unexpected error: {e}"
+        return result
+
+    def _out_of_time(self, url, result, delay=0):
+        """True (and result marked as skipped) if the run budget leaves no time to fetch url after delay seconds."""
+        if not self.budget or self.budget.allows(delay=delay):
+            return False
+        result["reason"] = "run budget spent"
+        self.budget.skip(url, "articles", result["reason"])
+        return True
+
+    def _fetch_into(self, url, result):
+        try:
+            host = urlsplit(url).netloc
+        except ValueError:
+            result["status"], result["reason"] = DEAD, "invalid URL"
+            return
+        attempt = 0
+        while True:
+            if not self.rate_limiter.wait(url, self.budget):
+                self._out_of_time(url, result, float("inf"))
+                return
+            try:
+                with self._host_limit(host):
+                    # Waiting for the host's slot may have used up the budget
+                    if self._out_of_time(url, result):
+                        return
+                    timeout = self.budget.timeout(self.timeout) if self.budget else self.timeout
+                    with metrics.span("article.fetch"):
+                        response = self.session.get(url, timeout=timeout, stream=True, allow_redirects=True)
+                        try:
+                            content_type = response.headers.get("Content-Type", "").split(';')[0].strip().lower()
+                            chunks, size = [], 0
+                            if response.status_code == 200 and content_type in ("text/html", "application/xhtml+xml", ""):
+                                for chunk in response.iter_content(chunk_size=65536):
+                                    chunks.append(chunk)
+                                    size += len(chunk)
+                                    if size >= MAX_PAGE_BYTES or self._abandoned.is_set():
+                                        break
+                            body = b"".join(chunks)
+                        finally:
+                            response.close()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if isinstance(e, requests.exceptions.Timeout):
+                    self.rate_limiter.timed_out(url)
+                attempt += 1
+                if attempt <= self.max_retries:
+                    if self._out_of_time(url, result, attempt):
+                        return
+                    metrics.incr("articles.retries")
+                    time.sleep(attempt)
+                    continue
+                # Refused or reset connections, SSL and proxy errors may be temporary; a missing host is not
+                if _name_not_resolved(e):
+                    result["status"], result["reason"] = DEAD, HOST_NOT_FOUND
+                else:
+                    result["reason"] = type(e).__name__
+                return
+            except INVALID_URL_ERRORS as e:
+                result["status"], result["reason"] = DEAD, type(e).__name__
+                return
+            except requests.exceptions.RequestException as e:
+                # Too many redirects, ...
+                result["reason"] = type(e).__name__
+                return
+
+            self._answered.set()
+            result["final_url"] = canonicalize_url(response.url)
+            status = response.status_code
+            if status == 429 or status >= 500:
+                retry_after = retry_after_seconds(response.headers)
+                if status == 429:
+                    self.rate_limiter.throttled(url, retry_after)
+                attempt += 1
+                if attempt <= self.max_retries and (retry_after or 0) <= MAX_RETRY_WAIT:
+                    if self._out_of_time(url, result, retry_after if retry_after is not None else attempt):
+                        return
+                    metrics.incr("articles.retries")
+                    time.sleep(retry_after if retry_after is not None else attempt)
+                    continue
+            else:
+                self.rate_limiter.success(url)
+            break
+
+        if status in DEAD_STATUS_CODES:
+            result["status"], result["reason"] = DEAD, f"HTTP {status}"
+            return
+        if status != 200:
+            result["reason"] = f"HTTP {status}"
+            return
+        if not body:
+            result["reason"] = content_type or "empty response"
+            return
+        metrics.incr("articles.bytes", len(body))
+
+        with metrics.span("article.extract"):
+            title, markdown = html_to_markdown(body)
+        if len(markdown) < MIN_ARTICLE_CHARS:
+            result["reason"] = "no article text"
+            return
+        if self._abandoned.is_set():
+            return # The build has moved on without this page
+        name = article_filename(url)
+        self.output.write_text(name, format_article_as_markdown(url, result["final_url"], title, markdown))
+        result["status"], result["file"] = OK, name
@@ -0,0 +1,396 @@
+"""
+Local stand-in for news.smol.ai, X and the Discord API, used by the benchmark harness.
+
+Routes:
+    /issues                    archive page (recorded fixture or generated)
+    /issues/<slug>             issue page (recorded fixture or generated)
+    /tweet-result?id=<id>      embed JSON, as served by TWEET_API_BASE
+    /<user>/status/<id>        tweet page under a short thread, for the Selenium path
+    /media/<name>              synthetic JPEG bytes
+    /articles/<n>              news article page; every tenth is gone (404), some
+                               redirect (301) and some are PDFs
+    /api/channels/<id>/messages?after=&limit=
+                               Discord channel history (see DISCORD_API_BASE) with
+                               X-RateLimit-* headers and 429s beyond
+                               DISCORD_BUCKET_LIMIT requests per second per channel
+    /__stats                   JSON request counts per route
+
+With rate_limit set, /tweet-result and /media answer 429 (Retry-After: 1)
+beyond that many requests per second, like X does.
+
+Everything is deterministic and served from memory so runs are fully offline.
+Run it as a script (or via ServerProcess) to keep it off the benchmarked
+process's GIL.
+"""
+import os
+import json
+import time
+import random
+import threading
+import subprocess
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+OTHER_DOMAINS = [
+    "arxiv.org", "github.com", "huggingface.co", "openai.com", "anthropic.com",
+    "www.reddit.com", "news.ycombinator.com", "blog.google", "www.youtube.com", "docs.mistral.ai",
+]
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+
+def generate_issue_html(num_links, seed=0):
+    """
+    Builds a synthetic issue page with num_links anchors in roughly the mix
+    AI News uses: ~40% tweets (some linked twice, on twitter.com and x.com),
+    a few Discord links, a few relative links and the rest articles.
+    """
+    rng = random.Random(seed)
+    parts = ["<!DOCTYPE html><html><head><meta charset='utf-8'><title>Synthetic issue</title></head><body><article>"]
+    for i in range(num_links):
+        roll = rng.random()
+        if roll < 0.35:
+            url = f"https://x.com/user{i % 97}/status/{1800000000000000000 + i}"
+        elif roll < 0.40:
+            # Duplicate of an earlier tweet, spelled differently
+            j = rng.randrange(max(1, i))
+            url = f"https://twitter.com/user{j % 97}/status/{1800000000000000000 + j}?s=20"
+        elif roll < 0.45:
+            url = f"https://discord.com/channels/1000/{2000 + i % 7}/{3000000 + i}"
+        elif roll < 0.50:
+            url = f"/issues/related-{i}"
+        else:
+            url = f"https://{rng.choice(OTHER_DOMAINS)}/post/{i}?utm_source=ainews"
+        filler = " ".join(rng.choice(["model", "release", "benchmark", "agents", "tokens", "open", "weights"]) for _ in range(30))
+        parts.append(f"<p>{filler} <a href=\"{url}\">link {i}</a> {filler}</p>\n")
+    parts.append("</article></body></html>")
+    return "".join(parts).encode('utf-8')
+
+
+def article_response(name):
+    """(status, headers, body) for /articles/<name>; the outcome depends on name's number."""
+    number = int(name.split('-')[0]) if name.split('-')[0].isdigit() else 0
+    if number % 10 == 0:
+        return 404, {"Content-Type": "text/plain"}, b"not found"
+    if number % 10 == 1 and not name.endswith("-moved"):
+        return 301, {"Location": f"/articles/{number}-moved"}, b""
+    if number % 10 == 2:
+        return 200, {"Content-Type": "application/pdf"}, b"%PDF-1.4 synthetic"
+    rng = random.Random(number)
+    paragraphs = "".join(
+        "<p>" + " ".join(rng.choice(["model", "release", "benchmark", "agents", "tokens", "open", "weights", "eval"])
+                         for _ in range(60)) + ".</p>"
+        for _ in range(8)
+    )
+    body = (
+        f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Article {number}</title>"
+        f"<script>var tracking = true;</script></head><body>"
+        f"<nav><a href='/'>Home</a><a href='/about'>About</a></nav>"
+        f"<header><h1>Site name</h1></header>"
+        f"<article><h1>Synthetic article {number}</h1>{paragraphs}<ul><li>First point</li><li>Second point</li></ul></article>"
+        f"<footer>Subscribe to our newsletter</footer></body></html>"
+    )
+    return 200, {"Content-Type": "text/html; charset=utf-8"}, body.encode('utf-8')
+
+
+DISCORD_FIRST_MESSAGE = 3000000 # generate_issue_html links message 3000000 + i in channel 2000 + i % 7
+DISCORD_CHANNELS = 7
+DISCORD_MESSAGES = 100000 # Messages across all channels; later IDs do not exist
+DISCORD_BUCKET_LIMIT = 5 # Requests per second per channel before 429s
+
+
+def discord_message(base_url, message_id):
+    """
+    A synthetic Discord message: every eleventh one is deleted (None),
+    every fourth has an image attachment and every fifth replies to the
+    previous message of its channel.
+    """
+    if message_id % 11 == 0:
+        return None
+    message = {
+        "id": str(message_id),
+        "timestamp": "2025-01-01T00:00:00+00:00",
+        "author": {"id": "42", "username": f"member{message_id % 13}"},
+        "content": f"Synthetic message {message_id} about a new model release, thanks <@42>.",
+        "mentions": [{"id": "42", "username": "helper"}],
+        "attachments": [],
+        "embeds": [],
+    }
+    if message_id % 4 == 0:
+        message["attachments"].append({"url": f"{base_url}/media/discord_{message_id}.png", "content_type": "image/png"})
+    if message_id % 5 == 0:
+        message["referenced_message"] = {"author": {"username": "earlier"},
+                                         "content": f"Synthetic message {message_id - DISCORD_CHANNELS}."}
+    return message
+
+
+def discord_history(base_url, channel_id, after, limit):
+    """Up to limit messages of channel_id after the ID after, newest first like the API."""
+    offset = channel_id - 2000
+    if not 0 <= offset < DISCORD_CHANNELS:
+        return None
+    start = max(after + 1, DISCORD_FIRST_MESSAGE)
+    start += (offset - (start - DISCORD_FIRST_MESSAGE)) % DISCORD_CHANNELS # First ID of the channel from start
+    messages = []
+    message_id = start
+    while len(messages) < limit and message_id < DISCORD_FIRST_MESSAGE + DISCORD_MESSAGES:
+        message = discord_message(base_url, message_id)
+        if message:
+            messages.append(message)
+        message_id += DISCORD_CHANNELS
+    return messages[::-1]
+
+
+def tweet_json(base_url, tweet_id):
+    """Embed JSON for a synthetic tweet; tweet_id % 3 decides how many photos it has."""
+    media = [
+        {"type": "photo", "url": f"https://t.co/m{tweet_id}{n}",
+         "media_url_https": f"{base_url}/media/{tweet_id}_{n}.jpg"}
+        for n in range(int(tweet_id) % 3)
+    ]
+    return {
+        "__typename": "Tweet",
+        "id_str": tweet_id,
+        "text": f"Synthetic tweet {tweet_id} about a new model release. " + " ".join(m["url"] for m in media),
+        "entities": {"urls": []},
+        "mediaDetails": media,
+    }
+
+
+class FakeServer:
+    """
+    Threaded HTTP server on 127.0.0.1 with an optional per-request latency.
+    Use as a context manager; base_url is valid once it has started.
+    """
+    def __init__(self, archive_html=None, issue_html=None, latency=0.0, image_size=32 * 1024, port=0,
+                 rate_limit=None, thread_depth=2):
+        self.archive_html = archive_html if archive_html is not None else load_fixture("archive.html")
+        self.issue_html = issue_html if issue_html is not None else load_fixture("issue.html")
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.thread_depth = thread_depth
+        self._window = (0, 0) # (second, requests served in it)
+        self._discord_windows = {} # channel -> (second, requests served in it)
+        self.image_bytes = b"\xff\xd8\xff\xe0" + random.Random(1).randbytes(max(0, image_size - 6)) + b"\xff\xd9"
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-x-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def count(self, route):
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+
+    def over_limit(self):
+        """Counts a rate-limited request; True if it exceeds rate_limit for the current second."""
+        if not self.rate_limit:
+            return False
+        with self._lock:
+            second, served = self._window
+            now = int(time.monotonic())
+            served = served + 1 if now == second else 1
+            self._window = (now, served)
+            if served > self.rate_limit:
+                self.requests["429"] = self.requests.get("429", 0) + 1
+                return True
+            return False
+
+    def discord_bucket(self, channel):
+        """Counts a Discord request to channel; returns (remaining, reset_after), remaining -1 if over the limit."""
+        with self._lock:
+            now = time.monotonic()
+            second, served = self._discord_windows.get(channel, (0, 0))
+            served = served + 1 if int(now) == second else 1
+            self._discord_windows[channel] = (int(now), served)
+            reset_after = round(int(now) + 1 - now, 3)
+            if served > DISCORD_BUCKET_LIMIT:
+                self.requests["discord-429"] = self.requests.get("discord-429", 0) + 1
+                return -1, reset_after
+            return DISCORD_BUCKET_LIMIT - served, reset_after
+
+    def tweet_page(self, user, tweet_id):
+        """
+        A status page showing the tweet below the thread_depth earlier
+        statuses of the same generated user (IDs 97 apart, see
+        generate_issue_html), like X shows a reply under its thread.
+        """
+        thread = [int(tweet_id) - 97 * n for n in range(self.thread_depth, 0, -1)] + [int(tweet_id)]
+        articles = []
+        for status_id in thread:
+            if status_id <= 0:
+                continue
+            images = "".join(
+                f'<div data-testid="tweetPhoto"><img src="{m["media_url_https"]}"></div>'
+                for m in tweet_json(self.base_url, status_id)["mediaDetails"]
+            )
+            articles.append(
+                f'<article data-testid="tweet"><a href="/{user}/status/{status_id}"><time>now</time></a>'
+                f'<div data-testid="tweetText"><span>Synthetic tweet {status_id} about a new model release.</span></div>'
+                f'{images}</article>'
+            )
+        return f'<html><body>{"".join(articles)}</body></html>'.encode('utf-8')
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # keep-alive, like the real hosts
+            disable_nagle_algorithm = True # Headers and body go out as separate writes
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body=b"", content_type="text/html; charset=utf-8"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                parts = urlsplit(self.path)
+                segments = [s for s in parts.path.split('/') if s]
+                if (parts.path == "/tweet-result" or parts.path.startswith("/media/")) and server.over_limit():
+                    self.send_response(429)
+                    self.send_header("Retry-After", "1")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if parts.path.rstrip('/') == "/issues":
+                    server.count("archive")
+                    self._send(200, server.archive_html)
+                elif len(segments) == 2 and segments[0] == "issues":
+                    server.count("issue")
+                    self._send(200, server.issue_html)
+                elif parts.path == "/tweet-result":
+                    server.count("tweet-result")
+                    tweet_id = parse_qs(parts.query).get("id", ["0"])[0]
+                    self._send(200, json.dumps(tweet_json(server.base_url, tweet_id)).encode('utf-8'), "application/json")
+                elif len(segments) == 3 and segments[1] == "status":
+                    server.count("tweet-page")
+                    self._send(200, server.tweet_page(segments[0], segments[2]))
+                elif segments and segments[0] == "media":
+                    server.count("media")
+                    # Distinct bytes per image so content-addressed stores do not collapse them
+                    self._send(200, server.image_bytes + parts.path.encode('utf-8'), "image/jpeg")
+                elif len(segments) == 2 and segments[0] == "articles":
+                    server.count("article")
+                    status, headers, body = article_response(segments[1])
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                elif len(segments) == 4 and segments[:2] == ["api", "channels"] and segments[3] == "messages":
+                    server.count("discord")
+                    query = parse_qs(parts.query)
+                    remaining, reset_after = server.discord_bucket(segments[2])
+                    if remaining < 0:
+                        body = json.dumps({"message": "You are being rate limited.", "retry_after": reset_after,
+                                           "global": False}).encode('utf-8')
+                        status = 429
+                    else:
+                        messages = discord_history(server.base_url, int(segments[2]), int(query.get("after", ["0"])[0]),
+                                                   min(100, int(query.get("limit", ["50"])[0])))
+                        status = 200 if messages is not None else 404
+                        body = json.dumps(messages if messages is not None else {"message": "Unknown Channel"}).encode('utf-8')
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("X-RateLimit-Limit", str(DISCORD_BUCKET_LIMIT))
+                    self.send_header("X-RateLimit-Remaining", str(max(0, remaining)))
+                    self.send_header("X-RateLimit-Reset-After", str(reset_after))
+                    self.send_header("X-RateLimit-Bucket", f"channel-{segments[2]}")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                elif parts.path == "/__stats":
+                    with server._lock:
+                        stats = dict(server.requests)
+                    self._send(200, json.dumps(stats).encode('utf-8'), "application/json")
+                else:
+                    server.count("other")
+                    self._send(404, b"not found", "text/plain")
+
+        return Handler
+
+
+class ServerProcess:
+    """
+    Runs this module as a child process and exposes its base_url, so the
+    server's request handling does not compete with the code under test.
+    """
+    def __init__(self, scale=None, latency=0.0, rate_limit=None):
+        command = [sys.executable, os.path.abspath(__file__), "--port", "0", "--latency", str(latency)]
+        if scale:
+            command += ["--scale", str(scale)]
+        if rate_limit:
+            command += ["--rate-limit", str(rate_limit)]
+        self._command = command
+        self._process = None
+        self.base_url = None
+
+    def __enter__(self):
+        self._process = subprocess.Popen(self._command, stdout=subprocess.PIPE, text=True)
+        line = self._process.stdout.readline()
+        if not line.startswith("Serving on "):
+            self._process.kill()
+            raise RuntimeError(f"Fake server failed to start: {line!r}")
+        self.base_url = line.split()[2]
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._process.terminate()
+        self._process.wait()
+
+    def stats(self):
+        import requests
+        return requests.get(f"{self.base_url}/__stats", timeout=10).json()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve the benchmark fixtures and a fake X API locally.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on; 0 picks a free one.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of delay added to every request.")
+    parser.add_argument("--scale", type=int, help="Serve a generated issue with this many links instead of the fixture.")
+    parser.add_argument("--rate-limit", type=int, help="Answer 429 beyond this many tweet/image requests per second.")
+    args = parser.parse_args()
+
+    issue_html = generate_issue_html(args.scale) if args.scale else None
+    with FakeServer(issue_html=issue_html, latency=args.latency, port=args.port, rate_limit=args.rate_limit) as fake:
+        print(f"Serving on {fake.base_url} (AINEWS_BASE_URL={fake.base_url} TWEET_API_BASE={fake.base_url})", flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,35 @@
+"""
+Refreshes benchmarks/fixtures/ from the live site: saves the archive page as
+archive.html and the latest issue as issue.html. The committed fixtures are
+offline stand-ins with the same markup; re-record them to benchmark against
+the shape of a real issue.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+import scrape_newsletter
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def record(name, url):
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    path = os.path.join(FIXTURES_DIR, name)
+    with open(path, 'wb') as f:
+        f.write(response.content)
+    print(f"Recorded {url} -> {path} ({len(response.content)} bytes)")
+
+
+def main():
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    record("archive.html", scrape_newsletter.ARCHIVE_URL)
+    record("issue.html", scrape_newsletter.find_latest_newsletter_url())
+
+
+if __name__ == "__main__":
+    main()
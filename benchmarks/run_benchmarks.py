@@ -0,0 +1,209 @@
+"""
+Offline benchmark for the build pipeline.
+
+Serves the recorded archive/issue fixtures (or a generated issue in --scale
+mode) plus a fake X embed API, tweet pages, images, news articles and Discord
+channel history from a local server, points the pipeline at it, and times
+each stage:
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --scale 5000 --latency 0.02 --workers 8
+    python benchmarks/run_benchmarks.py --json bench.json
+
+Nothing leaves the machine, so numbers are comparable between commits.
+"""
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import statistics
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+import build_issue
+import discord_scraper
+import scrape_newsletter
+import tweet_scraper
+from image_downloader import ImageDownloader
+from article_fetcher import ArticleFetcher
+from fake_x_server import ServerProcess, tweet_json
+
+ARTICLE_PAGES = 100 # Fake article URLs fetched by the article_fetch stage
+
+
+def point_at(base_url):
+    """Redirects the pipeline's remote endpoints to the fake server."""
+    scrape_newsletter.NEWS_BASE_URL = base_url
+    scrape_newsletter.ARCHIVE_URL = f"{base_url}/issues"
+    tweet_scraper.TWEET_API_BASE = base_url
+    discord_scraper.DISCORD_API_BASE = f"{base_url}/api"
+    os.environ.setdefault(discord_scraper.DISCORD_TOKEN_ENV, "bench")
+
+
+def available_backends():
+    backends = ["html.parser"]
+    try:
+        import lxml # noqa: F401
+        backends.append("lxml")
+    except ImportError:
+        pass
+    return backends
+
+
+class Bench:
+    """Runs named stages repeat times and collects wall-clock timings."""
+    def __init__(self, repeat, verbose=False):
+        self.repeat = repeat
+        self.verbose = verbose
+        self.results = []
+
+    def run(self, name, fn, items=None, setup=None):
+        timings = []
+        value = None
+        for _ in range(self.repeat):
+            if setup:
+                setup()
+            sink = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+            with sink:
+                start = time.perf_counter()
+                value = fn()
+                timings.append(time.perf_counter() - start)
+        count = items(value) if callable(items) else items
+        median = statistics.median(timings)
+        result = {
+            "stage": name,
+            "median_s": median,
+            "min_s": min(timings),
+            "items": count,
+            "items_per_s": (count / median) if count and median else None,
+        }
+        self.results.append(result)
+        rate = f"{result['items_per_s']:>10.1f}/s" if result["items_per_s"] else " " * 12
+        print(f"{name:<28} {median * 1000:>10.1f} ms  (min {min(timings) * 1000:.1f} ms){'':2}{rate}"
+              f"{'' if count is None else f'  [{count} items]'}", flush=True)
+        return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline per-stage benchmark of the AI News build pipeline.")
+    parser.add_argument("--scale", type=int, help="Generate an issue with this many links instead of using the fixture.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of simulated network latency per request.")
+    parser.add_argument("--rate-limit", type=int, help="Have the fake server answer 429 above this many requests per second.")
+    parser.add_argument("--workers", type=int, default=4, help="Tweet scraper workers (default: 4).")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the median is reported (default: 3).")
+    parser.add_argument("--selenium", type=int, default=0, metavar="N",
+                        help="Also time scrape_tweet on N fake tweet pages (needs Chrome and ChromeDriver).")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this JSON file.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show the pipeline's own output.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix="ainews-bench-")
+    original_cwd = os.getcwd()
+    bench = Bench(args.repeat, args.verbose)
+
+    with ServerProcess(scale=args.scale, latency=args.latency, rate_limit=args.rate_limit) as fake:
+        point_at(fake.base_url)
+        print(f"Fake server at {fake.base_url}; {args.scale or 'fixture'} issue; "
+              f"latency {args.latency * 1000:.0f} ms; {args.workers} worker(s); median of {args.repeat}")
+        print("-" * 90)
+        try:
+            os.chdir(workdir)
+
+            issue_url = bench.run("archive_fetch", scrape_newsletter.find_latest_newsletter_url)
+
+            def parse_bs4():
+                soup = BeautifulSoup(scrape_newsletter.fetch_page(issue_url), 'html.parser')
+                return [a['href'] for a in soup.find_all('a', href=True) if a['href'].startswith(('http://', 'https://'))]
+            links = bench.run("issue_parse[bs4 tree]", parse_bs4, items=len)
+            for backend in available_backends():
+                streamed = bench.run(f"issue_parse[{backend}]",
+                                     lambda: list(scrape_newsletter.iter_newsletter_links(issue_url, backend=backend)),
+                                     items=len)
+                if streamed != links:
+                    print(f"  WARNING: {backend} returned a different link list than BeautifulSoup")
+
+            tweet_urls = bench.run("classify_dedupe",
+                                   lambda: list(build_issue.stream_and_classify_links(links, io.StringIO())),
+                                   items=len(links))
+
+            tweets_dir = os.path.join(workdir, "tweets")
+            bench.run("tweets[fast path]",
+                      lambda: tweet_scraper.main(tweet_urls, num_workers=args.workers, output_dir=tweets_dir, cache_dir=None),
+                      items=len(tweet_urls), setup=lambda: shutil.rmtree(tweets_dir, ignore_errors=True))
+
+            image_urls = [m["media_url_https"] for url in tweet_urls
+                          for m in tweet_json(fake.base_url, tweet_scraper.extract_tweet_id(url))["mediaDetails"]]
+
+            def download_images():
+                with ImageDownloader(session=tweet_scraper.get_http_session()) as downloader:
+                    downloader.submit({"url": "bench", "image_urls": image_urls}, "bench", tweets_dir, lambda data: None)
+            bench.run("image_download", download_images, items=len(image_urls))
+
+            articles_dir = os.path.join(workdir, "articles")
+            article_urls = [f"{fake.base_url}/articles/{n}" for n in range(ARTICLE_PAGES)]
+
+            def fetch_articles():
+                fetcher = ArticleFetcher(articles_dir)
+                for url in article_urls:
+                    fetcher.submit(url)
+                return fetcher.close()
+            bench.run("article_fetch", fetch_articles, items=len(article_urls),
+                      setup=lambda: shutil.rmtree(articles_dir, ignore_errors=True))
+
+            discord_dir = os.path.join(workdir, "discord")
+            discord_urls = [url for url in links if "discord.com/channels/" in url]
+            bench.run("discord_fetch", lambda: discord_scraper.main(discord_urls, output_dir=discord_dir),
+                      items=len(discord_urls), setup=lambda: shutil.rmtree(discord_dir, ignore_errors=True))
+
+            if args.selenium:
+                driver = tweet_scraper.setup_driver()
+                if driver is None:
+                    print("tweets[selenium]             skipped: ChromeDriver unavailable")
+                else:
+                    pages = [f"{fake.base_url}/bench/status/{tweet_scraper.extract_tweet_id(url)}"
+                             for url in tweet_urls[:args.selenium]]
+                    try:
+                        bench.run("tweets[selenium]",
+                                  lambda: [tweet_scraper.scrape_tweet(driver, page) for page in pages], items=len(pages))
+                    finally:
+                        driver.quit()
+
+            cache_dir = os.path.join(workdir, "cache")
+
+            def reset_build():
+                shutil.rmtree(cache_dir, ignore_errors=True)
+            bench.run("build[cold]", lambda: build_issue.main(num_workers=args.workers, cache_dir=cache_dir, force=True),
+                      items=len(links), setup=reset_build)
+            bench.run("build[warm tweet cache]",
+                      lambda: build_issue.main(num_workers=args.workers, cache_dir=cache_dir, force=True), items=len(links))
+            bench.run("build[unchanged issue]",
+                      lambda: build_issue.main(num_workers=args.workers, cache_dir=cache_dir), items=len(links))
+        finally:
+            os.chdir(original_cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        print("-" * 90)
+        print("Requests served: " + ", ".join(f"{route}={count}" for route, count in sorted(fake.stats().items())))
+
+    if args.json_path:
+        report = {
+            "config": {"scale": args.scale, "latency": args.latency, "rate_limit": args.rate_limit,
+                       "workers": args.workers, "repeat": args.repeat},
+            "stages": bench.results,
+        }
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,41 @@
 import os
+import time
 import datetime
-import subprocess
 import logging
-import shutil
-from urllib.parse import urlparse
+import argparse
+import json
+import io
+import contextlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import article_fetcher
+import discord_scraper
+import image_downloader
+import image_store
+import link_extractor
+from link_index import LinkIndex, default_index_path
+import metrics
+import build_journal
+from build_journal import BuildJournal
+import output_writer
+from output_writer import OutputWriter
+import scrape_newsletter
+from http_cache import HttpCache
+from run_budget import RunBudget
+import tweet_cache
+from url_utils import classify_url, canonicalize_url, dedup_key, tweet_id
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def run_scrape_newsletter():
-    """
-    Executes scrape_newsletter.py to generate ai_news_links.txt.
-    """
-    logging.info("Starting newsletter scraping...")
-    try:
-        result = subprocess.run(
-            ["python", "scrape_newsletter.py"],
-            check=True,
-            capture_output=True,
-            text=True
-        )
-        logging.info("scrape_newsletter.py executed successfully.")
-        logging.debug(f"scrape_newsletter.py stdout:\n{result.stdout}")
-        if result.stderr:
-            logging.warning(f"scrape_newsletter.py stderr:\n{result.stderr}")
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error running scrape_newsletter.py: {e}")
-        logging.error(f"Stdout: {e.stdout}")
-        logging.error(f"Stderr: {e.stderr}")
-        raise
-    except FileNotFoundError:
-        logging.error("Error: scrape_newsletter.py not found. Ensure it's in the current directory.")
-        raise
+METRICS_FILENAME = 'metrics.json' # Written into each issue folder
+SKIPPED_FILENAME = 'skipped.json' # Written into an issue folder whose build left links out
 
 def read_and_filter_urls(input_filepath='ai_news_links.txt'):
     """
-    Reads URLs from the input file, categorizes them, and returns
-    lists of non-Twitter/X/Discord links and Twitter/X links.
+    Reads URLs from the input file, canonicalizes, deduplicates and
+    categorizes them, and returns lists of non-Twitter/X/Discord links and
+    Twitter/X status links.
     """
     logging.info(f"Reading and filtering URLs from {input_filepath}...")
     all_urls = []
@@ -53,23 +52,95 @@ def read_and_filter_urls(input_filepath='ai_news_links.txt'):
         logging.error(f"Error reading URLs from {input_filepath}: {e}")
         raise
 
-    non_social_urls = []
-    twitter_x_urls = []
+    sources = io.StringIO()
+    twitter_x_urls = list(stream_and_classify_links(all_urls, sources))
+    non_social_urls = sources.getvalue().splitlines()
+    return non_social_urls, twitter_x_urls
+
+def stream_and_classify_links(links, sources_file, on_source=None, on_discord=None, link_filter=None,
+                              link_counts=None):
+    """
+    Generator stage between the newsletter parser and the tweet scraper.
+    Consumes links as they are parsed, canonicalizes them and drops
+    duplicates (a tweet linked several times, on twitter.com or x.com, is
+    only scraped once), writes each non-social link to the open
+    sources_file immediately (and passes it to on_source, if given) and
+    yields the Twitter/X status links. Discord links are kept out of the
+    sources file and handed to on_discord, if given. Links for which
+    link_filter(url) returns False (e.g. ones already imported with an
+    earlier issue) are dropped. Every occurrence of a link, duplicates
+    included, is counted in link_counts (keyed by dedup_key), if given.
+    """
+    non_social_count = 0
+    twitter_x_count = 0
+    discord_count = 0
+    duplicate_count = 0
+    filtered_count = 0
+    seen = set()
+    for raw_url in links:
+        url = canonicalize_url(raw_url)
+        key = dedup_key(url)
+        if link_counts is not None:
+            link_counts[key] = link_counts.get(key, 0) + 1
+        if key in seen:
+            duplicate_count += 1
+            continue
+        seen.add(key)
+        if link_filter and not link_filter(url):
+            filtered_count += 1
+            continue
 
-    for url in all_urls:
-        parsed_url = urlparse(url)
-        domain = parsed_url.netloc.lower()
-        if "twitter.com" in domain or "x.com" in domain:
-            twitter_x_urls.append(url)
-        elif "discord.com" in domain:
+        category = classify_url(url)
+        if category == "twitter":
+            if tweet_id(url) is None:
+                logging.info(f"Skipping non-status Twitter/X link: {url}")
+                continue
+            twitter_x_count += 1
+            yield url
+        elif category == "discord":
             # Discord links are explicitly excluded from sources.txt as per task
-            logging.info(f"Excluding Discord link from sources: {url}")
-            pass
+            discord_count += 1
+            if on_discord:
+                on_discord(url)
+            else:
+                logging.info(f"Excluding Discord link from sources: {url}")
         else:
-            non_social_urls.append(url)
-    
-    logging.info(f"Found {len(non_social_urls)} non-social links and {len(twitter_x_urls)} Twitter/X links.")
-    return non_social_urls, twitter_x_urls
+            sources_file.write(url + '\n')
+            sources_file.flush()
+            if on_source:
+                on_source(url)
+            non_social_count += 1
+    logging.info(f"Found {non_social_count} non-social links, {twitter_x_count} Twitter/X links and "
+                 f"{discord_count} Discord links ({duplicate_count} duplicates dropped"
+                 f"{f', {filtered_count} seen in earlier issues' if filtered_count else ''}).")
+    metrics.incr("links.sources", non_social_count)
+    metrics.incr("links.tweets", twitter_x_count)
+    metrics.incr("links.discord", discord_count)
+    metrics.incr("links.duplicates", duplicate_count)
+    metrics.incr("links.filtered", filtered_count)
+
+def write_resolved_sources(article_results, sources_file):
+    """
+    Writes the sources checked by the article stage to sources_file: the
+    final URL of each after redirects, deduplicated, without dead links.
+    """
+    seen = set()
+    dead = []
+    counts = {}
+    for result in article_results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+        if result["status"] == article_fetcher.DEAD:
+            dead.append(f"{result['url']} ({result['reason']})")
+            continue
+        key = dedup_key(result["final_url"])
+        if key in seen:
+            continue
+        seen.add(key)
+        sources_file.write(result["final_url"] + '\n')
+    logging.info(f"Fetched {len(article_results)} source(s): {counts.get(article_fetcher.OK, 0)} saved as articles, "
+                 f"{counts.get(article_fetcher.UNREADABLE, 0)} unreadable, {len(dead)} dead.")
+    if dead:
+        logging.warning("Dead links left out of sources:\n" + "\n".join(dead))
 
 def write_sources_file(urls, output_filepath):
     """
@@ -77,7 +148,7 @@ def write_sources_file(urls, output_filepath):
     """
     logging.info(f"Writing non-social URLs to {output_filepath}...")
     try:
-        with open(output_filepath, 'w', encoding='utf-8') as f:
+        with output_writer.atomic_open(output_filepath) as f:
             for url in urls:
                 f.write(url + '\n')
         logging.info(f"Successfully wrote {len(urls)} URLs to {output_filepath}.")
@@ -85,18 +156,34 @@ def write_sources_file(urls, output_filepath):
         logging.error(f"Error writing sources file {output_filepath}: {e}")
         raise
 
-def run_tweet_scraper(tweet_urls, output_dir="tweet_markdowns"):
+def run_tweet_scraper(tweet_urls, output_dir="tweet_markdowns", num_workers=1, fast_path=True,
+                      cache_dir=tweet_cache.DEFAULT_CACHE_DIR, journal=None, lean=True, image_variant=None,
+                      image_max_bytes=None, browser_pool=None, budget=None, link_counts=None):
     """
-    Executes tweet_scraper.py with the filtered Twitter/X URLs.
+    Executes tweet_scraper.py with the filtered Twitter/X URLs, using
+    num_workers concurrent browser instances. With fast_path, tweets are
+    fetched over plain HTTP first and Selenium is only used as a fallback.
+    Tweets found in the persistent cache at cache_dir are not re-scraped,
+    and progress is recorded in journal if one is given. With lean, the
+    browsers skip media, fonts and trackers. image_variant and
+    image_max_bytes control the size of downloaded images. Browsers are
+    taken from and returned to browser_pool, if given. budget (a RunBudget)
+    limits the time spent, and tweets linked more often in link_counts are
+    scraped first.
+    Returns the URLs that were never scraped because every worker stopped.
     """
-    logging.info(f"Starting tweet scraping for {len(tweet_urls)} Twitter/X URLs...")
+    logging.info(f"Starting tweet scraping with {num_workers} worker(s)...")
     try:
-        # Call tweet_scraper.py directly with the list of URLs
-        # tweet_scraper.py's main function accepts a list of URLs to scrape.
+        # Call tweet_scraper.py directly with the URLs
+        # tweet_scraper.py's main function accepts a list or a generator of URLs to scrape.
         import tweet_scraper
-        tweet_scraper.main(urls_to_scrape=tweet_urls)
+        unscraped = tweet_scraper.main(urls_to_scrape=tweet_urls, num_workers=num_workers, output_dir=output_dir,
+                           fast_path=fast_path, cache_dir=cache_dir, journal=journal, lean=lean,
+                           image_variant=image_variant, image_max_bytes=image_max_bytes,
+                           browser_pool=browser_pool, budget=budget, link_counts=link_counts)
         
         logging.info("tweet_scraper.py executed successfully.")
+        return unscraped
     except ImportError:
         logging.error("Error: tweet_scraper.py could not be imported. Ensure it's in the current directory and valid Python.")
         raise
@@ -108,13 +195,15 @@ def run_tweet_scraper(tweet_urls, output_dir="tweet_markdowns"):
         pass
 
 
-def create_output_folder():
+def create_output_folder(issue_name=None):
     """
-    Creates a new directory for today's AI News Issue.
+    Creates a new directory for an AI News Issue, named after issue_name
+    (e.g. the issue slug) or today's date if no name is given.
     Returns the path to the created folder.
     """
-    today_date = datetime.date.today().strftime("%Y-%m-%d")
-    output_folder_name = f"{today_date}_AI_News_Issue"
+    if issue_name is None:
+        issue_name = datetime.date.today().strftime("%Y-%m-%d")
+    output_folder_name = f"{issue_name}_AI_News_Issue"
     output_folder_path = os.path.join(os.getcwd(), output_folder_name)
 
     logging.info(f"Creating output folder: {output_folder_path}...")
@@ -126,82 +215,518 @@ def create_output_folder():
         logging.error(f"Error creating output folder {output_folder_path}: {e}")
         raise
 
-def move_files_to_output_folder(output_folder_path, sources_filepath, tweet_markdowns_dir="tweet_markdowns"):
+def load_build_state(state_filepath):
     """
-    Moves generated files (sources.txt, tweet markdowns, and images)
-    into the new output folder.
+    Returns the record of the last successful build, or an empty dict.
     """
-    logging.info(f"Moving generated files to {output_folder_path}...")
+    try:
+        with open(state_filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_build_state(state_filepath, issue_url, content_hash, output_folder_path):
+    """
+    Records a successful build so an unchanged issue can be skipped next time.
+    """
+    state = {
+        "issue_url": issue_url,
+        "content_hash": content_hash,
+        "output_folder": output_folder_path,
+        "built_at": datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+    tmp_filepath = state_filepath + '.tmp'
+    with open(tmp_filepath, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_filepath, state_filepath)
+
+def journal_path(state_dir, issue_url):
+    """Location of the progress journal of one issue's build."""
+    return os.path.join(state_dir, 'journals', f"{scrape_newsletter.issue_slug(issue_url)}.jsonl")
+
+def build_issue_folder(links, output_folder_path, sources_filename='sources.txt', num_workers=1,
+                       fast_path=True, cache_dir=tweet_cache.DEFAULT_CACHE_DIR, journal_filepath=None, resume=False,
+                       lean=True, image_variant=None, image_max_bytes=None, bundle=None, articles=False,
+                       browser_pool=None, link_index=None, issue_url=None, delta=False, budget=None):
+    """
+    Builds one issue from its links: streams them through classification
+    into the sources file and the tweet scraper, which write straight into
+    output_folder_path. Every file is written atomically. The sources file
+    is the main output, so it is written even if the tweet stage fails.
+
+    Each tweet's progress is appended to the journal at journal_filepath as
+    it happens. With resume, the journal of a crashed build is picked up
+    and tweets (and images) it already finished are not fetched again. The
+    journal is deleted once the build has completed, which is what marks
+    the folder as built (see is_built). Tweets left unscraped because every
+    worker stopped, or started but never finished, do not fail the build:
+    they are listed in SKIPPED_FILENAME and the journal and image index are
+    kept, and the bundle is not written, so a resumed build scrapes just
+    those and then finishes the folder.
+
+    With articles, every source URL is fetched while the tweets are being
+    scraped (see article_fetcher.ArticleFetcher): readable pages are saved
+    as article_*.md files, sources.txt lists the final URL after redirects
+    and dead links are left out of it.
+
+    Linked Discord messages are fetched once the tweets are done (see
+    discord_scraper.main; skipped unless DISCORD_TOKEN is set) and saved
+    as discord_*.md files.
+
+    With bundle ("markdown" or "zip", see output_writer.write_bundle) the
+    tweets are combined into one file, or one zip, with a manifest.
+
+    Every link is recorded under issue_url in link_index (a
+    link_index.LinkIndex), if given. With delta, links an earlier issue
+    already had are left out: sources.txt lists only new sources and only
+    new tweets and Discord messages are scraped.
+
+    budget (a run_budget.RunBudget) bounds the build's time: tweets are
+    scraped most linked first, then in issue order, and once the budget is
+    spent no new tweet, image, article or Discord message is started. The
+    build is then finished with what it has, and whatever it left out, for
+    lack of time or because it failed, is listed in SKIPPED_FILENAME.
+    """
+    budget = budget or RunBudget()
+    skipped_before = len(budget.skipped()) # The budget may be shared with earlier builds
+    journal = BuildJournal(journal_filepath, resume=resume) if journal_filepath else None
+    if journal and journal.resumed:
+        logging.info(f"Resuming from {journal_filepath}: {journal.counts()}")
+    elif resume:
+        logging.info("No journal to resume from; starting a fresh build.")
+
+    writer = OutputWriter(output_folder_path)
+    fetcher = article_fetcher.ArticleFetcher(output_folder_path, budget=budget) if articles else None
+    tweet_urls = []
+    discord_urls = []
+    article_results = []
+    discord_results = []
+    link_counts = {}
+
+    def recorded(urls):
+        for url in urls:
+            tweet_urls.append(url)
+            yield url
 
-    # Move sources.txt
+    link_filter = None
+    if link_index and issue_url:
+        issue = scrape_newsletter.issue_slug(issue_url)
+        published = scrape_newsletter.issue_date(issue_url) or datetime.date.today()
+        link_index.add_issue(issue, issue_url, published)
+
+        def link_filter(url):
+            return link_index.add(url, issue, published) or not delta
+
+    sources = io.StringIO() # Non-social links as they stream in, written to sources_filename at the end
+    classified = stream_and_classify_links(links, sources, fetcher.submit if fetcher else None,
+                                           discord_urls.append, link_filter, link_counts)
     try:
-        if os.path.exists(sources_filepath):
-            shutil.move(sources_filepath, os.path.join(output_folder_path, os.path.basename(sources_filepath)))
-            logging.info(f"Moved {sources_filepath} to {output_folder_path}")
+        try:
+            with metrics.span("build.scrape"):
+                left_over = run_tweet_scraper(recorded(classified), output_dir=output_folder_path,
+                                              num_workers=num_workers, fast_path=fast_path, cache_dir=cache_dir,
+                                              journal=journal, lean=lean, image_variant=image_variant,
+                                              image_max_bytes=image_max_bytes, browser_pool=browser_pool,
+                                              budget=budget, link_counts=link_counts)
+            unfinished = journal.urls(build_journal.PENDING) if journal else []
+            if unfinished:
+                logging.warning(f"{len(unfinished)} tweet(s) were started but never finished.")
+                for url in unfinished:
+                    journal.mark(url, build_journal.FAILED)
+                    budget.skip(url, "tweets", "started but never finished")
+            left_over = list(left_over or []) + unfinished
+            if discord_urls and budget.expired():
+                logging.warning(f"Run budget spent; not fetching {len(discord_urls)} Discord message(s).")
+                for url in discord_urls:
+                    budget.skip(url, "discord", "run budget spent")
+            elif discord_urls:
+                with metrics.span("build.discord"):
+                    discord_results = discord_scraper.main(discord_urls, output_dir=output_folder_path)
+            if fetcher:
+                with metrics.span("build.articles"):
+                    article_results = fetcher.close()
+        finally:
+            # Links the tweet stage never got to if it failed; the generator may
+            # also have failed itself or still be held by a stuck feeder thread
+            with contextlib.suppress(Exception):
+                for _ in classified:
+                    pass
+            with writer.open(sources_filename) as sources_file:
+                if article_results:
+                    write_resolved_sources(article_results, sources_file)
+                else:
+                    sources_file.write(sources.getvalue())
+            logging.info(f"Wrote non-social URLs to {writer.path(sources_filename)}.")
+        resumable = bool(left_over and journal)
+        if resumable:
+            # The resumed build needs the image index and the loose tweet files
+            logging.info("Keeping the image index and not bundling until the left-over tweets are scraped.")
         else:
-            logging.warning(f"sources.txt not found at {sources_filepath}. Skipping move.")
-    except Exception as e:
-        logging.error(f"Error moving {sources_filepath}: {e}")
+            # Only needed while the build can still be resumed
+            writer.remove(image_downloader.IMAGE_INDEX_FILENAME)
 
-    # Move tweet markdowns and images
-    try:
-        if os.path.exists(tweet_markdowns_dir) and os.path.isdir(tweet_markdowns_dir):
-            for item_name in os.listdir(tweet_markdowns_dir):
-                item_path = os.path.join(tweet_markdowns_dir, item_name)
-                if os.path.isfile(item_path):
-                    shutil.move(item_path, os.path.join(output_folder_path, item_name))
-                    logging.info(f"Moved {item_name} from {tweet_markdowns_dir} to {output_folder_path}")
-            # Clean up the original tweet_markdowns directory if it's empty
-            if not os.listdir(tweet_markdowns_dir):
-                os.rmdir(tweet_markdowns_dir)
-                logging.info(f"Cleaned up empty directory: {tweet_markdowns_dir}")
+            if bundle:
+                with metrics.span("build.bundle"):
+                    bundle_filepath = output_writer.write_bundle(output_folder_path, tweet_urls, bundle,
+                                                                 sources_filename, article_results, discord_results)
+                logging.info(f"Bundled {len(tweet_urls)} tweet(s) into {bundle_filepath}.")
             else:
-                logging.warning(f"Directory {tweet_markdowns_dir} is not empty after moving files. Remaining items: {os.listdir(tweet_markdowns_dir)}")
+                output_writer.remove_bundle(output_folder_path)
+        write_skipped_report(writer, budget.skipped()[skipped_before:], budget)
+    except BaseException:
+        if fetcher:
+            fetcher.cancel()
+        if journal:
+            journal.close()
+            logging.info(f"Progress saved to {journal_filepath}; run again with --resume to continue.")
+        raise
+    if journal:
+        counts = journal.counts()
+        if counts.get("failed"):
+            logging.warning(f"{counts['failed']} tweet(s) could not be scraped.")
+        if resumable:
+            journal.close()
+            logging.warning(f"{len(left_over)} tweet(s) were left unscraped; progress saved to {journal_filepath}, "
+                            "run again with --resume to scrape them.")
         else:
-            logging.warning(f"Tweet markdowns directory {tweet_markdowns_dir} not found or is not a directory. Skipping move.")
-    except Exception as e:
-        logging.error(f"Error moving files from {tweet_markdowns_dir}: {e}")
+            journal.discard()
 
-def main():
+def is_built(output_folder_path, journal_filepath, sources_filename='sources.txt'):
     """
-    Orchestrates the entire process of building the AI News Issue.
+    True if output_folder_path holds a completed build: its sources file is
+    there and the build's journal, which is only kept while the build is
+    unfinished, is gone.
+    """
+    return (os.path.exists(os.path.join(output_folder_path, sources_filename))
+            and not os.path.exists(journal_filepath))
+
+def write_skipped_report(writer, skipped, budget):
+    """
+    Writes SKIPPED_FILENAME, listing what a build left out and why, through
+    writer, or removes the one of an earlier build if nothing was skipped.
     """
-    sources_filepath = 'sources.txt'
-    ai_news_links_filepath = 'ai_news_links.txt'
+    if not skipped:
+        writer.remove(SKIPPED_FILENAME)
+        return
+    report = {
+        "created_at": datetime.datetime.now().isoformat(timespec='seconds'),
+        "budget_spent": budget.expired(),
+        "elapsed_s": round(time.monotonic() - budget.started, 3),
+        "skipped": skipped,
+    }
+    writer.write_text(SKIPPED_FILENAME, json.dumps(report, indent=2))
+    by_stage = {}
+    for entry in skipped:
+        by_stage[entry["stage"]] = by_stage.get(entry["stage"], 0) + 1
+    logging.warning(f"Left out {len(skipped)} link(s) ("
+                    + ", ".join(f"{count} {stage}" for stage, count in sorted(by_stage.items()))
+                    + f"); see {writer.path(SKIPPED_FILENAME)}.")
 
+def write_metrics(output_folder_path, filename=METRICS_FILENAME):
+    """
+    Writes the run's spans and counters to filename in output_folder_path
+    and logs a summary of where the time went.
+    """
+    metrics_filepath = os.path.join(output_folder_path, filename)
     try:
-        # Step 1: Run scrape_newsletter.py
-        run_scrape_newsletter()
+        data = metrics.write_json(metrics_filepath)
+    except OSError as e:
+        logging.error(f"Error writing metrics to {metrics_filepath}: {e}")
+        return
+    logging.info(f"Wrote metrics to {metrics_filepath}:\n" + "\n".join(metrics.summary_lines(data)))
+
+def select_issues(issue_urls, since=None, until=None, count=None):
+    """
+    Filters archive issue URLs (newest first) to those published between
+    since and until (inclusive dates), then keeps at most the newest count.
+    """
+    selected = []
+    for issue_url in issue_urls:
+        if since or until:
+            published = scrape_newsletter.issue_date(issue_url)
+            if published is None:
+                logging.warning(f"Skipping {issue_url}: no date in the issue slug.")
+                continue
+            if (since and published < since) or (until and published > until):
+                continue
+        selected.append(issue_url)
+    return selected[:count] if count else selected
+
+def backfill(since=None, until=None, count=None, max_parallel=4, num_workers=1, fast_path=True,
+             cache_dir=tweet_cache.DEFAULT_CACHE_DIR, force=False, parser_backend=link_extractor.DEFAULT_BACKEND,
+             resume=False, lean=True, image_variant=None, image_max_bytes=None, bundle=None, articles=False,
+             delta=False, budget_seconds=None, url_deadline=None):
+    """
+    Builds historical issues from the archive, each into its own folder
+    named after the issue slug. Issue pages are fetched and parsed
+    concurrently, max_parallel at a time, and each issue is built as soon
+    as its page has been parsed. Issues already built (see is_built) are
+    skipped unless force is set; with resume, issues whose build crashed
+    continue from their journal. Every issue's links go into
+    the link index; with delta, issues are built oldest first so each one
+    keeps only the links no earlier issue had.
+    budget_seconds bounds the whole backfill: once it is spent, the issue
+    being built is finished with what it has and no further issue is
+    started. url_deadline bounds each tweet (see main).
+    Returns the list of built folder paths.
+    """
+    budget = RunBudget(budget_seconds, url_deadline)
+    metrics.reset()
+    state_dir = cache_dir or tweet_cache.DEFAULT_CACHE_DIR
+    http_cache = HttpCache(os.path.join(state_dir, 'http'))
+    issue_urls = select_issues(scrape_newsletter.list_issue_urls(http_cache=http_cache), since, until, count)
+    logging.info(f"Backfill selected {len(issue_urls)} issue(s).")
+
+    pending = []
+    for issue_url in issue_urls:
+        slug = scrape_newsletter.issue_slug(issue_url)
+        output_folder_path = os.path.join(os.getcwd(), f"{slug}_AI_News_Issue")
+        if not force and is_built(output_folder_path, journal_path(state_dir, issue_url)):
+            logging.info(f"Skipping {issue_url}: already built.")
+            continue
+        pending.append(issue_url)
+
+    def fetch_and_parse(issue_url):
+        with metrics.span("backfill.fetch_parse"):
+            issue_page = http_cache.get(issue_url)
+            return list(scrape_newsletter.extract_links(issue_page.iter_content(), parser_backend, issue_page.encoding or 'utf-8'))
+
+    built, failed, not_started = [], [], []
+    link_index = LinkIndex(default_index_path(state_dir))
+    with link_index, ThreadPoolExecutor(max_workers=max(1, max_parallel), thread_name_prefix="backfill") as pool:
+        futures = {pool.submit(fetch_and_parse, issue_url): issue_url for issue_url in pending}
+        # The archive lists issues newest first; a delta is only meaningful against older issues
+        ordered = reversed(list(futures)) if delta else as_completed(futures)
+        for future in ordered:
+            issue_url = futures[future]
+            if budget.expired():
+                not_started.append(issue_url)
+                continue
+            try:
+                links = future.result()
+                logging.info(f"Building {issue_url} ({len(links)} links)...")
+                output_folder_path = create_output_folder(scrape_newsletter.issue_slug(issue_url))
+                build_issue_folder(links, output_folder_path, num_workers=num_workers,
+                                   fast_path=fast_path, cache_dir=cache_dir,
+                                   journal_filepath=journal_path(state_dir, issue_url), resume=resume, lean=lean,
+                                   image_variant=image_variant, image_max_bytes=image_max_bytes, bundle=bundle,
+                                   articles=articles, link_index=link_index, issue_url=issue_url, delta=delta,
+                                   budget=budget)
+                built.append(output_folder_path)
+            except Exception as e:
+                logging.error(f"Backfill of {issue_url} failed: {e}")
+                failed.append(issue_url)
+
+    logging.info(f"Backfill complete: {len(built)} built, {len(failed)} failed, "
+                 f"{len(not_started)} not started, {len(issue_urls) - len(pending)} already present.")
+    metrics.incr("backfill.built", len(built))
+    metrics.incr("backfill.failed", len(failed))
+    # Issues are built while others are still being fetched, so the
+    # metrics cover the whole run rather than any one issue folder
+    write_metrics(os.getcwd(), 'backfill_metrics.json')
+    if failed:
+        logging.warning("Failed issues:\n" + "\n".join(failed))
+    if not_started:
+        logging.warning(f"Run budget spent before {len(not_started)} issue(s) were started:\n"
+                        + "\n".join(not_started))
+    return built
+
+def main(num_workers=1, fast_path=True, cache_dir=tweet_cache.DEFAULT_CACHE_DIR, force=False,
+         parser_backend=link_extractor.DEFAULT_BACKEND, resume=False, lean=True, image_variant=None,
+         image_max_bytes=None, bundle=None, articles=False, issue_url=None, http_cache=None, browser_pool=None,
+         delta=False, budget_seconds=None, url_deadline=None):
+    """
+    Orchestrates the entire process of building the AI News Issue.
+    The newsletter is parsed in-process and its links stream straight
+    through classification into sources.txt and the tweet scraper, so
+    tweet scraping starts while the issue page is still being processed.
+    Args:
+        num_workers (int): Number of concurrent browsers used for tweet scraping.
+        fast_path (bool): Try the browser-free HTTP tweet endpoint before Selenium.
+        cache_dir (str, optional): Persistent tweet cache directory; None disables it.
+                                   The HTTP page cache and the last-build record
+                                   are kept there too (or in the default cache
+                                   directory when the tweet cache is disabled).
+        force (bool): Rebuild even if the latest issue is unchanged since the last build.
+        parser_backend (str): Streaming HTML parser used for link extraction.
+        resume (bool): Continue a crashed build of the same issue from its progress
+                       journal instead of scraping every tweet again.
+        lean (bool): Block media, fonts and trackers in the scraping browsers.
+        image_variant (str, optional): Size requested for X-hosted images (image_store.VARIANTS).
+        image_max_bytes (int, optional): Re-encode larger images to fit (requires Pillow).
+        bundle (str, optional): Combine the tweets into one "markdown" file or a "zip"
+                                with a manifest (output_writer.BUNDLE_MODES).
+        articles (bool): Fetch every source, save readable articles as markdown and
+                         drop dead links from sources.txt.
+        issue_url (str, optional): Build this issue, into a folder named after its slug,
+                                   instead of the latest one.
+        http_cache (HttpCache, optional): Page cache to reuse, e.g. kept open by the
+                                          watch daemon; by default one under cache_dir.
+        browser_pool (tweet_scraper.BrowserPool, optional): Warm browsers for the scrapers.
+        delta (bool): Only write sources and scrape tweets that no earlier issue linked,
+                      according to the link index kept next to the cache.
+        budget_seconds (float, optional): Time limit for the whole build. Once it is
+                                          nearly spent no new work is started and the
+                                          issue is finished with what it has, with the
+                                          rest listed in skipped.json.
+        url_deadline (float, optional): Seconds a tweet may take, retries included,
+                                        from its first attempt.
+    Returns the issue folder, or None if the build failed.
+    Everything is written straight into the issue folder; timings and
+    counters for every stage go to its metrics.json. A build that left
+    anything out (see skipped.json) is not recorded as the last build, so
+    an unchanged issue is still built again on the next run.
+    """
+    state_dir = cache_dir or tweet_cache.DEFAULT_CACHE_DIR
+    state_filepath = os.path.join(state_dir, 'last_build.json')
+    output_folder_path = None
+    budget = RunBudget(budget_seconds, url_deadline)
+    metrics.reset()
 
-        # Step 2: Read and Filter URLs
-        non_social_urls, twitter_x_urls = read_and_filter_urls(ai_news_links_filepath)
-        write_sources_file(non_social_urls, sources_filepath)
+    try:
+        # Step 1: Find the latest issue, revalidating cached pages with conditional GETs
+        logging.info("Starting newsletter scraping...")
+        http_cache = http_cache or HttpCache(os.path.join(state_dir, 'http'))
+        if issue_url:
+            latest_issue_url = issue_url
+        else:
+            with metrics.span("build.find_latest"):
+                latest_issue_url = scrape_newsletter.find_latest_newsletter_url(http_cache=http_cache)
+        with metrics.span("build.fetch_issue"):
+            issue_page = http_cache.get(latest_issue_url)
 
-        # Step 3: Create Output Folder
-        output_folder_path = create_output_folder()
+        last_build = load_build_state(state_filepath)
+        if (not force and last_build.get("issue_url") == latest_issue_url
+                and last_build.get("content_hash") == issue_page.content_hash):
+            logging.info(f"Latest issue {latest_issue_url} is unchanged since the build at "
+                         f"{last_build.get('built_at')}. Nothing to do.")
+            return last_build.get("output_folder")
 
-        # Step 4: Run tweet_scraper.py and move files
-        run_tweet_scraper(twitter_x_urls)
-        move_files_to_output_folder(output_folder_path, sources_filepath)
+        # Step 2: Create Output Folder
+        output_folder_path = create_output_folder(scrape_newsletter.issue_slug(issue_url) if issue_url else None)
 
-        # Clean up ai_news_links.txt
-        if os.path.exists(ai_news_links_filepath):
-            os.remove(ai_news_links_filepath)
-            logging.info(f"Cleaned up {ai_news_links_filepath}")
+        # Step 3: Stream newsletter links through classification into
+        # sources.txt and the tweet scraper, both writing into the folder
+        links = scrape_newsletter.extract_links(issue_page.iter_content(), parser_backend, issue_page.encoding or 'utf-8')
+        with LinkIndex(default_index_path(state_dir)) as link_index:
+            build_issue_folder(links, output_folder_path, num_workers=num_workers,
+                               fast_path=fast_path, cache_dir=cache_dir,
+                               journal_filepath=journal_path(state_dir, latest_issue_url), resume=resume, lean=lean,
+                               image_variant=image_variant, image_max_bytes=image_max_bytes, bundle=bundle,
+                               articles=articles, browser_pool=browser_pool, link_index=link_index,
+                               issue_url=latest_issue_url, delta=delta, budget=budget)
+        if budget.skipped():
+            # Not recorded as built, so the next run tries what was left out again
+            logging.warning("The build left links out; the issue will be built again on the next run.")
+        elif is_built(output_folder_path, journal_path(state_dir, latest_issue_url)):
+            save_build_state(state_filepath, latest_issue_url, issue_page.content_hash, output_folder_path)
 
         logging.info("AI News Issue build process completed successfully!")
+        return output_folder_path
 
     except Exception as e:
         logging.critical(f"AI News Issue build process failed: {e}")
-        # Attempt to clean up any intermediate files in case of failure
-        if os.path.exists(sources_filepath):
-            os.remove(sources_filepath)
-            logging.info(f"Cleaned up {sources_filepath} due to error.")
-        if os.path.exists(ai_news_links_filepath):
-            os.remove(ai_news_links_filepath)
-            logging.info(f"Cleaned up {ai_news_links_filepath} due to error.")
-        # Note: tweet_markdowns directory cleanup is handled by move_files_to_output_folder
-        # if it successfully moves files, or can be left for manual inspection if partial.
+        # Files are only ever written atomically, so there is nothing half-written
+        # to clean up; tweets already in the issue folder are kept for --resume.
+    finally:
+        if output_folder_path:
+            write_metrics(output_folder_path)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build a NotebookLM-ready folder for the latest AI News issue.")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="Number of concurrent headless browsers used to scrape tweets (default: 1).")
+    parser.add_argument("--no-fast-path", dest="fast_path", action="store_false",
+                        help="Always scrape tweets with Selenium instead of trying the HTTP endpoint first.")
+    parser.add_argument("--no-lean", dest="lean", action="store_false",
+                        help="Let the browsers load media, fonts and trackers instead of blocking them.")
+    parser.add_argument("--cache-dir", default=tweet_cache.DEFAULT_CACHE_DIR,
+                        help="Directory of the persistent tweet cache (default: %(default)s, or $AINEWS_CACHE_DIR).")
+    parser.add_argument("--no-cache", dest="cache_dir", action="store_const", const=None,
+                        help="Scrape every tweet from scratch without reading or updating the cache.")
+    parser.add_argument("-f", "--force", action="store_true",
+                        help="Rebuild even if the latest issue has not changed since the last successful build "
+                             "(with --backfill: rebuild issues whose folder already exists).")
+    parser.add_argument("--parser", dest="parser_backend", choices=link_extractor.BACKENDS,
+                        default=link_extractor.DEFAULT_BACKEND,
+                        help="Streaming HTML parser used to extract issue links (default: %(default)s).")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue a crashed build from its progress journal, skipping tweets and images "
+                             "that were already finished.")
+    parser.add_argument("--image-variant", choices=image_store.VARIANTS,
+                        help="Size to request for images hosted by X (default: the size in the scraped URL).")
+    parser.add_argument("--image-max-kb", type=int,
+                        help="Re-encode images larger than this many KiB to fit (requires Pillow).")
+    parser.add_argument("--articles", action="store_true",
+                        help="Fetch every source URL while tweets are scraped, save readable pages as article_*.md "
+                             "and leave dead links out of sources.txt.")
+    parser.add_argument("--bundle", choices=output_writer.BUNDLE_MODES,
+                        help="Combine the issue's tweets into one markdown file (markdown) or pack them, the "
+                             "sources and images into bundle.zip (zip), each with a manifest.json.")
+    parser.add_argument("--delta", action="store_true",
+                        help="Only write sources and scrape tweets that no earlier issue linked, according to "
+                             "the link index in the cache directory.")
+    parser.add_argument("--budget", dest="budget_seconds", type=float, metavar="SECONDS",
+                        help="Finish the build within this many seconds: stop starting new work shortly before, "
+                             "write what was scraped and list the rest in skipped.json.")
+    parser.add_argument("--url-deadline", type=float, metavar="SECONDS",
+                        help="Give up on a tweet this many seconds after its first attempt, retries included.")
+    parser.add_argument("--profile", choices=metrics.PROFILERS,
+                        help="Profile the run and write build_profile.pstats (cprofile, all threads) or "
+                             "build_profile.html (pyinstrument, main thread only) to the current directory.")
+    backfill_group = parser.add_argument_group("backfill", "Build historical issues into issue-named folders.")
+    backfill_group.add_argument("--backfill", action="store_true",
+                                help="Walk the archive and build every selected issue instead of only the latest.")
+    backfill_group.add_argument("--since", type=datetime.date.fromisoformat,
+                                help="Only issues published on or after this date (YYYY-MM-DD).")
+    backfill_group.add_argument("--until", type=datetime.date.fromisoformat,
+                                help="Only issues published on or before this date (YYYY-MM-DD).")
+    backfill_group.add_argument("--count", type=int,
+                                help="Only the newest COUNT selected issues.")
+    backfill_group.add_argument("--parallel", type=int, default=4,
+                                help="Issue pages fetched and parsed concurrently (default: 4).")
+    watch_group = parser.add_argument_group("watch", "Run as a daemon that builds each new issue as it appears.")
+    watch_group.add_argument("--watch", action="store_true",
+                             help="Poll the archive and build new issues, keeping browsers and sessions warm.")
+    watch_group.add_argument("--interval", type=float, default=60,
+                             help="Seconds between archive polls (default: %(default)s).")
+    watch_group.add_argument("--status-port", type=int, default=8765,
+                             help="Serve JSON status on http://127.0.0.1:PORT/status (default: %(default)s).")
+    watch_group.add_argument("--no-status", dest="status_port", action="store_const", const=None,
+                             help="Do not serve the status endpoint.")
+    watch_group.add_argument("--warm-browsers", type=int, default=1,
+                             help="Chrome instances started before the first build (default: %(default)s).")
+    watch_group.add_argument("--no-reload", dest="reload", action="store_false",
+                             help="Do not reload changed pipeline modules between builds.")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    image_max_bytes = args.image_max_kb * 1024 if args.image_max_kb else None
+    profile_filepath = "build_profile.pstats" if args.profile == "cprofile" else "build_profile.html"
+    with metrics.profiled(args.profile, profile_filepath):
+        if args.watch:
+            import issue_watcher
+            issue_watcher.IssueWatcher(interval=args.interval, status_port=args.status_port,
+                                       warm_browsers=args.warm_browsers, reload=args.reload,
+                                       cache_dir=args.cache_dir, num_workers=args.workers,
+                                       fast_path=args.fast_path, force=args.force,
+                                       parser_backend=args.parser_backend, resume=args.resume, lean=args.lean,
+                                       image_variant=args.image_variant, image_max_bytes=image_max_bytes,
+                                       bundle=args.bundle, articles=args.articles, delta=args.delta,
+                                       budget_seconds=args.budget_seconds, url_deadline=args.url_deadline).run()
+        elif args.backfill:
+            backfill(since=args.since, until=args.until, count=args.count, max_parallel=args.parallel,
+                     num_workers=args.workers, fast_path=args.fast_path, cache_dir=args.cache_dir, force=args.force,
+                     parser_backend=args.parser_backend, resume=args.resume, lean=args.lean,
+                     image_variant=args.image_variant, image_max_bytes=image_max_bytes, bundle=args.bundle,
+                     articles=args.articles, delta=args.delta, budget_seconds=args.budget_seconds,
+                     url_deadline=args.url_deadline)
+        else:
+            main(num_workers=args.workers, fast_path=args.fast_path, cache_dir=args.cache_dir, force=args.force,
+                 parser_backend=args.parser_backend, resume=args.resume, lean=args.lean,
+                 image_variant=args.image_variant, image_max_bytes=image_max_bytes, bundle=args.bundle,
+                 articles=args.articles, delta=args.delta, budget_seconds=args.budget_seconds,
+                 url_deadline=args.url_deadline)
+    if args.profile:
+        logging.info(f"Wrote {args.profile} profile to {profile_filepath}.")
\ No newline at end of file
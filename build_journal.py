@@ -0,0 +1,94 @@
+import os
+import json
+import time
+import threading
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+MAX_ATTEMPTS = 3 # Give up on a URL on resume after this many started attempts
+
+
+class BuildJournal:
+    """
+    Append-only progress log of one issue build, one JSON line per state
+    change of a tweet URL: {"url", "state", "attempts", "at"}. Every line
+    is flushed as soon as it is written, so after a crash the journal
+    shows exactly which tweets were finished.
+
+    With resume=True an existing journal is replayed (a line torn by the
+    crash is dropped) and appended to; otherwise it is started afresh.
+    Safe to share between scrape and download threads.
+    """
+    def __init__(self, path, resume=False):
+        self.path = path
+        self._entries = {} # url -> {"state": ..., "attempts": ...}
+        self._lock = threading.Lock()
+        self.resumed = resume and os.path.exists(path)
+        if self.resumed:
+            self._replay()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(path, 'a' if self.resumed else 'w', encoding='utf-8')
+
+    def _replay(self):
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        complete = data[:data.rfind(b'\n') + 1]
+        if len(complete) != len(data):
+            # The last write was cut short; drop it so new lines start cleanly
+            with open(self.path, 'r+b') as f:
+                f.truncate(len(complete))
+        for line in complete.decode('utf-8', errors='replace').splitlines():
+            try:
+                record = json.loads(line)
+                self._entries[record["url"]] = {"state": record["state"], "attempts": record.get("attempts", 0)}
+            except (ValueError, KeyError, TypeError):
+                continue
+
+    def state(self, url):
+        """Returns the last recorded state of url, or None if it was never seen."""
+        with self._lock:
+            entry = self._entries.get(url)
+            return entry["state"] if entry else None
+
+    def attempts(self, url):
+        """Returns how many times work on url has been started."""
+        with self._lock:
+            entry = self._entries.get(url)
+            return entry["attempts"] if entry else 0
+
+    def mark(self, url, state):
+        """Records a new state for url. Marking it PENDING counts as another attempt."""
+        with self._lock:
+            entry = self._entries.setdefault(url, {"state": state, "attempts": 0})
+            entry["state"] = state
+            if state == PENDING:
+                entry["attempts"] += 1
+            record = {"url": url, "state": state, "attempts": entry["attempts"], "at": round(time.time(), 3)}
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+
+    def urls(self, state):
+        """Returns the URLs whose last recorded state is state."""
+        with self._lock:
+            return [url for url, entry in self._entries.items() if entry["state"] == state]
+
+    def counts(self):
+        """Returns the number of URLs in each state."""
+        with self._lock:
+            counts = {}
+            for entry in self._entries.values():
+                counts[entry["state"]] = counts.get(entry["state"], 0) + 1
+            return counts
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def discard(self):
+        """Closes and deletes the journal once the build has completed."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,345 @@
+import os
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+import url_utils
+from image_downloader import ImageDownloader
+from output_writer import OutputWriter
+from rate_limiter import retry_after_seconds
+
+# The API is reached through DISCORD_API_BASE, so tests and benchmarks can
+# point it at a local stub; the bot token is read from DISCORD_TOKEN
+DISCORD_API_BASE = os.environ.get("DISCORD_API_BASE", "https://discord.com/api/v10")
+DISCORD_TOKEN_ENV = "DISCORD_TOKEN"
+USER_AGENT = "DiscordBot (https://github.com/ainews-source-extractor, 1.0)"
+
+# Defaults for the Discord stage
+HISTORY_WINDOW = 100 # Messages per channel-history request; the most the API returns
+CHANNEL_WORKERS = 4 # Channels fetched concurrently; each channel's windows are fetched in order
+REQUEST_TIMEOUT = (5, 15) # (connect, read) seconds
+MAX_RETRIES = 5 # For timeouts, connection resets, 429s and 5xx
+
+MENTION_RE = re.compile(r'<@!?(\d+)>')
+
+
+class DiscordError(Exception):
+    """Raised when the API refuses a request (missing access, unknown channel, ...) or keeps failing."""
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def discord_markdown_filename(channel_id, message_id):
+    """File name of one Discord message's markdown inside an issue folder."""
+    return f"discord_{channel_id}_{message_id}.md"
+
+
+class DiscordRateLimits:
+    """
+    Follows the rate-limit headers Discord sends with every response. A
+    route's X-RateLimit-Bucket groups it with the routes sharing its
+    limit; once X-RateLimit-Remaining reaches 0, wait() holds requests to
+    that bucket for X-RateLimit-Reset-After seconds. A 429 holds the
+    bucket, or every route if the limit was global, for its retry_after.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {} # route -> bucket ID, once the API has named it
+        self._resets = {} # bucket ID (or route) -> time.monotonic() at which requests may resume
+        self._global_reset = 0.0
+
+    def _key(self, route):
+        return self._buckets.get(route, route)
+
+    def delay(self, route):
+        """Seconds until a request to route may be sent."""
+        with self._lock:
+            ready_at = max(self._global_reset, self._resets.get(self._key(route), 0.0))
+        return max(0.0, ready_at - time.monotonic())
+
+    def wait(self, route):
+        delay = self.delay(route)
+        if delay > 0:
+            metrics.incr("discord.rate_limit_waits")
+            with metrics.span("discord.rate_limit_wait"):
+                time.sleep(delay)
+
+    def update(self, route, headers):
+        """Records the bucket state reported in a response's headers."""
+        try:
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset_after = float(headers["X-RateLimit-Reset-After"])
+        except (KeyError, TypeError, ValueError):
+            remaining = reset_after = None
+        with self._lock:
+            if headers.get("X-RateLimit-Bucket"):
+                self._buckets[route] = headers["X-RateLimit-Bucket"]
+            if remaining is not None and remaining <= 0:
+                self._resets[self._key(route)] = time.monotonic() + reset_after
+
+    def throttled(self, route, retry_after, is_global=False):
+        """Records a 429 that asked to wait retry_after seconds."""
+        until = time.monotonic() + retry_after
+        with self._lock:
+            if is_global:
+                self._global_reset = max(self._global_reset, until)
+            else:
+                key = self._key(route)
+                self._resets[key] = max(self._resets.get(key, 0.0), until)
+
+
+class DiscordClient:
+    """Minimal client for the channel-history endpoint of the Discord API."""
+    def __init__(self, token, api_base=None, session=None, limits=None, timeout=REQUEST_TIMEOUT,
+                 max_retries=MAX_RETRIES):
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=CHANNEL_WORKERS, pool_maxsize=CHANNEL_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        session.headers["User-Agent"] = USER_AGENT
+        # Bot tokens are the common case; a token already carrying its scheme is sent as is
+        session.headers["Authorization"] = token if token.startswith(("Bot ", "Bearer ")) else f"Bot {token}"
+        self.session = session
+        self.api_base = (api_base or DISCORD_API_BASE).rstrip('/')
+        self.limits = limits or DiscordRateLimits()
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    def channel_messages(self, channel_id, after, limit=HISTORY_WINDOW):
+        """Up to limit messages of channel_id with IDs greater than after, oldest first."""
+        route = f"/channels/{channel_id}/messages"
+        attempt = 0
+        while True:
+            self.limits.wait(route)
+            try:
+                with metrics.span("discord.request"):
+                    response = self.session.get(self.api_base + route, params={"after": after, "limit": limit},
+                                                timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise DiscordError(type(e).__name__) from e
+                metrics.incr("discord.retries")
+                time.sleep(attempt)
+                continue
+            metrics.incr("discord.requests")
+            self.limits.update(route, response.headers)
+
+            status = response.status_code
+            if status == 429 or status >= 500:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise DiscordError(f"HTTP {status} after {self.max_retries} retries", status)
+                metrics.incr("discord.retries")
+                if status == 429:
+                    try:
+                        body = response.json()
+                    except ValueError:
+                        body = {}
+                    retry_after = body.get("retry_after") or retry_after_seconds(response.headers) or 1.0
+                    is_global = bool(body.get("global")) or response.headers.get("X-RateLimit-Global") == "true"
+                    print(f"Discord rate limit on {route}{' (global)' if is_global else ''}; "
+                          f"waiting {float(retry_after):.2f} seconds.")
+                    metrics.incr("discord.throttled")
+                    self.limits.throttled(route, float(retry_after), is_global)
+                else:
+                    time.sleep(attempt)
+                continue
+            if status != 200:
+                raise DiscordError(f"HTTP {status}", status)
+            return sorted(response.json(), key=lambda message: int(message["id"]))
+
+
+def fetch_channel(client, channel_id, message_ids):
+    """
+    Resolves message_ids of one channel with as few history requests as
+    possible. Each request reads the window of up to HISTORY_WINDOW
+    messages starting at the oldest unresolved ID, which resolves every
+    wanted ID up to the newest message in it: present, or deleted if it is
+    not there. Links to the same stretch of a channel therefore share one
+    request. Returns {message_id: message dict, or None if deleted}.
+    """
+    wanted = sorted(set(message_ids), key=int)
+    found = {}
+    i = 0
+    while i < len(wanted):
+        start = wanted[i]
+        window = client.channel_messages(channel_id, after=int(start) - 1)
+        metrics.incr("discord.windows")
+        by_id = {message["id"]: message for message in window}
+        newest = int(window[-1]["id"]) if window else int(start)
+        while i < len(wanted) and int(wanted[i]) <= newest:
+            found[wanted[i]] = by_id.get(wanted[i])
+            i += 1
+        if len(window) < HISTORY_WINDOW:
+            # The window reached the end of the channel, so the IDs after it do not exist
+            for message_id in wanted[i:]:
+                found[message_id] = None
+            break
+    return found
+
+
+def _display_name(user):
+    user = user or {}
+    return user.get("global_name") or user.get("username") or "unknown"
+
+
+def _resolve_mentions(text, mentions):
+    """Replaces <@id> user mentions with @name for the users the message mentions."""
+    names = {user["id"]: _display_name(user) for user in mentions or [] if "id" in user}
+    return MENTION_RE.sub(lambda match: f"@{names[match.group(1)]}" if match.group(1) in names else match.group(0),
+                          text)
+
+
+def message_data_from_api(url, message):
+    """Turns a message object from the API into the dict format_message_as_markdown expects."""
+    image_urls, links = [], []
+    for attachment in message.get("attachments") or []:
+        if (attachment.get("content_type") or "").startswith("image/"):
+            image_urls.append(attachment["url"])
+        elif attachment.get("url"):
+            links.append(attachment["url"])
+    for embed in message.get("embeds") or []:
+        if embed.get("url") and embed["url"] not in links:
+            links.append(embed["url"])
+
+    reply_to = None
+    referenced = message.get("referenced_message")
+    if referenced:
+        reply_to = {
+            "author": _display_name(referenced.get("author")),
+            "text": _resolve_mentions(referenced.get("content") or "", referenced.get("mentions")),
+        }
+    return {
+        "url": url,
+        "author": _display_name(message.get("author")),
+        "timestamp": message.get("timestamp"),
+        "text": _resolve_mentions(message.get("content") or "", message.get("mentions")),
+        "reply_to": reply_to,
+        "links": links,
+        "image_urls": image_urls,
+        "images": [],
+    }
+
+
+def format_message_as_markdown(message_data):
+    markdown_content = f"## Original Discord Message URL: {message_data['url']}\n\n"
+    author = message_data['author']
+    if message_data.get('timestamp'):
+        author += f" ({message_data['timestamp']})"
+    markdown_content += f"### Author:\n{author}\n\n"
+    if message_data.get('reply_to'):
+        reply = message_data['reply_to']
+        quoted = "\n".join(f"> {line}" for line in (reply['text'] or "").splitlines()) or ">"
+        markdown_content += f"### In Reply To {reply['author']}:\n{quoted}\n\n"
+    markdown_content += f"### Message Text:\n{message_data['text']}\n\n"
+    if message_data.get('links'):
+        markdown_content += "### Links:\n"
+        for link in message_data['links']:
+            markdown_content += f"- {link}\n"
+        markdown_content += "\n"
+    if message_data['images']:
+        markdown_content += "### Attached Images:\n"
+        for img_path in message_data['images']:
+            markdown_content += f"- ![]({os.path.basename(img_path)})\n"
+        markdown_content += "\n"
+    markdown_content += "---\n\n" # Separator for messages
+    return markdown_content
+
+
+def main(message_urls=None, output_dir="discord_markdowns", token=None, api_base=None,
+         max_workers=CHANNEL_WORKERS, session=None):
+    """
+    Fetches the Discord messages linked in message_urls and writes each as
+    discord_<channel>_<message>.md, with its image attachments, into
+    output_dir. Links are grouped by channel; channels are fetched
+    concurrently, and the messages of one channel are read in batched
+    history windows (see fetch_channel) instead of one request each.
+
+    token defaults to the DISCORD_TOKEN environment variable and api_base
+    to DISCORD_API_BASE. Without a token nothing is fetched.
+
+    Returns one result dict per distinct message link, in input order:
+    {"url", "file", "reason"}, with file None if it could not be fetched.
+    """
+    if message_urls is None:
+        try:
+            with open('ai_news_links.txt', 'r') as f:
+                message_urls = [line.strip() for line in f if line.strip()]
+        except FileNotFoundError:
+            print("Error: The file ai_news_links.txt was not found.")
+            return []
+
+    results, channels = [], {}
+    for url in url_utils.dedupe_urls(message_urls):
+        ids = url_utils.discord_message(url)
+        if ids is None:
+            continue # Invites and channel links have no message to fetch
+        _, channel_id, message_id = ids
+        result = {"url": url, "file": None, "reason": None}
+        results.append(result)
+        channels.setdefault(channel_id, {}).setdefault(message_id, []).append(result)
+    if not results:
+        return results
+
+    token = token or os.environ.get(DISCORD_TOKEN_ENV)
+    if not token:
+        print(f"Skipping {len(results)} Discord message(s): set {DISCORD_TOKEN_ENV} to a bot token to fetch them.")
+        for result in results:
+            result["reason"] = "no token"
+        return results
+
+    client = DiscordClient(token, api_base, session=session)
+    writer = OutputWriter(output_dir)
+    print(f"Fetching {len(results)} Discord message(s) from {len(channels)} channel(s)...")
+
+    def on_complete(message_data):
+        name = discord_markdown_filename(message_data['channel_id'], message_data['message_id'])
+        with metrics.span("markdown.write"):
+            output_filename = writer.write_text(name, format_message_as_markdown(message_data))
+        for result in channels[message_data['channel_id']][message_data['message_id']]:
+            result["file"] = name
+        metrics.incr("discord.written")
+        print(f"Generated Markdown: {output_filename}")
+
+    with ImageDownloader() as downloader, \
+            ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(channels))),
+                               thread_name_prefix="discord-channel") as pool:
+        futures = {pool.submit(fetch_channel, client, channel_id, list(messages)): channel_id
+                   for channel_id, messages in channels.items()}
+        for future in as_completed(futures):
+            channel_id = futures[future]
+            try:
+                found = future.result()
+            except DiscordError as e:
+                print(f"Could not read Discord channel {channel_id}: {e}")
+                found = {}
+                reason = str(e)
+            else:
+                reason = "message not found"
+            for message_id, message_results in channels[channel_id].items():
+                message = found.get(message_id)
+                if message is None:
+                    metrics.incr("discord.missing")
+                    for result in message_results:
+                        result["reason"] = reason
+                    continue
+                message_data = message_data_from_api(message_results[0]["url"], message)
+                message_data.update(channel_id=channel_id, message_id=message_id)
+                downloader.submit(message_data, f"discord_{message_id}", output_dir, on_complete)
+
+    missing = [result for result in results if not result["file"]]
+    print(f"Discord extraction complete. Wrote {len(results) - len(missing)} markdown file(s).")
+    for result in missing:
+        print(f"  Skipped {result['url']}: {result['reason'] or 'not written'}")
+    return results
+
+if __name__ == "__main__":
+    main()
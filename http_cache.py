@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+import requests
+
+import metrics
+
+HTTP_TIMEOUT = 30 # seconds
+CHUNK_SIZE = 64 * 1024
+
+
+class CachedResponse:
+    """
+    Page fetched through HttpCache. The body stays on disk; read it
+    incrementally with iter_content() or all at once through .content.
+    """
+    def __init__(self, url, body_path, content_hash, not_modified, encoding=None):
+        self.url = url
+        self.body_path = body_path
+        self.content_hash = content_hash # hex SHA-256 of the body
+        self.not_modified = not_modified # True when the server answered 304
+        self.encoding = encoding # charset from the Content-Type header, if any
+
+    def iter_content(self, chunk_size=CHUNK_SIZE):
+        with open(self.body_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                yield chunk
+
+    @property
+    def content(self):
+        with open(self.body_path, 'rb') as f:
+            return f.read()
+
+
+def _atomic_write(path, chunks):
+    """Writes an iterable of byte chunks to path via a temp file and rename."""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class HttpCache:
+    """
+    On-disk HTTP cache for the archive and issue pages.
+
+    Each URL's last body is stored next to its ETag/Last-Modified validators.
+    Later fetches go out as conditional requests through one shared Session;
+    a 304 answer is served from disk without re-downloading the page.
+    """
+    def __init__(self, cache_dir, session=None, timeout=HTTP_TIMEOUT):
+        self.cache_dir = cache_dir
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json"), os.path.join(self.cache_dir, f"{key}.body")
+
+    def _load(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if os.path.exists(body_path) else None
+
+    def get(self, url):
+        """
+        Fetches url, revalidating any cached copy. The body is streamed
+        straight to disk, so it is never held in memory. Returns a
+        CachedResponse. Raises requests exceptions for failed requests and
+        bad status codes.
+        """
+        meta = self._load(url)
+        meta_path, body_path = self._paths(url)
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        with metrics.span("http.get"), \
+                self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+            if response.status_code == 304 and meta:
+                metrics.incr("http_cache.not_modified")
+                return CachedResponse(url, body_path, meta["content_hash"], True, meta.get("encoding"))
+            response.raise_for_status() # Raise an exception for bad status codes
+            metrics.incr("http_cache.fetched")
+
+            digest = hashlib.sha256()
+
+            def hashed_chunks():
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    digest.update(chunk)
+                    yield chunk
+
+            _atomic_write(body_path, hashed_chunks())
+            content_type = response.headers.get("Content-Type", "")
+            encoding = response.encoding if "charset=" in content_type.lower() else None
+
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_hash": digest.hexdigest(),
+            "encoding": encoding,
+            "fetched_at": time.time(),
+        }
+        _atomic_write(meta_path, [json.dumps(meta).encode('utf-8')])
+        return CachedResponse(url, body_path, meta["content_hash"], False, encoding)
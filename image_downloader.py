@@ -0,0 +1,338 @@
+import os
+import json
+import time
+import heapq
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+import image_store
+from rate_limiter import retry_after_seconds
+from tweet_cache import link_or_copy
+
+# Defaults for the download stage
+DOWNLOAD_WORKERS = 8 # Concurrent image downloads across all hosts
+PER_HOST_LIMIT = 4 # Concurrent image downloads per host
+DOWNLOAD_TIMEOUT = 15 # seconds
+MAX_RETRIES = 5
+INITIAL_WAIT_TIME = 5 # seconds
+
+# URL -> file name log kept next to the images while an issue is being
+# built, so a resumed build can find the content-addressed files again
+IMAGE_INDEX_FILENAME = ".image_index.jsonl"
+
+
+class _TweetJob:
+    """Book-keeping for the images of one tweet."""
+    def __init__(self, tweet_data, tweet_id, output_dir, on_complete):
+        self.tweet_data = tweet_data
+        self.tweet_id = tweet_id
+        self.output_dir = output_dir
+        self.on_complete = on_complete
+        self.results = [None] * len(tweet_data["image_urls"])
+        self.remaining = len(self.results)
+        self.lock = threading.Lock()
+
+
+class ImageDownloader:
+    """
+    Download stage that runs independently of the page scrapers.
+
+    Scrapers hand over a tweet_data dict with its "image_urls" via submit()
+    and move on immediately. Images are fetched on a thread pool sharing
+    one keep-alive connection pool, with a per-host concurrency limit.
+    Failed downloads are parked on a delayed retry queue instead of
+    sleeping in a worker. Once every image of a tweet has landed (or given
+    up), tweet_data["images"] is filled in, tweet_data["images_missing"]
+    counts the images that could not be downloaded, and
+    on_complete(tweet_data) is called so the markdown can be finalized.
+
+    Images are stored under their content hash (see image_store), so an
+    image quoted by several tweets is kept once. Each URL is fetched at
+    most once per output directory: concurrent requests for it wait on the
+    first download, and with a TweetCache as store, images seen in earlier
+    issues are linked from the cache without a request. variant picks the
+    size requested from X's image host and max_bytes shrinks larger images
+    with Pillow.
+
+    Given a RateLimiter, each request first takes a slot in its host's
+    token bucket; if none is open the download is parked on the retry
+    queue until one opens, so no thread sleeps on a rate limit. 429s
+    and timeouts slow the host's bucket down (honouring Retry-After).
+
+    With reuse_existing (used when resuming a crashed build) images already
+    listed in the output directory's IMAGE_INDEX_FILENAME are kept.
+
+    Given a RunBudget, no download starts or is retried after the run budget
+    has expired; the tweet is finalized without the image instead. Images
+    skipped that way, or given up on, are recorded as skipped in it.
+    """
+    def __init__(self, session=None, max_workers=DOWNLOAD_WORKERS, per_host_limit=PER_HOST_LIMIT,
+                 max_retries=MAX_RETRIES, initial_wait=INITIAL_WAIT_TIME, timeout=DOWNLOAD_TIMEOUT,
+                 reuse_existing=False, rate_limiter=None, variant=None, max_bytes=None, store=None, budget=None):
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self.per_host_limit = per_host_limit
+        self.max_retries = max_retries
+        self.initial_wait = initial_wait
+        self.timeout = timeout
+        self.reuse_existing = reuse_existing
+        self.rate_limiter = rate_limiter
+        self.variant = variant
+        self.max_bytes = max_bytes
+        self.store = store
+        self.budget = budget
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-download")
+        self._host_limits = {}
+        self._host_limits_lock = threading.Lock()
+
+        self._files_lock = threading.Lock()
+        self._files = {} # output_dir -> {url: file name}
+        self._waiters = {} # (output_dir, url) -> [(job, index)] while it is downloading
+
+        self._cond = threading.Condition()
+        self._retry_heap = [] # (ready_at, sequence, output_dir, url, attempt)
+        self._retry_sequence = 0
+        self._pending = 0 # Outstanding image downloads, including parked retries
+        self._closed = False
+        self._retry_thread = threading.Thread(target=self._retry_loop, name="image-download-retry", daemon=True)
+        self._retry_thread.start()
+
+    def submit(self, tweet_data, tweet_id, output_dir, on_complete):
+        """Queues all of tweet_data["image_urls"] for download. Never blocks on I/O."""
+        tweet_data["image_urls"] = [image_store.apply_variant(url, self.variant) for url in tweet_data["image_urls"]]
+        job = _TweetJob(tweet_data, tweet_id, output_dir, on_complete)
+        if not job.results:
+            self._complete(job)
+            return
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("ImageDownloader is closed")
+            self._pending += len(job.results)
+
+        for index, url in enumerate(tweet_data["image_urls"]):
+            known = self._known_file(output_dir, url)
+            if known:
+                self._finish(job, index, known)
+                continue
+            with self._files_lock:
+                waiters = self._waiters.get((output_dir, url))
+                first = waiters is None
+                if first:
+                    waiters = self._waiters[(output_dir, url)] = []
+                waiters.append((job, index))
+            if first:
+                self._executor.submit(self._download, output_dir, url, 0)
+            else:
+                metrics.incr("images.deduplicated")
+
+    def close(self):
+        """Waits until every queued image (including retries) is finished, then stops the stage."""
+        with self._cond:
+            while self._pending:
+                self._cond.wait()
+            self._closed = True
+            self._cond.notify_all()
+        self._retry_thread.join()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _host_limit(self, host):
+        with self._host_limits_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_limits[host]
+
+    def _index(self, output_dir):
+        """URL -> file name map of output_dir, read from its index file when resuming. Caller holds _files_lock."""
+        if output_dir not in self._files:
+            files = {}
+            if self.reuse_existing:
+                try:
+                    with open(os.path.join(output_dir, IMAGE_INDEX_FILENAME), 'r', encoding='utf-8') as f:
+                        for line in f:
+                            try:
+                                record = json.loads(line)
+                                files[record["url"]] = record["file"]
+                            except (ValueError, KeyError, TypeError):
+                                continue # Torn last line after a crash
+                except OSError:
+                    pass
+            self._files[output_dir] = files
+        return self._files[output_dir]
+
+    def _known_file(self, output_dir, url):
+        """Path of url's image if it is already in output_dir (or could be linked from the store), else None."""
+        with self._files_lock:
+            filename = self._index(output_dir).get(url)
+        if filename:
+            path = os.path.join(output_dir, filename)
+            if os.path.exists(path):
+                metrics.incr("images.reused")
+                return path
+        if self.store:
+            blob = self.store.image_for_url(url, self.max_bytes)
+            if blob:
+                sha256, ext = os.path.splitext(os.path.basename(blob))
+                path = os.path.join(output_dir, image_store.content_filename(sha256, ext))
+                os.makedirs(output_dir, exist_ok=True)
+                if not os.path.exists(path):
+                    link_or_copy(blob, path)
+                self._remember(output_dir, url, path)
+                metrics.incr("images.store_hits")
+                return path
+        return None
+
+    def _remember(self, output_dir, url, path):
+        filename = os.path.basename(path)
+        with self._files_lock:
+            index = self._index(output_dir)
+            if index.get(url) == filename:
+                return
+            index[url] = filename
+            with open(os.path.join(output_dir, IMAGE_INDEX_FILENAME), 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"url": url, "file": filename}) + '\n')
+
+    def _download(self, output_dir, url, attempt):
+        local_path = None
+        reason = None
+        max_delay = self.budget.remaining() if self.budget else None
+        delay = self.rate_limiter.acquire(url) if self.rate_limiter else 0
+        if max_delay is not None and delay >= max_delay:
+            print(f"Run budget spent; skipping image {url}.")
+            metrics.incr("images.skipped")
+            self._settle(output_dir, url, local_path, "run budget spent")
+            return
+        if delay > 0:
+            # Come back when the host has a slot open
+            self._schedule_retry(delay, output_dir, url, attempt)
+            return
+        try:
+            with self._host_limit(urlparse(url).netloc):
+                local_path = self._fetch(url, output_dir)
+            if self.rate_limiter:
+                self.rate_limiter.success(url)
+        except requests.exceptions.RequestException as e:
+            retry_after = None
+            if self.rate_limiter:
+                if isinstance(e, requests.exceptions.Timeout):
+                    self.rate_limiter.timed_out(url)
+                elif e.response is not None and e.response.status_code == 429:
+                    retry_after = retry_after_seconds(e.response.headers)
+                    self.rate_limiter.throttled(url, retry_after)
+            attempt += 1
+            if attempt < self.max_retries:
+                metrics.incr("images.retries")
+                if retry_after is not None:
+                    wait_time = retry_after # The host said when; its bucket paces the rest
+                else:
+                    wait_time = self.initial_wait * (2 ** (attempt - 1)) + random.uniform(0, 2)
+                if not self.budget or self.budget.allows(delay=wait_time):
+                    print(f"Error downloading image {url}: {e}. Retrying in {wait_time:.2f} seconds (Attempt {attempt}/{self.max_retries}).")
+                    self._schedule_retry(wait_time, output_dir, url, attempt)
+                    return
+                print(f"Error downloading image {url}: {e}. No time left to retry it. Skipping.")
+                reason = f"run budget spent while retrying ({type(e).__name__})"
+            else:
+                print(f"Max retries reached for image {url}. Skipping.")
+                reason = f"{type(e).__name__}; gave up after {attempt} attempts"
+            metrics.incr("images.failed")
+        except Exception as e:
+            print(f"Unexpected error downloading image {url}: {e}. Skipping.")
+            metrics.incr("images.failed")
+            reason = f"unexpected error: {e}"
+        self._settle(output_dir, url, local_path, reason)
+
+    def _settle(self, output_dir, url, local_path, reason=None):
+        """
+        Hands the outcome of url's download (None if it failed, and why in
+        reason) to every tweet waiting on it.
+        """
+        if local_path is None and self.budget:
+            self.budget.skip(url, "images", reason or "download failed")
+        with self._files_lock:
+            waiters = self._waiters.pop((output_dir, url), [])
+        for job, index in waiters:
+            self._finish(job, index, local_path)
+
+    def _fetch(self, url, output_dir):
+        with metrics.span("image.download"):
+            timeout = self.budget.timeout(self.timeout) if self.budget else self.timeout
+            response = self.session.get(url, stream=True, timeout=timeout)
+            response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
+            data = b"".join(response.iter_content(chunk_size=8192))
+        metrics.incr("images.downloaded")
+        metrics.incr("images.bytes", len(data))
+
+        ext = image_store.image_extension(url, response.headers.get("Content-Type"))
+        if self.max_bytes and len(data) > self.max_bytes:
+            with metrics.span("image.shrink"):
+                data, ext = image_store.shrink_to_budget(data, ext, self.max_bytes)
+        local_image_path, sha256 = image_store.store_bytes(data, ext, output_dir)
+        metrics.incr("images.stored_bytes", len(data))
+        self._remember(output_dir, url, local_image_path)
+        if self.store:
+            self.store.remember_image_url(url, self.max_bytes, sha256, ext)
+        print(f"Downloaded image: {local_image_path}")
+        return local_image_path
+
+    def _schedule_retry(self, delay, output_dir, url, attempt):
+        with self._cond:
+            self._retry_sequence += 1
+            heapq.heappush(self._retry_heap,
+                           (time.monotonic() + delay, self._retry_sequence, output_dir, url, attempt))
+            self._cond.notify_all()
+
+    def _retry_loop(self):
+        with self._cond:
+            while not self._closed:
+                if not self._retry_heap:
+                    self._cond.wait()
+                    continue
+                ready_at = self._retry_heap[0][0]
+                now = time.monotonic()
+                if ready_at > now:
+                    self._cond.wait(ready_at - now)
+                    continue
+                _, _, output_dir, url, attempt = heapq.heappop(self._retry_heap)
+                self._executor.submit(self._download, output_dir, url, attempt)
+
+    def _finish(self, job, index, local_path):
+        with job.lock:
+            job.results[index] = local_path
+            job.remaining -= 1
+            done = job.remaining == 0
+        try:
+            if done:
+                self._complete(job)
+        finally:
+            with self._cond:
+                self._pending -= 1
+                self._cond.notify_all()
+
+    def _complete(self, job):
+        images = []
+        for path in job.results:
+            if path and path not in images: # The same image attached twice is listed once
+                images.append(path)
+        job.tweet_data["images"] = images
+        job.tweet_data["images_missing"] = job.results.count(None)
+        try:
+            job.on_complete(job.tweet_data)
+        except Exception as e:
+            print(f"Error finalizing {job.tweet_data['url']}: {e}")
@@ -0,0 +1,115 @@
+import io
+import os
+import hashlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from output_writer import atomic_open
+
+# Sizes X serves for pbs.twimg.com/media images, smallest first
+VARIANTS = ("thumb", "small", "medium", "large", "orig")
+
+CONTENT_TYPE_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/jpg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+}
+HASH_PREFIX_LENGTH = 16 # Hex digits of the SHA-256 kept in file names
+
+# Transcoding steps tried, in order, until an image fits its byte budget
+JPEG_QUALITIES = (85, 75, 65, 50)
+MIN_DIMENSION = 320 # Never downscale the longer side below this
+
+
+def apply_variant(url, variant):
+    """
+    Rewrites a pbs.twimg.com/media URL to request the given size variant,
+    e.g. .../media/abc.jpg -> .../media/abc?format=jpg&name=small. Other
+    URLs, and variant=None, are returned unchanged.
+    """
+    parts = urlsplit(url)
+    if not variant or parts.hostname != "pbs.twimg.com" or not parts.path.startswith("/media/"):
+        return url
+    path, ext = os.path.splitext(parts.path)
+    query = dict(parse_qsl(parts.query))
+    if ext:
+        query.setdefault("format", ext.lstrip('.'))
+    query["name"] = variant
+    return urlunsplit((parts.scheme, parts.netloc, path, urlencode(query), ""))
+
+
+def image_extension(url, content_type=None):
+    """Picks a file extension from the Content-Type, the URL's format= parameter or its path."""
+    mime = (content_type or "").split(';')[0].strip().lower()
+    if mime in CONTENT_TYPE_EXTENSIONS:
+        return CONTENT_TYPE_EXTENSIONS[mime]
+    parts = urlsplit(url)
+    fmt = dict(parse_qsl(parts.query)).get("format")
+    if fmt:
+        return "." + ("jpg" if fmt == "jpeg" else fmt)
+    return os.path.splitext(parts.path)[1] or ".jpg"
+
+
+def content_filename(sha256, ext):
+    """File name of an image in an issue folder: a prefix of its content hash."""
+    return sha256[:HASH_PREFIX_LENGTH] + ext
+
+
+def shrink_to_budget(data, ext, max_bytes):
+    """
+    Re-encodes image bytes with Pillow until they fit in max_bytes: first
+    lower JPEG qualities, then halving the dimensions. Images with
+    transparency stay PNG and are only downscaled; animated GIFs are left
+    alone. Returns (data, ext), the original pair if it already fits or
+    cannot be made smaller.
+    """
+    if max_bytes is None or len(data) <= max_bytes:
+        return data, ext
+    try:
+        from PIL import Image
+    except ImportError as e:
+        raise ImportError("Shrinking images to a byte budget requires Pillow (pip install pillow).") from e
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        if getattr(image, "is_animated", False):
+            return data, ext
+        image.load()
+    except Exception:
+        return data, ext # Not an image Pillow understands; keep it as is
+
+    keep_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    image = image.convert("RGBA" if keep_alpha else "RGB")
+    best = (data, ext)
+    while True:
+        if keep_alpha:
+            candidates = [({"format": "PNG", "optimize": True}, ".png")]
+        else:
+            candidates = [({"format": "JPEG", "quality": q, "optimize": True, "progressive": True}, ".jpg")
+                          for q in JPEG_QUALITIES]
+        for options, new_ext in candidates:
+            buffer = io.BytesIO()
+            image.save(buffer, **options)
+            encoded = buffer.getvalue()
+            if len(encoded) < len(best[0]):
+                best = (encoded, new_ext)
+            if len(encoded) <= max_bytes:
+                return encoded, new_ext
+        if max(image.size) // 2 < MIN_DIMENSION:
+            return best
+        image = image.resize((max(1, image.width // 2), max(1, image.height // 2)), Image.LANCZOS)
+
+
+def store_bytes(data, ext, output_dir):
+    """
+    Writes image bytes to output_dir under their content-addressed name,
+    unless an identical image is already there. Returns (path, sha256).
+    """
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = os.path.join(output_dir, content_filename(sha256, ext))
+    if not os.path.exists(path):
+        os.makedirs(output_dir, exist_ok=True)
+        with atomic_open(path, 'wb') as f: # Concurrent writers of the same image write the same bytes
+            f.write(data)
+    return path, sha256
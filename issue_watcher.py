@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import datetime
+import importlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import build_issue
+import scrape_newsletter
+import tweet_cache
+import tweet_scraper
+from http_cache import HttpCache
+
+DEFAULT_INTERVAL = 60 # seconds between archive polls
+DEFAULT_STATUS_PORT = 8765 # Local status endpoint; None disables it
+DEFAULT_WARM_BROWSERS = 1 # Chrome instances started before the first build
+
+# Pipeline modules re-imported when their source changes, dependencies
+# first. State holders (metrics, caches, rate limiter) are never reloaded.
+RELOADABLE_MODULES = (
+    "url_utils", "run_budget", "link_extractor", "link_index", "output_writer", "image_store", "build_journal", "image_downloader",
+    "article_fetcher", "discord_scraper", "scrape_newsletter", "tweet_scraper", "build_issue",
+)
+# Process-wide objects carried over a reload, so warm connections and learned rates survive it
+PRESERVED_STATE = {"tweet_scraper": ("_http_session", "_rate_limiter")}
+
+
+class ModuleReloader:
+    """
+    Re-imports the pipeline modules when one of their source files has
+    changed, so the daemon picks up code changes without dropping its warm
+    browsers and sessions. All of RELOADABLE_MODULES are reloaded together,
+    in order, so names imported with `from x import y` never mix old and
+    new code. Changed files are compiled first; if one does not compile,
+    nothing is reloaded and the old code keeps running.
+    """
+    def __init__(self, names=RELOADABLE_MODULES):
+        self.names = names
+        self._mtimes = self._scan()
+
+    def _scan(self):
+        mtimes = {}
+        for name in self.names:
+            path = getattr(sys.modules.get(name), "__file__", None)
+            if path:
+                try:
+                    mtimes[name] = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+        return mtimes
+
+    def check(self):
+        """Reloads the modules if any source file changed. Returns True if new code is in place."""
+        mtimes = self._scan()
+        changed = [name for name in mtimes if mtimes[name] != self._mtimes.get(name)]
+        if not changed:
+            return False
+        self._mtimes = mtimes
+        for name in changed:
+            path = sys.modules[name].__file__
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    compile(f.read(), path, 'exec')
+            except (OSError, SyntaxError) as e:
+                logging.error(f"Not reloading the pipeline: {name} does not compile: {e}")
+                return False
+
+        preserved = {(name, attr): getattr(sys.modules[name], attr)
+                     for name, attrs in PRESERVED_STATE.items() if name in sys.modules for attr in attrs}
+        try:
+            for name in self.names:
+                if name in sys.modules:
+                    importlib.reload(sys.modules[name])
+        except Exception as e:
+            logging.error(f"Reloading the pipeline failed part way; restart the daemon: {e}")
+            return False
+        finally:
+            for (name, attr), value in preserved.items():
+                setattr(sys.modules[name], attr, value)
+        logging.info(f"Reloaded the pipeline after changes to {', '.join(changed)}.")
+        return True
+
+
+class IssueWatcher:
+    """
+    Long-running replacement for a cron job running build_issue.py. Polls
+    the newsletter archive every interval seconds through one HttpCache
+    (a conditional GET, so an unchanged archive costs a 304) and queues a
+    build the moment a new /issues/ link appears; on start-up the latest
+    issue is queued, which build_issue.main skips if it is already built.
+
+    Builds run one at a time on a builder thread with browsers from a
+    BrowserPool that stays warm between builds, and the process-wide HTTP
+    session and rate limiter carry over too. Before each build, changed
+    pipeline modules are reloaded (see ModuleReloader).
+
+    With a status_port, GET http://127.0.0.1:<port>/status returns JSON
+    with the queue depth, the build in progress and the last build's
+    duration and latency (from detecting the issue to its finished folder).
+    """
+    def __init__(self, interval=DEFAULT_INTERVAL, status_port=DEFAULT_STATUS_PORT,
+                 warm_browsers=DEFAULT_WARM_BROWSERS, reload=True, cache_dir=tweet_cache.DEFAULT_CACHE_DIR,
+                 **build_options):
+        self.interval = interval
+        self.status_port = status_port
+        self.warm_browsers = warm_browsers
+        self.cache_dir = cache_dir
+        self.build_options = build_options
+        state_dir = cache_dir or tweet_cache.DEFAULT_CACHE_DIR
+        self.http_cache = HttpCache(os.path.join(state_dir, 'http'))
+        self.browser_pool = tweet_scraper.BrowserPool(lean=build_options.get("lean", True))
+        self.reloader = ModuleReloader() if reload else None
+
+        self._queue = queue.Queue()
+        self._seen = None # Issue URLs on the archive page at the last poll
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._server = None
+        self._state = {
+            "started_at": datetime.datetime.now().isoformat(timespec='seconds'),
+            "polls": 0,
+            "last_poll_at": None,
+            "last_poll_error": None,
+            "building": None,
+            "builds": 0,
+            "failed_builds": 0,
+            "reloads": 0,
+            "last_build": None,
+        }
+
+    def status(self):
+        with self._lock:
+            state = json.loads(json.dumps(self._state))
+        state["queue_depth"] = self._queue.qsize()
+        state["warm_browsers"] = self.browser_pool.size()
+        state["interval_s"] = self.interval
+        return state
+
+    def poll(self):
+        """Reads the archive once and queues every issue not seen before, oldest first."""
+        issue_urls = scrape_newsletter.list_issue_urls(http_cache=self.http_cache)
+        if self._seen is None:
+            new = issue_urls[:1]
+        else:
+            new = [issue_url for issue_url in issue_urls if issue_url not in self._seen]
+        self._seen = set(issue_urls) | (self._seen or set())
+        for issue_url in reversed(new):
+            logging.info(f"Queueing build of {issue_url}.")
+            self._queue.put((issue_url, time.monotonic()))
+        return new
+
+    def _build(self, issue_url, detected_at):
+        with self._lock:
+            self._state["building"] = {"issue_url": issue_url,
+                                       "started_at": datetime.datetime.now().isoformat(timespec='seconds')}
+        if self.reloader and self.reloader.check():
+            with self._lock:
+                self._state["reloads"] += 1
+        started = time.monotonic()
+        try:
+            output_folder_path = build_issue.main(cache_dir=self.cache_dir, issue_url=issue_url,
+                                                  http_cache=self.http_cache, browser_pool=self.browser_pool,
+                                                  **self.build_options)
+        except Exception as e:
+            logging.error(f"Build of {issue_url} failed: {e}")
+            output_folder_path = None
+        finished = time.monotonic()
+        with self._lock:
+            self._state["building"] = None
+            self._state["builds" if output_folder_path else "failed_builds"] += 1
+            self._state["last_build"] = {
+                "issue_url": issue_url,
+                "output_folder": output_folder_path,
+                "ok": output_folder_path is not None,
+                "finished_at": datetime.datetime.now().isoformat(timespec='seconds'),
+                "build_s": round(finished - started, 3),
+                "latency_s": round(finished - detected_at, 3),
+            }
+        if output_folder_path:
+            logging.info(f"Built {issue_url} into {output_folder_path} "
+                         f"{finished - detected_at:.1f}s after it was detected.")
+
+    def _build_loop(self):
+        while not self._stop.is_set():
+            try:
+                issue_url, detected_at = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                self._build(issue_url, detected_at)
+            finally:
+                self._queue.task_done()
+
+    def _start_status_server(self):
+        watcher = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] not in ("/", "/status"):
+                    self.send_error(404)
+                    return
+                body = json.dumps(watcher.status(), indent=2).encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.status_port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="issue-watcher-status", daemon=True).start()
+        logging.info(f"Status at http://127.0.0.1:{self._server.server_address[1]}/status")
+
+    def run(self):
+        """Polls and builds until stop() is called or the process is interrupted."""
+        if self.status_port is not None:
+            self._start_status_server()
+        if self.warm_browsers:
+            logging.info(f"Warmed up {self.browser_pool.warm(self.warm_browsers)} browser(s).")
+        builder = threading.Thread(target=self._build_loop, name="issue-watcher-builder", daemon=True)
+        builder.start()
+        logging.info(f"Watching {scrape_newsletter.ARCHIVE_URL} every {self.interval}s.")
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.poll()
+                    error = None
+                except Exception as e:
+                    logging.error(f"Polling the archive failed: {e}")
+                    error = str(e)
+                with self._lock:
+                    self._state["polls"] += 1
+                    self._state["last_poll_at"] = datetime.datetime.now().isoformat(timespec='seconds')
+                    self._state["last_poll_error"] = error
+                self._stop.wait(self.interval)
+        except KeyboardInterrupt:
+            logging.info("Stopping the watcher...")
+        finally:
+            self.stop()
+            builder.join()
+            self.browser_pool.close()
+
+    def stop(self):
+        """Stops polling; a build in progress is finished first."""
+        self._stop.set()
+        with self._lock:
+            server, self._server = self._server, None
+        if server:
+            server.shutdown()
+            server.server_close()
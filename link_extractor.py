@@ -0,0 +1,83 @@
+import codecs
+from html.parser import HTMLParser
+
+DEFAULT_BACKEND = "html.parser"
+BACKENDS = ("html.parser", "lxml")
+
+
+class _AnchorCollector(HTMLParser):
+    """Event-based parser that only remembers the href of each <a> start tag."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'a':
+            return
+        href = None
+        for name, value in attrs:
+            if name == 'href':
+                href = value if value is not None else "" # Last duplicate wins, as in BeautifulSoup
+        if href is not None:
+            self.hrefs.append(href)
+
+    handle_startendtag = handle_starttag
+
+
+def _iter_html_parser(chunks, encoding):
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    parser = _AnchorCollector()
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        yield from parser.hrefs
+        parser.hrefs.clear()
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    yield from parser.hrefs
+
+
+def _iter_lxml(chunks, encoding):
+    try:
+        from lxml import etree
+    except ImportError as e:
+        raise ImportError("The 'lxml' parser backend requires lxml (pip install lxml).") from e
+
+    parser = etree.HTMLPullParser(events=("start", "end"), encoding=encoding)
+
+    def drain():
+        for event, element in parser.read_events():
+            if event == "start":
+                if element.tag == 'a' and element.get('href') is not None:
+                    yield element.get('href')
+            else:
+                # Drop finished subtrees so the tree never grows with the page
+                element.clear(keep_tail=False)
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+
+    for chunk in chunks:
+        parser.feed(chunk.encode(encoding) if isinstance(chunk, str) else chunk)
+        yield from drain()
+    parser.close()
+    yield from drain()
+
+
+def iter_hrefs(chunks, backend=DEFAULT_BACKEND, encoding='utf-8'):
+    """
+    Generator that yields the href of every <a> tag in an HTML document,
+    in document order, while the document is fed in incrementally.
+
+    chunks is an iterable of bytes (or str) pieces, e.g. response.iter_content().
+    Only the hrefs are kept, so memory stays flat however large the page is.
+    The default "html.parser" backend uses the same tokenizer as
+    BeautifulSoup(..., 'html.parser') and returns identical hrefs; "lxml" is
+    several times faster on large pages but needs lxml installed (it keeps
+    the first of duplicated href attributes, as browsers do).
+    """
+    if isinstance(chunks, (bytes, str)):
+        chunks = [chunks]
+    if backend == "html.parser":
+        return _iter_html_parser(chunks, encoding)
+    if backend == "lxml":
+        return _iter_lxml(chunks, encoding)
+    raise ValueError(f"Unknown parser backend {backend!r}; choose one of {', '.join(BACKENDS)}.")
@@ -0,0 +1,251 @@
+import os
+import math
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from urllib.parse import urlsplit
+
+import metrics
+from tweet_cache import DEFAULT_CACHE_DIR
+from url_utils import canonicalize_url, classify_url, dedup_key
+
+INDEX_FILENAME = "link_index.sqlite3" # Kept in the cache directory, next to the tweet cache
+BLOOM_CAPACITY = 1_000_000 # Keys the filter is sized for; it is rebuilt twice as large when exceeded
+BLOOM_ERROR_RATE = 0.01 # False-positive rate at capacity
+COMMIT_EVERY = 1000 # Links recorded between commits
+
+
+def reversed_domain(host):
+    """Host with its labels reversed and a trailing dot ("www.github.com" -> "com.github.www."), for suffix queries."""
+    labels = [label for label in (host or "").lower().rstrip('.').split('.') if label]
+    return '.'.join(reversed(labels)) + '.'
+
+
+class BloomFilter:
+    """
+    Bloom filter over strings. The num_hashes bit positions of a key come
+    from one BLAKE2b digest by double hashing. `key in bloom` is False for
+    every key never added, and True for a key that was not added with a
+    probability of about error_rate while count stays below capacity.
+    """
+    def __init__(self, capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR_RATE, bits=None, count=0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray(bits) if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class LinkIndex:
+    """
+    Persistent index of every link of every issue built, keyed by
+    url_utils.dedup_key, so a tweet counts as one link on twitter.com and
+    x.com. Each link records the issue (and date) that first linked it, and
+    every issue that linked it, in an SQLite database.
+
+    An in-memory BloomFilter over the keys answers "never seen before"
+    without touching the database, which covers most links of a new issue.
+    The filter is stored in the database when the index is closed, and it
+    is rebuilt from the keys if it is missing or out of date.
+
+    Safe to share between threads.
+    """
+    def __init__(self, path, error_rate=BLOOM_ERROR_RATE):
+        self.path = path
+        self.error_rate = error_rate
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS issues (
+                issue TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                issue_date TEXT NOT NULL,
+                indexed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS links (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                rdomain TEXT NOT NULL,
+                first_issue TEXT NOT NULL,
+                first_date TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS links_rdomain ON links (rdomain);
+            CREATE TABLE IF NOT EXISTS occurrences (
+                key TEXT NOT NULL,
+                issue TEXT NOT NULL,
+                PRIMARY KEY (key, issue)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS occurrences_issue ON occurrences (issue);
+            CREATE TABLE IF NOT EXISTS bloom (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                capacity INTEGER NOT NULL,
+                error_rate REAL NOT NULL,
+                key_count INTEGER NOT NULL,
+                bits BLOB NOT NULL
+            );
+        """)
+        self._conn.commit()
+        self._bloom_dirty = False
+        with metrics.span("link_index.load"):
+            self._bloom = self._load_bloom()
+
+    def _load_bloom(self):
+        key_count = self._conn.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+        row = self._conn.execute("SELECT capacity, error_rate, key_count, bits FROM bloom WHERE id = 0").fetchone()
+        if row and row[1] == self.error_rate and row[2] == key_count and key_count <= row[0]:
+            return BloomFilter(row[0], row[1], row[3], key_count)
+        return self._rebuild_bloom(max(BLOOM_CAPACITY, 2 * key_count))
+
+    def _rebuild_bloom(self, capacity):
+        bloom = BloomFilter(capacity, self.error_rate)
+        for (key,) in self._conn.execute("SELECT key FROM links"):
+            bloom.add(key)
+        metrics.incr("link_index.bloom_rebuilds")
+        self._bloom_dirty = True
+        return bloom
+
+    def close(self):
+        with self._lock:
+            if self._bloom_dirty:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO bloom (id, capacity, error_rate, key_count, bits) VALUES (0, ?, ?, ?, ?)",
+                    (self._bloom.capacity, self._bloom.error_rate, self._bloom.count, bytes(self._bloom.bits)))
+            self._conn.commit()
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add_issue(self, issue, url, issue_date):
+        """Registers an issue (its slug, URL and publication date) before its links are added."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO issues (issue, url, issue_date, indexed_at) VALUES (?, ?, ?, ?)",
+                (issue, url, issue_date.isoformat(), time.time()))
+            self._conn.commit()
+
+    def add(self, url, issue, issue_date):
+        """
+        Records that issue linked url. Returns True if no earlier issue
+        linked it: it was never seen, was first seen in this same issue
+        (e.g. a rebuild), or only in issues published after issue_date, in
+        which case this issue becomes its first.
+        """
+        key = dedup_key(url)
+        date = issue_date.isoformat()
+        with self._lock:
+            row = None
+            if key in self._bloom:
+                row = self._conn.execute("SELECT first_issue, first_date FROM links WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    metrics.incr("link_index.bloom_false_positives")
+            inserted = False
+            if row is None:
+                inserted = self._conn.execute(
+                    "INSERT OR IGNORE INTO links (key, url, kind, rdomain, first_issue, first_date) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, url, classify_url(url), reversed_domain(urlsplit(url).hostname), issue, date)).rowcount
+                if inserted:
+                    self._bloom.add(key)
+                    self._bloom_dirty = True
+                    if self._bloom.count > self._bloom.capacity:
+                        self._bloom = self._rebuild_bloom(2 * self._bloom.capacity)
+                else:
+                    # Added by another process since the filter was loaded
+                    row = self._conn.execute("SELECT first_issue, first_date FROM links WHERE key = ?",
+                                             (key,)).fetchone()
+            if inserted or row[0] == issue:
+                new = True
+            elif row[1] > date:
+                self._conn.execute("UPDATE links SET first_issue = ?, first_date = ? WHERE key = ?", (issue, date, key))
+                new = True
+            else:
+                new = False
+            self._conn.execute("INSERT OR IGNORE INTO occurrences (key, issue) VALUES (?, ?)", (key, issue))
+            self._pending += 1
+            if self._pending >= COMMIT_EVERY:
+                self._conn.commit()
+                self._pending = 0
+        metrics.incr("link_index.new" if new else "link_index.seen")
+        return new
+
+    def first_seen(self, url):
+        """(issue, date) of the first issue that linked url, or None."""
+        with self._lock:
+            return self._conn.execute("SELECT first_issue, first_date FROM links WHERE key = ?",
+                                      (dedup_key(canonicalize_url(url)),)).fetchone()
+
+    def issues_linking_domain(self, domain):
+        """
+        Issues that linked domain or any of its subdomains, newest first, as
+        (issue, issue_date, url, link_count) tuples. Runs off the reversed
+        domain index, so its cost depends on the matching links only.
+        """
+        low = reversed_domain(domain)
+        high = low[:-1] + '/' # '/' sorts right after '.', so this bounds the prefix range
+        with self._lock:
+            return self._conn.execute("""
+                SELECT o.issue, i.issue_date, i.url, COUNT(*)
+                FROM links l
+                JOIN occurrences o ON o.key = l.key
+                JOIN issues i ON i.issue = o.issue
+                WHERE l.rdomain >= ? AND l.rdomain < ?
+                GROUP BY o.issue
+                ORDER BY i.issue_date DESC, o.issue DESC
+            """, (low, high)).fetchall()
+
+    def stats(self):
+        with self._lock:
+            issues = self._conn.execute("SELECT COUNT(*) FROM issues").fetchone()[0]
+            kinds = dict(self._conn.execute("SELECT kind, COUNT(*) FROM links GROUP BY kind").fetchall())
+            occurrences = self._conn.execute("SELECT COUNT(*) FROM occurrences").fetchone()[0]
+        return {"issues": issues, "links": sum(kinds.values()), "by_kind": kinds, "occurrences": occurrences}
+
+
+def default_index_path(cache_dir=None):
+    return os.path.join(cache_dir or DEFAULT_CACHE_DIR, INDEX_FILENAME)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the cross-issue link index.")
+    parser.add_argument("--index", default=default_index_path(),
+                        help="Index database (default: %(default)s).")
+    parser.add_argument("--domain", help="List the issues that linked this domain or its subdomains.")
+    parser.add_argument("--url", help="Show the first issue that linked this URL.")
+    args = parser.parse_args()
+
+    with LinkIndex(args.index) as index:
+        if args.domain:
+            for issue, issue_date, issue_url, count in index.issues_linking_domain(args.domain):
+                print(f"{issue_date}  {count:>4} link(s)  {issue_url}")
+        elif args.url:
+            first = index.first_seen(args.url)
+            print(f"First linked by {first[0]} ({first[1]})" if first else "Never linked.")
+        else:
+            stats = index.stats()
+            print(f"{stats['links']} link(s) from {stats['issues']} issue(s), {stats['occurrences']} occurrence(s): "
+                  + ", ".join(f"{kind}={count}" for kind, count in sorted(stats['by_kind'].items())))
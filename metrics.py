@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import time
+import datetime
+import threading
+import contextlib
+
+# Process-wide registry shared by every stage. Spans aggregate per name
+# (count, total and max seconds) instead of keeping one record per call, so
+# instrumenting a hot path costs a lock and a few additions.
+_lock = threading.Lock()
+_spans = {} # name -> [count, total_s, max_s]
+_counters = {} # name -> int
+_started_at = datetime.datetime.now()
+_started = time.perf_counter()
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+
+def reset():
+    """Clears all spans and counters and restarts the wall clock."""
+    global _started_at, _started
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _started_at = datetime.datetime.now()
+        _started = time.perf_counter()
+
+
+def incr(name, amount=1):
+    """Adds amount to the counter called name."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def record(name, seconds):
+    """Adds one timed occurrence of the span called name."""
+    with _lock:
+        entry = _spans.get(name)
+        if entry is None:
+            _spans[name] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+
+
+@contextlib.contextmanager
+def span(name):
+    """Times the enclosed block and records it under name, even if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def snapshot():
+    """Returns the current spans and counters as a JSON-serializable dict."""
+    with _lock:
+        spans = {
+            name: {
+                "count": count,
+                "total_s": round(total, 6),
+                "mean_s": round(total / count, 6),
+                "max_s": round(longest, 6),
+            }
+            for name, (count, total, longest) in sorted(_spans.items())
+        }
+        counters = dict(sorted(_counters.items()))
+        started_at = _started_at
+        wall_time = time.perf_counter() - _started
+    return {
+        "started_at": started_at.isoformat(timespec='seconds'),
+        "wall_time_s": round(wall_time, 3),
+        "spans": spans,
+        "counters": counters,
+    }
+
+
+def write_json(path):
+    """Writes snapshot() to path atomically and returns the snapshot."""
+    data = snapshot()
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+    return data
+
+
+def summary_lines(data=None, limit=12):
+    """Human-readable summary of the slowest spans (by total time) and all counters."""
+    data = data or snapshot()
+    lines = [f"Wall time {data['wall_time_s']:.1f}s"]
+    slowest = sorted(data["spans"].items(), key=lambda item: item[1]["total_s"], reverse=True)[:limit]
+    for name, s in slowest:
+        lines.append(f"  {name:<28} {s['total_s']:>9.2f}s total  {s['count']:>6}x  "
+                     f"mean {s['mean_s'] * 1000:.1f}ms  max {s['max_s'] * 1000:.1f}ms")
+    if data["counters"]:
+        lines.append("  " + ", ".join(f"{name}={value}" for name, value in data["counters"].items()))
+    return lines
+
+
+@contextlib.contextmanager
+def _cprofile(output_path):
+    import cProfile
+    import pstats
+
+    profiles = [cProfile.Profile()]
+    profiles_lock = threading.Lock()
+
+    if sys.version_info < (3, 12):
+        # Before 3.12 a profiler only sees the thread that enabled it, so give every
+        # thread started during the run (scrape workers, downloads) its own one.
+        def start_thread_profile(frame, event, arg):
+            sys.setprofile(None)
+            profile = cProfile.Profile()
+            with profiles_lock:
+                profiles.append(profile)
+            profile.enable()
+        threading.setprofile(start_thread_profile)
+
+    profiles[0].enable()
+    try:
+        yield
+    finally:
+        profiles[0].disable()
+        if sys.version_info < (3, 12):
+            threading.setprofile(None)
+        with profiles_lock:
+            stats = pstats.Stats(*profiles)
+        stats.dump_stats(output_path)
+
+
+@contextlib.contextmanager
+def _pyinstrument(output_path):
+    try:
+        from pyinstrument import Profiler
+    except ImportError as e:
+        raise ImportError("The 'pyinstrument' profiler requires pyinstrument (pip install pyinstrument).") from e
+
+    profiler = Profiler()
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(profiler.output_html())
+
+
+def profiled(profiler, output_path):
+    """
+    Context manager that profiles the enclosed block and writes the result
+    to output_path. "cprofile" covers every thread and writes a .pstats file
+    (view with snakeviz or python -m pstats); "pyinstrument" samples only
+    the calling thread and writes an HTML report. profiler=None does nothing.
+    """
+    if profiler is None:
+        return contextlib.nullcontext()
+    if profiler == "cprofile":
+        return _cprofile(output_path)
+    if profiler == "pyinstrument":
+        return _pyinstrument(output_path)
+    raise ValueError(f"Unknown profiler {profiler!r}; choose one of {', '.join(PROFILERS)}.")
@@ -0,0 +1,197 @@
+import os
+import re
+import json
+import hashlib
+import zipfile
+import datetime
+import threading
+import contextlib
+
+import url_utils
+
+MANIFEST_FILENAME = "manifest.json"
+BUNDLE_MODES = ("markdown", "zip")
+BUNDLE_MARKDOWN_FILENAME = "tweets.md" # Every tweet of the issue, in issue order
+BUNDLE_ARTICLES_FILENAME = "articles.md" # Every article fetched from the sources, in issue order
+BUNDLE_DISCORD_FILENAME = "discord.md" # Every linked Discord message, in issue order
+BUNDLE_ZIP_FILENAME = "bundle.zip"
+
+MARKDOWN_IMAGE_RE = re.compile(r'!\[[^\]]*\]\(([^)\s]+)\)')
+STORED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp") # Already compressed; zipped as is
+
+
+def tweet_markdown_filename(tweet_id):
+    """File name of one tweet's markdown inside an issue folder."""
+    return f"tweet_{tweet_id}.md"
+
+
+@contextlib.contextmanager
+def atomic_open(path, mode='w', encoding='utf-8'):
+    """
+    Opens a temporary file next to path for writing. It is renamed over
+    path when the block completes and deleted if the block raises, so
+    readers only ever see the old file or the complete new one.
+    """
+    partial_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    f = open(partial_path, mode, encoding=None if 'b' in mode else encoding)
+    try:
+        with f:
+            yield f
+        os.replace(partial_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(partial_path)
+        raise
+
+
+class OutputWriter:
+    """
+    Writes the artifacts of one build straight into their final directory.
+    Every file is written atomically, so an interrupted build leaves
+    complete files (which --resume can keep) and never half-written ones.
+    Safe to share between threads as long as they write different names.
+    """
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.output_dir, name)
+
+    def open(self, name, mode='w'):
+        """Context manager writing name atomically; see atomic_open."""
+        return atomic_open(self.path(name), mode)
+
+    def write_text(self, name, text):
+        with self.open(name) as f:
+            f.write(text)
+        return self.path(name)
+
+    def write_bytes(self, name, data):
+        with self.open(name, 'wb') as f:
+            f.write(data)
+        return self.path(name)
+
+    def remove(self, name):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.path(name))
+
+
+def remove_bundle(output_dir):
+    """Deletes the bundle files of an earlier build, e.g. before rebuilding unbundled."""
+    writer = OutputWriter(output_dir)
+    for name in (BUNDLE_MARKDOWN_FILENAME, BUNDLE_ARTICLES_FILENAME, BUNDLE_DISCORD_FILENAME, BUNDLE_ZIP_FILENAME,
+                 MANIFEST_FILENAME):
+        writer.remove(name)
+
+
+def _file_entry(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return {"name": os.path.basename(path), "bytes": os.path.getsize(path), "sha256": digest.hexdigest()}
+
+
+def _concatenate(writer, name, heading, parts):
+    """Writes the files in parts, in order, into name and returns the ones that were there."""
+    found = []
+    with writer.open(name) as combined:
+        combined.write(f"# {heading}\n\n")
+        for part in parts:
+            try:
+                with open(writer.path(part), 'r', encoding='utf-8') as f:
+                    combined.write(f.read().rstrip('\n') + "\n\n")
+            except FileNotFoundError:
+                continue
+            found.append(part)
+    return found
+
+
+def write_bundle(output_dir, tweet_urls, mode, sources_filename='sources.txt', article_results=None,
+                 discord_results=None):
+    """
+    Combines an issue folder's tweet markdowns into a few files for import.
+
+    The tweet_<id>.md files of tweet_urls are concatenated, in issue
+    order, into BUNDLE_MARKDOWN_FILENAME and removed, and a manifest.json
+    lists every tweet (URL, images, or missing if it could not be scraped)
+    and every file with its size and SHA-256. In "zip" mode the combined
+    markdown, sources file, images and manifest are then packed into
+    BUNDLE_ZIP_FILENAME and the loose copies removed, except the sources
+    file, which is the folder's main output and stays readable as is.
+
+    article_results (from article_fetcher.ArticleFetcher) add the fetched
+    articles, combined into BUNDLE_ARTICLES_FILENAME, and the status of
+    every source to the manifest. discord_results (from discord_scraper.main)
+    likewise add the Discord messages, combined into BUNDLE_DISCORD_FILENAME.
+    Returns the path of the bundle.
+    """
+    if mode not in BUNDLE_MODES:
+        raise ValueError(f"Unknown bundle mode {mode!r}; choose one of {', '.join(BUNDLE_MODES)}.")
+    writer = OutputWriter(output_dir)
+    tweets, images, tweet_files = [], [], []
+    with writer.open(BUNDLE_MARKDOWN_FILENAME) as combined:
+        combined.write(f"# Tweets from {os.path.basename(os.path.normpath(output_dir))}\n\n")
+        for url in tweet_urls:
+            name = tweet_markdown_filename(url_utils.tweet_id(url) or "unknown_tweet")
+            try:
+                with open(writer.path(name), 'r', encoding='utf-8') as f:
+                    markdown = f.read()
+            except FileNotFoundError:
+                tweets.append({"url": url, "missing": True})
+                continue
+            combined.write(markdown)
+            tweet_files.append(name)
+            tweet_images = MARKDOWN_IMAGE_RE.findall(markdown)
+            tweets.append({"url": url, "images": tweet_images})
+            images.extend(image for image in tweet_images if image not in images)
+
+    issue = os.path.basename(os.path.normpath(output_dir))
+    bundled = [BUNDLE_MARKDOWN_FILENAME, sources_filename]
+    article_files, discord_files = [], []
+    if article_results:
+        article_files = _concatenate(writer, BUNDLE_ARTICLES_FILENAME, f"Articles from {issue}",
+                                     [result["file"] for result in article_results if result.get("file")])
+        bundled.append(BUNDLE_ARTICLES_FILENAME)
+    if discord_results:
+        discord_files = _concatenate(writer, BUNDLE_DISCORD_FILENAME, f"Discord messages from {issue}",
+                                     [result["file"] for result in discord_results if result.get("file")])
+        for name in discord_files:
+            with open(writer.path(name), 'r', encoding='utf-8') as f:
+                images.extend(image for image in MARKDOWN_IMAGE_RE.findall(f.read()) if image not in images)
+        bundled.append(BUNDLE_DISCORD_FILENAME)
+    bundled += [i for i in images if os.path.exists(writer.path(i))]
+    manifest = {
+        "issue": issue,
+        "created_at": datetime.datetime.now().isoformat(timespec='seconds'),
+        "mode": mode,
+        "tweets": tweets,
+        "files": [_file_entry(writer.path(name)) for name in bundled if os.path.exists(writer.path(name))],
+    }
+    if article_results:
+        manifest["sources"] = [
+            {key: result[key] for key in ("url", "final_url", "status", "reason") if result.get(key)}
+            for result in article_results
+        ]
+    if discord_results:
+        manifest["discord"] = [
+            {"url": result["url"], "missing": True} if not result.get("file") else {"url": result["url"]}
+            for result in discord_results
+        ]
+    writer.write_text(MANIFEST_FILENAME, json.dumps(manifest, indent=2))
+    for name in tweet_files + article_files + discord_files:
+        writer.remove(name)
+    if mode == "markdown":
+        writer.remove(BUNDLE_ZIP_FILENAME) # Left over from an earlier build of the same folder
+        return writer.path(BUNDLE_MARKDOWN_FILENAME)
+
+    with writer.open(BUNDLE_ZIP_FILENAME, 'wb') as f, zipfile.ZipFile(f, 'w') as archive:
+        for entry in manifest["files"] + [{"name": MANIFEST_FILENAME}]:
+            name = entry["name"]
+            compression = zipfile.ZIP_STORED if name.lower().endswith(STORED_EXTENSIONS) else zipfile.ZIP_DEFLATED
+            archive.write(writer.path(name), name, compress_type=compression)
+    for entry in manifest["files"] + [{"name": MANIFEST_FILENAME}]:
+        if entry["name"] != sources_filename:
+            writer.remove(entry["name"])
+    return writer.path(BUNDLE_ZIP_FILENAME)
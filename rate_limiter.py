@@ -0,0 +1,178 @@
+import time
+import threading
+import email.utils
+from urllib.parse import urlsplit
+
+import metrics
+from url_utils import DomainMatcher
+
+# Starting (requests per second, burst) per registrable domain. Each host
+# gets its own bucket, which then adapts: each second of successes raises
+# the rate a little, a 429 halves it and a timeout trims it.
+HOST_RATES = {
+    "x.com": (0.5, 2), # Full page loads in a browser
+    "twitter.com": (0.5, 2),
+    "cdn.syndication.twimg.com": (5.0, 5), # Embed JSON fast path
+    "twimg.com": (10.0, 8), # Images
+}
+DEFAULT_RATE = (50.0, 20) # Other hosts are effectively unpaced until they push back
+
+THROTTLE_FACTOR = 0.5 # Multiplied into the rate on 429 / rate-limit pages
+TIMEOUT_FACTOR = 0.8 # Gentler: a timeout is only possibly a rate limit
+INCREASE_STEP = 0.1 # Fraction of the starting rate added per second of successes
+MIN_RATE_FACTOR = 1 / 32
+MAX_RATE_FACTOR = 4
+SLOT_SLACK = 0.05 # seconds; acquire() treats a slot opening this soon as open now
+
+
+class RateLimited(Exception):
+    """Raised when a host answered 429; retry_after is its requested delay in seconds, if any."""
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def retry_after_seconds(headers):
+    """Parses a Retry-After header (seconds or HTTP date) into seconds, or None."""
+    value = (headers or {}).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class TokenBucket:
+    """
+    Token bucket whose rate adapts to the host's feedback (additive
+    increase, multiplicative decrease). reserve() never blocks: it takes a
+    token, possibly borrowed from the future, and returns how long the
+    caller must wait before using it, so callers can park the work on a
+    retry queue instead of sleeping.
+    """
+    def __init__(self, rate, burst=1):
+        self.initial_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = rate * MIN_RATE_FACTOR
+        self.max_rate = rate * MAX_RATE_FACTOR
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._increased_at = self._updated
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, max_delay=None):
+        """
+        Takes one token and returns the delay in seconds before it may be
+        used. If that delay would be max_delay or more, the token is not
+        taken, so a caller that cannot wait that long costs later ones nothing.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            delay = max(delay, self._blocked_until - now)
+            if max_delay is not None and delay >= max_delay:
+                self._tokens += 1
+            return delay
+
+    def success(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._increased_at >= 1.0:
+                self.rate = min(self.max_rate, self.rate + self.initial_rate * INCREASE_STEP)
+                self._increased_at = now
+
+    def slow_down(self, factor, retry_after=None):
+        """Cuts the rate by factor and, given retry_after, holds all requests until it has passed."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * factor)
+            self._tokens = min(self._tokens, 0.0)
+            self._increased_at = now
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+
+class RateLimiter:
+    """
+    Per-host token buckets shared by every worker and download thread.
+    Buckets are keyed by host name and configured from HOST_RATES by
+    domain suffix.
+    """
+    def __init__(self, host_rates=HOST_RATES, default_rate=DEFAULT_RATE):
+        self._rates = DomainMatcher(host_rates, default=default_rate)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url):
+        host = (urlsplit(url).hostname or "").lower()
+        with self._lock:
+            if host not in self._buckets:
+                rate, burst = self._rates.match(host)
+                self._buckets[host] = TokenBucket(rate, burst)
+            return self._buckets[host]
+
+    def reserve(self, url, max_delay=None):
+        """
+        Non-blocking: reserves a request slot for url's host and returns the
+        delay to wait for it. No slot is reserved if the delay is max_delay or more.
+        """
+        return self.bucket(url).reserve(max_delay)
+
+    def acquire(self, url):
+        """
+        Non-blocking: takes a request slot for url's host and returns 0 if
+        one is open now. Otherwise nothing is taken and the delay until one
+        opens is returned, for the caller to come back then. Unlike
+        reserve(), no slot is booked ahead, so a caller coming back gets the
+        host's rate of that moment rather than the one it was turned away at.
+        """
+        delay = self.bucket(url).reserve(SLOT_SLACK)
+        return 0.0 if delay < SLOT_SLACK else delay
+
+    def wait(self, url, budget=None, deadline_url=None):
+        """
+        Blocks until a request to url's host is allowed. Returns False
+        instead, without waiting or taking a slot, if that is later than
+        budget (a RunBudget) allows for deadline_url, which defaults to url
+        (e.g. the tweet whose deadline applies to an API request).
+        """
+        max_delay = budget.remaining(deadline_url or url) if budget else None
+        delay = self.reserve(url, max_delay)
+        if max_delay is not None and delay >= max_delay:
+            return False
+        if delay > 0:
+            with metrics.span("rate_limit.wait"):
+                time.sleep(delay)
+        return True
+
+    def success(self, url):
+        self.bucket(url).success()
+
+    def throttled(self, url, retry_after=None):
+        """Records a 429 (or a rate-limit page) from url's host."""
+        metrics.incr("rate_limit.throttled")
+        self.bucket(url).slow_down(THROTTLE_FACTOR, retry_after)
+
+    def timed_out(self, url):
+        metrics.incr("rate_limit.timeouts")
+        self.bucket(url).slow_down(TIMEOUT_FACTOR)
+
+    def rates(self):
+        """Current requests per second of every host seen so far."""
+        with self._lock:
+            return {host: round(bucket.rate, 3) for host, bucket in sorted(self._buckets.items())}
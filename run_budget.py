@@ -0,0 +1,94 @@
+import time
+import threading
+
+import metrics
+
+FINALIZE_SHARE = 0.1 # Part of the run budget held back for in-flight work and writing the outputs
+MAX_FINALIZE_RESERVE = 60 # seconds
+MIN_WAIT_TIMEOUT = 1 # seconds; page waits are never cut shorter than this
+
+
+class RunBudget:
+    """
+    Time limits of one build: a budget for the whole run and a deadline
+    per URL, counted from its first attempt. Both are optional; RunBudget()
+    never expires.
+
+    Stages ask it before starting or retrying work and clamp their waits
+    to what is left. The run budget counts as spent a reserve (a tenth of
+    it, at most MAX_FINALIZE_RESERVE seconds) before it actually ends, so
+    requests already in flight can finish and the outputs can be written
+    within the budget. Whatever a stage leaves out, because of a limit or
+    because it failed, is recorded with skip() for the build's skipped
+    report. Safe to share between threads.
+    """
+    def __init__(self, seconds=None, url_deadline=None, reserve=None):
+        self.started = time.monotonic()
+        if seconds is not None and reserve is None:
+            reserve = min(MAX_FINALIZE_RESERVE, seconds * FINALIZE_SHARE)
+        self.expires_at = self.started + seconds - reserve if seconds is not None else None
+        self.url_deadline = url_deadline
+        self._first_attempts = {} # url -> time.monotonic() of its first attempt
+        self._skipped = {} # url -> report entry, in the order they were skipped
+        self._lock = threading.Lock()
+
+    def attempt(self, url):
+        """Notes that work on url has started; its deadline counts from the first call."""
+        with self._lock:
+            self._first_attempts.setdefault(url, time.monotonic())
+
+    def attempted(self, url):
+        """True if work on url has been started in this run."""
+        with self._lock:
+            return url in self._first_attempts
+
+    def remaining(self, url=None):
+        """Seconds left for the run, or for url if its deadline comes first. None if unlimited."""
+        now = time.monotonic()
+        limits = []
+        if self.expires_at is not None:
+            limits.append(self.expires_at - now)
+        if url is not None and self.url_deadline is not None:
+            with self._lock:
+                first_attempt = self._first_attempts.get(url)
+            if first_attempt is not None:
+                limits.append(first_attempt + self.url_deadline - now)
+        return max(0.0, min(limits)) if limits else None
+
+    def expired(self, url=None):
+        remaining = self.remaining(url)
+        return remaining is not None and remaining <= 0
+
+    def allows(self, url=None, delay=0):
+        """True if url (or, without one, any work) may still be started delay seconds from now."""
+        remaining = self.remaining(url)
+        return remaining is None or remaining > delay
+
+    def timeout(self, default, url=None):
+        """
+        default (seconds, or a requests-style (connect, read) pair), shortened
+        to the time left for url or the run. A pair is scaled down as a whole,
+        so connecting and reading together cannot outlast the time left.
+        """
+        remaining = self.remaining(url)
+        if remaining is None:
+            return default
+        if isinstance(default, tuple):
+            total = sum(default)
+            if total <= remaining:
+                return default
+            return tuple(max(MIN_WAIT_TIMEOUT, part * remaining / total) for part in default)
+        return max(MIN_WAIT_TIMEOUT, min(default, remaining))
+
+    def skip(self, url, stage, reason):
+        """Records that stage produced nothing for url, and why."""
+        with self._lock:
+            if url in self._skipped:
+                return
+            self._skipped[url] = {"url": url, "stage": stage, "reason": reason}
+        metrics.incr(f"skipped.{stage}")
+
+    def skipped(self):
+        """The report entries so far, in the order they were recorded."""
+        with self._lock:
+            return list(self._skipped.values())
@@ -1,63 +1,145 @@
 import requests
 from bs4 import BeautifulSoup
 import os
+import re
+import time
+import datetime
 
-def scrape_newsletter_links():
+from link_extractor import iter_hrefs, DEFAULT_BACKEND
+import metrics
+
+# Set AINEWS_BASE_URL to read the archive from a mirror or a local fixture server
+NEWS_BASE_URL = os.environ.get("AINEWS_BASE_URL", "https://news.smol.ai").rstrip('/')
+ARCHIVE_URL = f"{NEWS_BASE_URL}/issues"
+
+def fetch_page(url, http_cache=None):
     """
-    Scrapes links from the most recent newsletter on smol.ai/issues.
+    Returns the body of url. With an http_cache, the request is sent as a
+    conditional GET and an unchanged page is served from disk.
     """
-    archive_url = "https://news.smol.ai/issues"
-    newsletter_links = []
+    if http_cache is not None:
+        return http_cache.get(url).content
+    response = requests.get(url)
+    response.raise_for_status() # Raise an exception for bad status codes
+    return response.content
 
-    try:
-        # Step 1 & 2: Navigate to archive and find the most recent newsletter URL
-        print(f"Navigating to archive page: {archive_url}")
-        archive_response = requests.get(archive_url)
-        archive_response.raise_for_status() # Raise an exception for bad status codes
-        archive_soup = BeautifulSoup(archive_response.content, 'html.parser')
-
-        # Find all links that point to an issue page
-        # Select the first 'a' tag that is a direct child of a div with class 'arrow-card' and has an href starting with '/issues/'
-        # This assumes the website lists the most recent issue link first.
-        issue_links = archive_soup.select('div.arrow-card > a[href^="/issues/"]')
+def list_issue_urls(archive_url=None, http_cache=None):
+    """
+    Returns the absolute URLs of all issues listed on the archive page
+    (ARCHIVE_URL by default), newest first. Raises ValueError if no issue
+    link can be found.
+    """
+    archive_url = archive_url or ARCHIVE_URL
+    print(f"Navigating to archive page: {archive_url}")
+    archive_soup = BeautifulSoup(fetch_page(archive_url, http_cache), 'html.parser')
 
-        if not issue_links:
-            print("Could not find any potential newsletter links on the archive page.")
-            return
+    # Find all links that point to an issue page
+    # Select 'a' tags that are direct children of a div with class 'arrow-card' and have an href starting with '/issues/'
+    # This assumes the website lists the most recent issue link first.
+    issue_links = archive_soup.select('div.arrow-card > a[href^="/issues/"]')
 
-        # Assuming the first link in the list is the most recent
-        latest_newsletter_link_tag = issue_links[0]
+    if not issue_links:
+        raise ValueError("Could not find any potential newsletter links on the archive page.")
 
-        latest_newsletter_url = latest_newsletter_link_tag['href']
+    issue_urls = []
+    for link_tag in issue_links:
+        issue_url = link_tag['href']
         # Ensure it's an absolute URL
-        if not latest_newsletter_url.startswith('http'):
-             latest_newsletter_url = f"https://news.smol.ai{latest_newsletter_url}"
+        if not issue_url.startswith('http'):
+            issue_url = f"{NEWS_BASE_URL}{issue_url}"
+        if issue_url not in issue_urls:
+            issue_urls.append(issue_url)
+    return issue_urls
+
+def issue_slug(issue_url):
+    """Returns the last path segment of an issue URL, e.g. "25-06-03-not-much"."""
+    return issue_url.rstrip('/').rsplit('/', 1)[-1]
+
+def issue_date(issue_url):
+    """
+    Returns the publication date encoded in an issue slug (YY-MM-DD-...),
+    or None if the slug carries no date.
+    """
+    match = re.match(r'(\d{2})-(\d{2})-(\d{2})(?:-|$)', issue_slug(issue_url))
+    if not match:
+        return None
+    year, month, day = (int(part) for part in match.groups())
+    try:
+        return datetime.date(2000 + year, month, day)
+    except ValueError:
+        return None
 
+def find_latest_newsletter_url(archive_url=None, http_cache=None):
+    """
+    Returns the absolute URL of the most recent issue listed on the archive page.
+    Raises ValueError if no issue link can be found.
+    """
+    archive_url = archive_url or ARCHIVE_URL
+    # Step 1 & 2: Navigate to archive and find the most recent newsletter URL
+    # Assuming the first link in the list is the most recent
+    latest_newsletter_url = list_issue_urls(archive_url, http_cache)[0]
 
-        print(f"Found latest newsletter URL: {latest_newsletter_url}")
+    print(f"Found latest newsletter URL: {latest_newsletter_url}")
 
-        # Verify the extracted URL is a specific issue URL
-        if latest_newsletter_url == archive_url:
-            print("Error: Extracted URL is the archive URL, not a specific issue.")
-            return
+    # Verify the extracted URL is a specific issue URL
+    if latest_newsletter_url == archive_url:
+        raise ValueError("Extracted URL is the archive URL, not a specific issue.")
 
-        # Step 3 & 4: Navigate to the newsletter and scrape links
-        print(f"Navigating to newsletter page: {latest_newsletter_url}")
-        newsletter_response = requests.get(latest_newsletter_url)
+    return latest_newsletter_url
+
+def iter_newsletter_links(newsletter_url=None, http_cache=None, backend=DEFAULT_BACKEND):
+    """
+    Generator that yields the full (http:// or https://) links of a newsletter
+    issue as they are parsed. Defaults to the most recent issue.
+    The page is streamed into the parser chunk by chunk rather than loaded whole.
+    Request errors and a missing issue link are raised to the caller.
+    """
+    if newsletter_url is None:
+        newsletter_url = find_latest_newsletter_url(http_cache=http_cache)
+
+    # Step 3 & 4: Navigate to the newsletter and scrape links
+    print(f"Navigating to newsletter page: {newsletter_url}")
+    if http_cache is not None:
+        page = http_cache.get(newsletter_url)
+        yield from extract_links(page.iter_content(), backend, page.encoding or 'utf-8')
+        return
+    with requests.get(newsletter_url, stream=True) as newsletter_response:
         newsletter_response.raise_for_status() # Raise an exception for bad status codes
-        newsletter_soup = BeautifulSoup(newsletter_response.content, 'html.parser')
+        encoding = newsletter_response.encoding if 'charset=' in newsletter_response.headers.get('Content-Type', '').lower() else 'utf-8'
+        yield from extract_links(newsletter_response.iter_content(chunk_size=64 * 1024), backend, encoding)
 
-        # Scrape all href attributes from a tags
-        print("Scraping links from the newsletter page...")
-        for link in newsletter_soup.find_all('a', href=True):
-            href = link['href']
-            # Step 5: Handle Twitter/X links (simple extraction for now)
-            # The reference to selenium-twitter-scraper is noted but not implemented
-            # in this basic version as per instructions.
-            newsletter_links.append(href)
+def extract_links(newsletter_content, backend=DEFAULT_BACKEND, encoding='utf-8'):
+    """
+    Generator that yields the full (http:// or https://) links of a
+    newsletter page. newsletter_content is the page body as bytes or an
+    iterable of byte chunks; only anchor hrefs are kept while parsing.
+    """
+    # Scrape all href attributes from a tags
+    print("Scraping links from the newsletter page...")
+    hrefs = iter_hrefs(newsletter_content, backend, encoding)
+    # Parsing is interleaved with the consumer, so only the time spent
+    # inside the parser is added up and recorded as one span
+    parse_time = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            href = next(hrefs, None)
+            parse_time += time.perf_counter() - start
+            if href is None:
+                break
+            metrics.incr("links.parsed")
+            # Filter for full URLs (starting with http:// or https://)
+            if href.startswith('http://') or href.startswith('https://'):
+                yield href
+    finally:
+        metrics.record("newsletter.parse", parse_time)
 
-        # Filter for full URLs (starting with http:// or https://)
-        filtered_links = [link for link in newsletter_links if link.startswith('http://') or link.startswith('https://')]
+def scrape_newsletter_links():
+    """
+    Scrapes links from the most recent newsletter on smol.ai/issues.
+    """
+    try:
+        filtered_links = list(iter_newsletter_links())
 
         # Step 6: Write collected links to a file
         output_filename = "ai_news_links.txt"
@@ -69,8 +151,10 @@ def scrape_newsletter_links():
 
     except requests.exceptions.RequestException as e:
         print(f"Error during request: {e}")
+    except ValueError as e:
+        print(f"Error: {e}")
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
 
 if __name__ == "__main__":
-    scrape_newsletter_links()
\ No newline at end of file
+    scrape_newsletter_links()
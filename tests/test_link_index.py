@@ -0,0 +1,102 @@
+import datetime
+
+import pytest
+
+import link_index
+from link_index import BloomFilter, LinkIndex, reversed_domain
+
+JAN = datetime.date(2025, 1, 1)
+FEB = datetime.date(2025, 2, 1)
+MAR = datetime.date(2025, 3, 1)
+
+
+def test_bloom_has_no_false_negatives():
+    bloom = BloomFilter(capacity=2000, error_rate=0.01)
+    keys = [f"https://example.com/{i}" for i in range(2000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    assert bloom.count == 2000
+
+
+def test_bloom_false_positive_rate_is_near_error_rate_at_capacity():
+    bloom = BloomFilter(capacity=5000, error_rate=0.01)
+    for i in range(5000):
+        bloom.add(f"added:{i}")
+    false_positives = sum(f"other:{i}" in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.02
+
+
+def test_bloom_round_trips_through_its_bits():
+    bloom = BloomFilter(capacity=100, error_rate=0.01)
+    bloom.add("a")
+    copy = BloomFilter(100, 0.01, bytes(bloom.bits), bloom.count)
+    assert "a" in copy
+    assert copy.count == 1
+
+
+def test_reversed_domain():
+    assert reversed_domain("www.GitHub.com.") == "com.github.www."
+    assert reversed_domain(None) == "."
+
+
+@pytest.fixture
+def index(tmp_path):
+    with LinkIndex(str(tmp_path / "index.sqlite3")) as index:
+        yield index
+
+
+def test_add_reports_new_then_seen(index):
+    index.add_issue("feb", "https://news.example/feb", FEB)
+    index.add_issue("mar", "https://news.example/mar", MAR)
+    assert index.add("https://example.com/post", "feb", FEB) is True
+    assert index.add("https://example.com/post?utm_source=x", "mar", MAR) is False
+    assert index.first_seen("https://example.com/post") == ("feb", FEB.isoformat())
+
+
+def test_tweets_count_once_across_hosts(index):
+    assert index.add("https://twitter.com/a/status/1", "feb", FEB) is True
+    assert index.add("https://x.com/i/web/status/1", "mar", MAR) is False
+
+
+def test_rebuilding_an_issue_keeps_its_links_new(index):
+    assert index.add("https://example.com/", "feb", FEB) is True
+    assert index.add("https://example.com/", "feb", FEB) is True
+
+
+def test_earlier_issue_becomes_first(index):
+    index.add("https://example.com/", "mar", MAR)
+    assert index.add("https://example.com/", "jan", JAN) is True
+    assert index.first_seen("https://example.com/") == ("jan", JAN.isoformat())
+    assert index.add("https://example.com/", "mar", MAR) is False
+
+
+def test_issues_linking_domain_includes_subdomains_only(index):
+    for issue, date in (("jan", JAN), ("feb", FEB), ("mar", MAR)):
+        index.add_issue(issue, f"https://news.example/{issue}", date)
+    index.add("https://github.com/a", "jan", JAN)
+    index.add("https://gist.github.com/b", "feb", FEB)
+    index.add("https://github.com/c", "feb", FEB)
+    index.add("https://notgithub.com/d", "mar", MAR)
+    assert index.issues_linking_domain("github.com") == [
+        ("feb", FEB.isoformat(), "https://news.example/feb", 2),
+        ("jan", JAN.isoformat(), "https://news.example/jan", 1),
+    ]
+
+
+def test_index_persists_links_and_bloom(tmp_path):
+    path = str(tmp_path / "index.sqlite3")
+    with LinkIndex(path) as index:
+        index.add("https://example.com/", "feb", FEB)
+    with LinkIndex(path) as index:
+        assert index.add("https://example.com/", "mar", MAR) is False
+        assert index.stats() == {"issues": 0, "links": 1, "by_kind": {"other": 1}, "occurrences": 2}
+
+
+def test_bloom_is_rebuilt_larger_when_full(tmp_path, monkeypatch):
+    monkeypatch.setattr(link_index, "BLOOM_CAPACITY", 4)
+    with LinkIndex(str(tmp_path / "index.sqlite3")) as index:
+        urls = [f"https://example.com/{i}" for i in range(10)]
+        assert all(index.add(url, "feb", FEB) for url in urls)
+        assert index._bloom.capacity >= 10
+        assert not any(index.add(url, "mar", MAR) for url in urls)
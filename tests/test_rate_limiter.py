@@ -0,0 +1,128 @@
+import email.utils
+import time
+
+import pytest
+
+import rate_limiter
+from rate_limiter import RateLimiter, TokenBucket, retry_after_seconds
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock)
+    return clock
+
+
+def test_burst_is_free_then_tokens_are_borrowed(clock):
+    bucket = TokenBucket(rate=2.0, burst=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_tokens_refill_up_to_burst(clock):
+    bucket = TokenBucket(rate=1.0, burst=2)
+    bucket.reserve()
+    bucket.reserve()
+    clock.advance(10)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_reserve_over_max_delay_takes_no_token(clock):
+    bucket = TokenBucket(rate=1.0, burst=1)
+    bucket.reserve()
+    assert bucket.reserve(max_delay=0.5) == pytest.approx(1.0)
+    assert bucket.reserve(max_delay=0.5) == pytest.approx(1.0)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_slow_down_is_multiplicative_with_a_floor(clock):
+    bucket = TokenBucket(rate=8.0, burst=4)
+    bucket.slow_down(0.5)
+    assert bucket.rate == 4.0
+    assert bucket.reserve() == pytest.approx(0.25) # Saved-up tokens are dropped
+    for _ in range(20):
+        bucket.slow_down(0.5)
+    assert bucket.rate == 8.0 * rate_limiter.MIN_RATE_FACTOR
+
+
+def test_slow_down_holds_requests_for_retry_after(clock):
+    bucket = TokenBucket(rate=100.0, burst=10)
+    bucket.slow_down(1.0, retry_after=30)
+    assert bucket.reserve() == pytest.approx(30.0)
+    clock.advance(31)
+    assert bucket.reserve() == 0.0
+
+
+def test_success_increases_additively_at_most_once_a_second(clock):
+    bucket = TokenBucket(rate=10.0)
+    bucket.success()
+    assert bucket.rate == 10.0
+    clock.advance(1)
+    bucket.success()
+    bucket.success()
+    assert bucket.rate == pytest.approx(10.0 + 10.0 * rate_limiter.INCREASE_STEP)
+    for _ in range(100):
+        clock.advance(1)
+        bucket.success()
+    assert bucket.rate == 10.0 * rate_limiter.MAX_RATE_FACTOR
+
+
+def test_success_waits_a_second_after_a_slow_down(clock):
+    bucket = TokenBucket(rate=10.0)
+    clock.advance(5)
+    bucket.slow_down(0.5)
+    bucket.success()
+    assert bucket.rate == 5.0
+
+
+def test_limiter_keys_buckets_by_host_and_configures_by_domain(clock):
+    limiter = RateLimiter({"example.com": (2.0, 3)}, default_rate=(50.0, 20))
+    bucket = limiter.bucket("https://API.example.com/a")
+    assert limiter.bucket("https://api.example.com/b") is bucket
+    assert (bucket.rate, bucket.burst) == (2.0, 3)
+    assert limiter.bucket("https://example.com/") is not bucket
+    assert limiter.bucket("https://other.org/").rate == 50.0
+
+
+def test_acquire_takes_nothing_when_no_slot_is_open(clock):
+    limiter = RateLimiter({"example.com": (1.0, 1)})
+    url = "https://example.com/"
+    assert limiter.acquire(url) == 0.0
+    assert limiter.acquire(url) == pytest.approx(1.0)
+    assert limiter.acquire(url) == pytest.approx(1.0)
+    clock.advance(1 - rate_limiter.SLOT_SLACK / 2)
+    assert limiter.acquire(url) == 0.0
+
+
+def test_throttled_and_timed_out_feed_back_into_rates(clock):
+    limiter = RateLimiter({"example.com": (10.0, 1)})
+    limiter.throttled("https://example.com/a", retry_after=5)
+    limiter.timed_out("https://example.com/b")
+    assert limiter.rates() == {"example.com": 10.0 * rate_limiter.THROTTLE_FACTOR * rate_limiter.TIMEOUT_FACTOR}
+    assert limiter.reserve("https://example.com/") == pytest.approx(5.0)
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds({"Retry-After": "12"}) == 12.0
+    assert retry_after_seconds({"Retry-After": "-3"}) == 0.0
+    assert retry_after_seconds({"Retry-After": "soon"}) is None
+    assert retry_after_seconds({}) is None
+    assert retry_after_seconds(None) is None
+    later = email.utils.formatdate(time.time() + 60, usegmt=True)
+    assert retry_after_seconds({"Retry-After": later}) == pytest.approx(60, abs=2)
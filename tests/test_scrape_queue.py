@@ -0,0 +1,134 @@
+import threading
+import time
+
+import tweet_scraper
+from tweet_scraper import _ScrapeQueue, _conversation_key
+
+
+class ExpiredBudget:
+    def expired(self, url=None):
+        return True
+
+    def remaining(self, url=None):
+        return 0.0
+
+
+def item(i, user="user", status=None):
+    return (i, f"https://x.com/{user}/status/{status or 100 + i}", 0)
+
+
+def test_items_come_out_in_order_one_at_a_time():
+    queue = _ScrapeQueue()
+    for i in range(3):
+        queue.put(item(i))
+    queue.close()
+    batches = []
+    while (batch := queue.get()) is not None:
+        batches.append(batch)
+        queue.task_done()
+    assert batches == [[item(0)], [item(1)], [item(2)]]
+
+
+def test_delayed_item_waits_behind_ready_ones():
+    queue = _ScrapeQueue()
+    queue.put(item(0), delay=0.2)
+    queue.put(item(1))
+    queue.close()
+    assert queue.get() == [item(1)]
+    queue.task_done()
+    started = time.monotonic()
+    assert queue.get() == [item(0)]
+    assert time.monotonic() - started >= 0.15
+    queue.task_done()
+    assert queue.get() is None
+
+
+def test_get_waits_for_a_batch_in_flight():
+    queue = _ScrapeQueue()
+    queue.put(item(0))
+    queue.close()
+    assert queue.get() == [item(0)]
+    result = []
+    getter = threading.Thread(target=lambda: result.append(queue.get()))
+    getter.start()
+    time.sleep(0.05)
+    assert getter.is_alive() # The batch in flight may still be put back
+    queue.put(item(0), delay=0.01)
+    queue.task_done()
+    getter.join(timeout=2)
+    assert result == [[item(0)]]
+
+
+def test_priority_picks_the_lowest_ranked_ready_item():
+    queue = _ScrapeQueue(priority=lambda it: -it[0])
+    for i in range(3):
+        queue.put(item(i))
+    assert queue.get() == [item(2)]
+    assert queue.get() == [item(1)]
+
+
+def test_batches_by_key_up_to_batch_limit():
+    queue = _ScrapeQueue(key=lambda it: it[1].split("/")[3], batch_limit=2)
+    for i, user in enumerate(["a", "b", "a", "a", "b"]):
+        queue.put(item(i, user))
+    assert queue.get() == [item(0, "a"), item(2, "a")]
+    assert queue.get() == [item(1, "b"), item(4, "b")]
+    assert queue.get() == [item(3, "a")]
+
+
+def test_none_key_is_never_batched():
+    queue = _ScrapeQueue(key=lambda it: None, batch_limit=10)
+    queue.put(item(0))
+    queue.put(item(1))
+    assert queue.get() == [item(0)]
+
+
+def test_expired_budget_drops_everything():
+    queue = _ScrapeQueue(budget=ExpiredBudget())
+    queue.put(item(0))
+    queue.put(item(1), delay=5)
+    assert queue.get() is None
+    assert queue.dropped == [item(0), item(1)]
+
+
+def test_drain_returns_ready_then_delayed_items():
+    queue = _ScrapeQueue()
+    queue.put(item(0), delay=10)
+    queue.put(item(1))
+    assert queue.drain() == [item(1), item(0)]
+    assert queue.drain() == []
+
+
+def test_conversation_key_batches_only_tweets_needing_a_page_load():
+    page_urls = set()
+    key = _conversation_key(page_urls)
+    tweet = item(0, "SomeUser")
+    assert key(tweet) is None
+    page_urls.add(tweet[1])
+    assert key(tweet) == "someuser"
+    assert key(item(1, "i")) is None
+
+
+def test_conversation_key_without_fast_path_batches_every_tweet():
+    key = _conversation_key(set(), fast_path=False)
+    assert key(item(0, "SomeUser")) == "someuser"
+
+
+def test_newest_first_orders_by_status_id():
+    older, newer = item(0, status=5), item(1, status=50)
+    assert sorted([older, newer], key=tweet_scraper._newest_first) == [newer, older]
+
+
+def test_retry_later_counts_attempts_and_gives_up_at_max_retries():
+    queue = _ScrapeQueue()
+    i, url, _ = item(0)
+    tweet_scraper._retry_later(queue, (i, url, 0), "HTTP 500", "[test]", delay=0)
+    assert queue.drain() == [(i, url, 1)]
+    tweet_scraper._retry_later(queue, (i, url, tweet_scraper.MAX_RETRIES - 1), "HTTP 500", "[test]", delay=0)
+    assert queue.drain() == []
+
+
+def test_retry_later_paced_keeps_the_attempt_count():
+    queue = _ScrapeQueue()
+    tweet_scraper._retry_later(queue, item(0), "paced", "[test]", delay=0, paced=True)
+    assert queue.drain() == [item(0)]
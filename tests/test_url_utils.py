@@ -0,0 +1,103 @@
+import pytest
+
+import url_utils
+from url_utils import DomainMatcher, canonicalize_url, dedup_key, dedupe_urls
+
+
+@pytest.mark.parametrize("url", [
+    "https://twitter.com/OpenAI/status/123",
+    "http://mobile.twitter.com/OpenAI/status/123?s=20",
+    "https://x.com/OpenAI/status/123/photo/1",
+    "https://fxtwitter.com/OpenAI/statuses/123#m",
+])
+def test_canonicalize_tweet_variants(url):
+    assert canonicalize_url(url) == "https://x.com/OpenAI/status/123"
+
+
+def test_canonicalize_web_status_link():
+    assert canonicalize_url("https://twitter.com/i/web/status/123") == "https://x.com/i/status/123"
+
+
+def test_canonicalize_strips_tracking_and_fragment():
+    url = "HTTPS://Example.COM:443/Post?utm_source=news&id=7&fbclid=abc#top"
+    assert canonicalize_url(url) == "https://example.com/Post?id=7"
+
+
+def test_canonicalize_keeps_non_default_port_and_encoding():
+    url = "http://example.com:8080/a?q=a%20b&UTM_Medium=x"
+    assert canonicalize_url(url) == "http://example.com:8080/a?q=a%20b"
+
+
+def test_canonicalize_adds_root_path():
+    assert canonicalize_url("https://example.com") == "https://example.com/"
+
+
+def test_canonicalize_leaves_malformed_port():
+    assert canonicalize_url("http://Example.com:99999/x") == "http://example.com:99999/x"
+
+
+def test_dedup_key_matches_tweets_by_id_only():
+    assert dedup_key("https://x.com/a/status/5") == dedup_key("https://twitter.com/i/web/status/5") == "tweet:5"
+    assert dedup_key("https://example.com/?utm_campaign=x") == "https://example.com/"
+
+
+def test_dedupe_urls_keeps_first_seen_order():
+    urls = [
+        "https://example.com/b",
+        "https://twitter.com/a/status/1",
+        "https://example.com/b?utm_source=x",
+        "https://x.com/i/status/1",
+        "https://example.com/a",
+    ]
+    assert list(dedupe_urls(urls)) == [
+        "https://example.com/b",
+        "https://x.com/a/status/1",
+        "https://example.com/a",
+    ]
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://x.com/user/status/42", "42"),
+    ("https://twitter.com/i/status/42", "42"),
+    ("https://x.com/user", None),
+    ("https://notx.com/user/status/42", None),
+    ("https://x.com.evil.io/user/status/42", None),
+])
+def test_tweet_id(url, expected):
+    assert url_utils.tweet_id(url) == expected
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://x.com/SomeUser/status/42", "someuser"),
+    ("https://x.com/i/status/42", None),
+    ("https://twitter.com/i/web/status/42", None),
+    ("https://example.com/SomeUser/status/42", None),
+])
+def test_tweet_author(url, expected):
+    assert url_utils.tweet_author(url) == expected
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://discord.com/channels/1/2/3", ("1", "2", "3")),
+    ("https://ptb.discordapp.com/channels/@me/2/3", ("@me", "2", "3")),
+    ("https://discord.com/channels/1/2", None),
+    ("https://discord.gg/invite", None),
+    ("https://example.com/channels/1/2/3", None),
+])
+def test_discord_message(url, expected):
+    assert url_utils.discord_message(url) == expected
+
+
+def test_classify_url():
+    assert url_utils.classify_url(" https://Mobile.Twitter.com/a ") == "twitter"
+    assert url_utils.classify_url("https://discord.gg/x") == "discord"
+    assert url_utils.classify_url("https://example.com") == "other"
+
+
+def test_domain_matcher_matches_suffix_labels_only():
+    matcher = DomainMatcher({"x.com": "twitter", ".Example.org.": "example"}, default=None)
+    assert matcher.match("X.com.") == "twitter"
+    assert matcher.match("api.x.com") == "twitter"
+    assert matcher.match("www.example.org") == "example"
+    assert matcher.match("notx.com") is None
+    assert matcher.match(None) is None
@@ -0,0 +1,224 @@
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+
+# Shared on-disk cache location; override with AINEWS_CACHE_DIR
+DEFAULT_CACHE_DIR = os.environ.get(
+    "AINEWS_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "ainews-source-extractor")
+)
+DEFAULT_TTL = 14 * 24 * 60 * 60 # seconds; viral tweets get quoted for a week or two
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024 # Total size of cached images before LRU eviction
+
+
+def file_sha256(path):
+    """Returns the hex SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_or_copy(src, dst):
+    """
+    Hard-links src to dst, falling back to a copy across filesystems.
+    Replaces dst atomically, so it is never missing or half-copied.
+    """
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return # rename() would be a silent no-op between two links to one file
+    partial_path = f"{dst}.{os.getpid()}.{threading.get_ident()}.part"
+    try:
+        os.link(src, partial_path)
+    except OSError:
+        shutil.copy2(src, partial_path)
+    os.replace(partial_path, dst)
+
+
+class TweetCache:
+    """
+    Persistent cache of scraped tweets keyed by tweet ID.
+
+    Text and image metadata live in an SQLite database inside cache_dir;
+    image files are stored once per content hash under cache_dir/images.
+    Entries older than ttl seconds are treated as misses, and the least
+    recently used entries are evicted once the image store grows past
+    max_bytes. Safe to share between scrape and download threads.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.image_dir = os.path.join(cache_dir, "images")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(self.image_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "tweets.sqlite3"), check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS tweets (
+                tweet_id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                text TEXT NOT NULL,
+                scraped_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS tweet_images (
+                tweet_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                filename TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (tweet_id, position)
+            );
+            CREATE INDEX IF NOT EXISTS tweet_images_sha256 ON tweet_images (sha256);
+            CREATE TABLE IF NOT EXISTS image_urls (
+                url TEXT NOT NULL,
+                max_bytes INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                ext TEXT NOT NULL,
+                PRIMARY KEY (url, max_bytes)
+            );
+        """)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _blob_path(self, sha256, filename):
+        return os.path.join(self.image_dir, sha256 + os.path.splitext(filename)[1])
+
+    def restore(self, tweet_id, url, output_dir):
+        """
+        Returns a tweet_data dict for a fresh cache hit, with its images
+        hard-linked (or copied) into output_dir, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, scraped_at FROM tweets WHERE tweet_id = ?", (tweet_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            text, scraped_at = row
+            if now - scraped_at > self.ttl:
+                self._delete(tweet_id)
+                self._conn.commit()
+                return None
+            images = self._conn.execute(
+                "SELECT filename, sha256 FROM tweet_images WHERE tweet_id = ? ORDER BY position", (tweet_id,)
+            ).fetchall()
+            blobs = [(filename, self._blob_path(sha256, filename)) for filename, sha256 in images]
+            if any(not os.path.exists(blob) for _, blob in blobs):
+                # Image files were removed behind our back; re-scrape
+                self._delete(tweet_id)
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE tweets SET accessed_at = ? WHERE tweet_id = ?", (now, tweet_id))
+            self._conn.commit()
+
+        os.makedirs(output_dir, exist_ok=True)
+        tweet_data = {"url": url, "text": text, "images": [], "image_urls": []}
+        for filename, blob in blobs:
+            local_path = os.path.join(output_dir, filename)
+            link_or_copy(blob, local_path)
+            tweet_data["images"].append(local_path)
+        return tweet_data
+
+    def image_for_url(self, url, max_bytes=None):
+        """
+        Returns the cached image file downloaded from url (shrunk to the same
+        max_bytes budget), or None. Lets tweets in later issues that attach
+        the same image skip the download.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256, ext FROM image_urls WHERE url = ? AND max_bytes = ?", (url, max_bytes or 0)
+            ).fetchone()
+            if row is None:
+                return None
+            blob = os.path.join(self.image_dir, row[0] + row[1])
+            if not os.path.exists(blob):
+                # Evicted with the last tweet that used it
+                self._conn.execute("DELETE FROM image_urls WHERE url = ? AND max_bytes = ?", (url, max_bytes or 0))
+                self._conn.commit()
+                return None
+            return blob
+
+    def remember_image_url(self, url, max_bytes, sha256, ext):
+        """Records which image content url produced; the blob itself is stored by put()."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO image_urls (url, max_bytes, sha256, ext) VALUES (?, ?, ?, ?)",
+                (url, max_bytes or 0, sha256, ext)
+            )
+            self._conn.commit()
+
+    def put(self, tweet_id, tweet_data):
+        """Stores a scraped tweet and copies its downloaded images into the cache."""
+        now = time.time()
+        images = []
+        for local_path in tweet_data.get("images") or []:
+            filename = os.path.basename(local_path)
+            sha256 = file_sha256(local_path)
+            blob = self._blob_path(sha256, filename)
+            if not os.path.exists(blob):
+                link_or_copy(local_path, blob)
+            images.append((filename, sha256, os.path.getsize(blob)))
+
+        with self._lock:
+            self._delete(tweet_id)
+            self._conn.execute(
+                "INSERT INTO tweets (tweet_id, url, text, scraped_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (tweet_id, tweet_data["url"], tweet_data["text"], now, now)
+            )
+            self._conn.executemany(
+                "INSERT INTO tweet_images (tweet_id, position, filename, sha256, size) VALUES (?, ?, ?, ?, ?)",
+                [(tweet_id, position, filename, sha256, size) for position, (filename, sha256, size) in enumerate(images)]
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _delete(self, tweet_id):
+        """Drops a tweet and any image blobs no other tweet references. Caller holds the lock."""
+        images = self._conn.execute(
+            "SELECT filename, sha256 FROM tweet_images WHERE tweet_id = ?", (tweet_id,)
+        ).fetchall()
+        self._conn.execute("DELETE FROM tweet_images WHERE tweet_id = ?", (tweet_id,))
+        self._conn.execute("DELETE FROM tweets WHERE tweet_id = ?", (tweet_id,))
+        for filename, sha256 in images:
+            still_used = self._conn.execute(
+                "SELECT 1 FROM tweet_images WHERE sha256 = ? LIMIT 1", (sha256,)
+            ).fetchone()
+            if not still_used:
+                blob = self._blob_path(sha256, filename)
+                if os.path.exists(blob):
+                    os.remove(blob)
+
+    def _evict(self, now):
+        """Applies TTL expiry, then LRU eviction down to max_bytes. Caller holds the lock."""
+        expired = self._conn.execute(
+            "SELECT tweet_id FROM tweets WHERE scraped_at < ?", (now - self.ttl,)
+        ).fetchall()
+        for (tweet_id,) in expired:
+            self._delete(tweet_id)
+
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        lru = self._conn.execute("SELECT tweet_id FROM tweets ORDER BY accessed_at").fetchall()
+        for (tweet_id,) in lru:
+            if total <= self.max_bytes:
+                break
+            self._delete(tweet_id)
+            total = self._total_bytes()
+
+    def _total_bytes(self):
+        row = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT sha256, size FROM tweet_images)"
+        ).fetchone()
+        return row[0]
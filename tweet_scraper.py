@@ -8,10 +8,36 @@ import re
 import time # Added for time.sleep
 import requests # Added for downloading images
 import random # Added for exponential backoff
+import threading
+import heapq
+import collections
+import math
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from image_downloader import ImageDownloader
+import image_store
+from output_writer import OutputWriter, tweet_markdown_filename
+from tweet_cache import TweetCache, DEFAULT_CACHE_DIR
+import url_utils
+import metrics
+import build_journal
+from rate_limiter import RateLimiter, RateLimited, retry_after_seconds
+from run_budget import RunBudget
 
 # Constants for rate limit handling
 MAX_RETRIES = 5
 INITIAL_WAIT_TIME = 5 # seconds
+PAGE_TIMEOUT = 30 # seconds to wait for a tweet page to render
+
+# Browser-free fast path: the JSON endpoint behind X's embedded tweets.
+# Set TWEET_API_BASE to point it at a local stub server instead.
+TWEET_API_BASE = os.environ.get("TWEET_API_BASE", "https://cdn.syndication.twimg.com")
+HTTP_TIMEOUT = 10 # seconds
+HTTP_POOL_SIZE = 32 # Max pooled keep-alive connections per host
+
+_http_session = None
+_http_session_lock = threading.Lock()
+_rate_limiter = None
 
 
 def read_urls_from_file(filepath):
@@ -25,13 +51,161 @@ def read_urls_from_file(filepath):
     return urls
 
 def filter_tweet_urls(urls):
-    tweet_urls = []
-    for url in urls:
-        if "twitter.com" in url or "x.com" in url:
-            tweet_urls.append(url)
-    return tweet_urls
+    """Returns the distinct Twitter/X status URLs in urls, canonicalized to x.com."""
+    return [url for url in url_utils.dedupe_urls(urls) if url_utils.tweet_id(url)]
+
+def extract_tweet_id(url):
+    """Returns the numeric status ID from a tweet URL, or "unknown_tweet"."""
+    return url_utils.tweet_id(url) or "unknown_tweet"
 
-def setup_driver():
+def get_http_session():
+    """Returns the process-wide requests.Session with a keep-alive connection pool."""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+            _http_session = session
+        return _http_session
+
+def get_rate_limiter():
+    """
+    Returns the process-wide RateLimiter, so rates learned while scraping
+    one issue carry over to the next (e.g. during a backfill).
+    """
+    global _rate_limiter
+    with _http_session_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+        return _rate_limiter
+
+def _syndication_token(tweet_id):
+    """Mirrors the token the embed widget sends: (id / 1e15 * pi) in base 36, without zeros or dots."""
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    value = (int(tweet_id) / 1e15) * math.pi
+    integer, fraction = int(value), value - int(value)
+    token = ""
+    while integer:
+        integer, remainder = divmod(integer, 36)
+        token = digits[remainder] + token
+    for _ in range(11):
+        fraction *= 36
+        digit = int(fraction)
+        token += digits[digit]
+        fraction -= digit
+    return re.sub(r"0+", "", token)
+
+def _clean_api_text(data):
+    """Expands t.co links and drops the trailing media links from an API tweet's text."""
+    text = data.get("text") or ""
+    entities = data.get("entities") or {}
+    for link in entities.get("urls") or []:
+        if link.get("url") and link.get("expanded_url"):
+            text = text.replace(link["url"], link["expanded_url"])
+    for media in (entities.get("media") or []) + (data.get("mediaDetails") or []):
+        if media.get("url"):
+            text = text.replace(media["url"], "")
+    return text.strip()
+
+def fetch_tweet_via_http(url, session=None, limiter=None, budget=None):
+    """
+    Fetches a tweet from the JSON embed endpoint without a browser.
+    Returns a tweet_data dict like scrape_tweet, or None if the endpoint
+    could not provide the tweet and the caller should fall back to Selenium.
+    The caller reserves the request slot (see RateLimiter.reserve); with a
+    RateLimiter, the endpoint's responses are fed back into it, and a 429
+    raises RateLimited so the caller can retry later. Given a RunBudget,
+    the request is cut to the time left for url.
+    """
+    tweet_id = extract_tweet_id(url)
+    if tweet_id == "unknown_tweet":
+        return None
+
+    session = session or get_http_session()
+    api_url = f"{TWEET_API_BASE.rstrip('/')}/tweet-result"
+    try:
+        with metrics.span("tweet.fast_path"):
+            response = session.get(
+                api_url,
+                params={"id": tweet_id, "lang": "en", "token": _syndication_token(tweet_id)},
+                timeout=budget.timeout(HTTP_TIMEOUT, url) if budget else HTTP_TIMEOUT,
+            )
+        if response.status_code == 429:
+            retry_after = retry_after_seconds(response.headers)
+            if limiter:
+                limiter.throttled(api_url, retry_after)
+            metrics.incr("tweet.fast_path_http_429")
+            raise RateLimited(f"Fast path rate limited for {url}", retry_after)
+        if limiter:
+            limiter.success(api_url)
+        if response.status_code != 200:
+            print(f"Fast path unavailable for {url} (HTTP {response.status_code}).")
+            metrics.incr(f"tweet.fast_path_http_{response.status_code}")
+            return None
+        data = response.json()
+    except requests.exceptions.Timeout as e:
+        print(f"Fast path timed out for {url}: {e}")
+        metrics.incr("tweet.fast_path_errors")
+        if limiter:
+            limiter.timed_out(api_url)
+        return None
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Fast path failed for {url}: {e}")
+        metrics.incr("tweet.fast_path_errors")
+        return None
+
+    if not isinstance(data, dict) or data.get("__typename") == "TweetTombstone":
+        return None
+
+    photo_urls = [m.get("media_url_https") for m in data.get("mediaDetails") or [] if m.get("type") == "photo"]
+    if not photo_urls:
+        photo_urls = [p.get("url") for p in data.get("photos") or []]
+    tweet_data = {
+        "url": url,
+        "text": _clean_api_text(data) or "N/A",
+        "images": [],
+        "image_urls": [u for u in photo_urls if u]
+    }
+
+    if tweet_data["text"] == "N/A" and not tweet_data["image_urls"]:
+        return None
+    return tweet_data
+
+# Requests a lean browser never makes: media bytes (only the image URLs are
+# read from the DOM; the download stage fetches them), video, fonts, and
+# analytics/ads. The JavaScript bundles on abs.twimg.com are needed.
+BLOCKED_URL_PATTERNS = [
+    "*pbs.twimg.com/media/*", "*pbs.twimg.com/profile_images/*", "*pbs.twimg.com/profile_banners/*",
+    "*pbs.twimg.com/card_img/*", "*pbs.twimg.com/ext_tw_video_thumb/*", "*pbs.twimg.com/amplify_video_thumb/*",
+    "*video.twimg.com/*", "*.mp4", "*.m3u8", "*.m4s", "*.webm",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*google-analytics.com/*", "*googletagmanager.com/*", "*doubleclick.net/*", "*ads-twitter.com/*",
+    "*ads-api.twitter.com/*", "*ads-api.x.com/*", "*/i/api/1.1/jot/*", "*/1.1/jot/*",
+]
+
+def enable_resource_blocking(driver):
+    """
+    Makes Chrome drop BLOCKED_URL_PATTERNS requests in the current tab
+    through CDP network interception. Returns False if the driver has no
+    CDP support, in which case pages load in full.
+    """
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+        return True
+    except (WebDriverException, AttributeError) as e:
+        print(f"Resource blocking unavailable, loading pages in full: {e}")
+        return False
+
+def setup_driver(lean=True):
+    """
+    Starts headless Chrome. In lean mode pages count as loaded once their
+    DOM is ready and BLOCKED_URL_PATTERNS are never fetched.
+    Returns None if ChromeDriver cannot be started.
+    """
     options = webdriver.ChromeOptions()
     options.add_argument('--headless=new')  # Run in headless mode, 'new' is preferred for modern Chrome
     options.add_argument('--no-sandbox')
@@ -46,34 +220,91 @@ def setup_driver():
     options.add_argument('--disable-setuid-sandbox') # Often paired with --no-sandbox
     options.add_argument('--disable-browser-side-navigation') # May help with certain navigation issues
     options.add_argument('--disable-features=VizDisplayCompositor') # Experimental, can improve stability
+    if lean:
+        options.page_load_strategy = 'eager' # scrape_tweet waits for the tweet itself
+        options.add_argument('--mute-audio')
+        options.add_argument('--autoplay-policy=user-gesture-required') # Don't start videos
     try:
         # Attempt to use a pre-installed ChromeDriver or one found in PATH
-        driver = webdriver.Chrome(options=options)
+        with metrics.span("driver.setup"):
+            driver = webdriver.Chrome(options=options)
+        metrics.incr("driver.starts")
+        if lean:
+            enable_resource_blocking(driver)
         return driver
     except WebDriverException as e:
+        metrics.incr("driver.setup_failures")
         print(f"WebDriver error: {e}")
         print("Please ensure ChromeDriver is installed and available in your system's PATH.")
         print("You can download it from: https://chromedriver.chromium.org/downloads")
         return None
 
-def scrape_tweet(driver, url):
+# Reads every tweet article on the loaded page in one round trip. Each
+# article is attributed to the status its timestamp links to; quoted tweets
+# inside it have no such link of their own.
+PAGE_TWEETS_SCRIPT = """
+return Array.from(document.querySelectorAll("article[data-testid='tweet']")).map(function (article) {
+    var link = Array.from(article.querySelectorAll("a[href*='/status/']")).find(function (a) {
+        return a.querySelector('time');
+    });
+    var text = article.querySelector("div[data-testid='tweetText']");
+    var images = Array.from(article.querySelectorAll("div[data-testid='tweetPhoto'] img")).map(function (img) {
+        return img.src;
+    });
+    return {href: link ? link.href : null, text: text ? text.innerText : '', images: images};
+});
+"""
+
+def _page_tweets(driver):
+    """Returns {status id: tweet_data} for the tweet articles on the loaded page."""
+    page_tweets = {}
+    for article in driver.execute_script(PAGE_TWEETS_SCRIPT) or []:
+        match = url_utils.TWEET_PATH_RE.match(urlsplit(article.get("href") or "").path)
+        if not match or match.group('id') in page_tweets:
+            continue
+        image_urls = []
+        for src in article.get("images") or []:
+            if src and "media" in src and src not in image_urls:
+                image_urls.append(src)
+        page_tweets[match.group('id')] = {
+            "url": article["href"],
+            "text": (article.get("text") or "").strip() or "N/A",
+            "images": [],
+            "image_urls": image_urls
+        }
+    return page_tweets
+
+def scrape_tweet(driver, url, page_tweets=None, timeout=PAGE_TIMEOUT):
+    """
+    Loads a tweet page and extracts its text and image URLs. Images are not
+    downloaded here; they are handed to the ImageDownloader stage.
+    The tweet is taken from the article linking to its status; if none
+    does, text and images are collected from the whole page instead.
+    Given a page_tweets dict, every tweet on the page (the rest of the
+    conversation) is added to it, keyed by status ID.
+    Waits up to timeout seconds for the tweet to render.
+    Makes a single attempt: TimeoutException and WebDriverException are
+    raised to the caller, which decides whether and when to retry.
+    """
     tweet_data = {
         "url": url,
         "text": "N/A",
-        "images": []
+        "images": [],
+        "image_urls": []
     }
-    
-    retries = 0
-    while retries < MAX_RETRIES:
-        try:
+
+    try:
+        with metrics.span("selenium.page_load"):
             driver.get(url)
-            # Removed time.sleep(5) as it was causing KeyboardInterrupts
+        # Removed time.sleep(5) as it was causing KeyboardInterrupts
 
-            WebDriverWait(driver, 30).until(
+        with metrics.span("selenium.wait"):
+            WebDriverWait(driver, timeout).until(
                 EC.presence_of_element_located((By.XPATH, "//article[@data-testid='tweet']"))
             )
 
-            # Scroll down to ensure content loads
+        # Scroll down to ensure content loads
+        with metrics.span("selenium.scroll"):
             last_height = driver.execute_script("return document.body.scrollHeight")
             for _ in range(3): # Scroll a few times
                 driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
@@ -83,83 +314,75 @@ def scrape_tweet(driver, url):
                     break
                 last_height = new_height
 
-            # Extract tweet text - trying more general XPaths
-            tweet_text = "N/A"
-            try:
-                # Common XPaths for tweet text on Twitter/X
-                text_elements = driver.find_elements(By.XPATH, "//div[@data-testid='tweetText']//span | //div[contains(@data-testid, 'tweet')]//div[contains(@dir, 'auto')]//span")
-                full_text = []
-                for el in text_elements:
-                    text = el.text.strip()
-                    if text and not text.startswith('@') and not text.startswith('#'): # Exclude mentions/hashtags if they are separate spans
-                        full_text.append(text)
-                if full_text:
-                    tweet_text = " ".join(full_text).strip()
-                    tweet_data["text"] = tweet_text
-                else:
-                    print(f"Could not find tweet text for {url} using general XPaths.")
-            except NoSuchElementException:
-                print(f"Could not find tweet text for {url} (NoSuchElementException).")
-            except Exception as e:
-                print(f"Error extracting tweet text for {url}: {e}")
-
-            # Extract image URLs and download them
-            try:
-                image_elements = driver.find_elements(By.XPATH, "//div[@data-testid='tweetPhoto']//img | //div[contains(@data-testid, 'tweet')]//img[contains(@src, 'media')]")
-                tweet_id_match = re.search(r'status/(\d+)', url)
-                tweet_id = tweet_id_match.group(1) if tweet_id_match else "unknown_tweet"
-                
-                for i, img in enumerate(image_elements):
-                    img_src = img.get_attribute('src')
-                    if img_src and "media" in img_src: # Ensure it's a media image
-                        local_path = download_image(img_src, tweet_id, i)
-                        if local_path:
-                            tweet_data["images"].append(local_path)
-                if not tweet_data["images"]:
-                    print(f"No images found for {url} using general XPaths.")
-            except NoSuchElementException:
-                print(f"No images found for {url} (NoSuchElementException).")
-            except Exception as e:
-                print(f"Error extracting images for {url}: {e}")
-
-            if tweet_data["text"] == "N/A" and not tweet_data["images"]:
-                print(f"Warning: No tweet content (text or images) found for {url}. This might indicate a scraping issue or a non-tweet page.")
-
-        except (TimeoutException, WebDriverException) as e:
-            retries += 1
-            wait_time = INITIAL_WAIT_TIME * (2 ** (retries - 1)) + random.uniform(0, 2)
-            print(f"Rate limit or WebDriver error while scraping {url}: {e}. Retrying in {wait_time:.2f} seconds (Attempt {retries}/{MAX_RETRIES}).")
-            time.sleep(wait_time)
-            if retries == MAX_RETRIES:
-                print(f"Max retries reached for {url}. Skipping.")
-                return tweet_data # Return current data, likely "N/A"
+        with metrics.span("selenium.extract"):
+            found = _page_tweets(driver)
+        metrics.incr("selenium.page_tweets", len(found))
+        if page_tweets is not None:
+            page_tweets.update(found)
+        own = found.get(extract_tweet_id(url))
+        if own and (own["text"] != "N/A" or own["image_urls"]):
+            return dict(own, url=url)
+        metrics.incr("selenium.unattributed")
+
+        # Extract tweet text - trying more general XPaths
+        tweet_text = "N/A"
+        try:
+            # Common XPaths for tweet text on Twitter/X
+            text_elements = driver.find_elements(By.XPATH, "//div[@data-testid='tweetText']//span | //div[contains(@data-testid, 'tweet')]//div[contains(@dir, 'auto')]//span")
+            full_text = []
+            for el in text_elements:
+                text = el.text.strip()
+                if text and not text.startswith('@') and not text.startswith('#'): # Exclude mentions/hashtags if they are separate spans
+                    full_text.append(text)
+            if full_text:
+                tweet_text = " ".join(full_text).strip()
+                tweet_data["text"] = tweet_text
+            else:
+                print(f"Could not find tweet text for {url} using general XPaths.")
+        except NoSuchElementException:
+            print(f"Could not find tweet text for {url} (NoSuchElementException).")
         except Exception as e:
-            print(f"An unexpected error occurred while scraping {url}: {e}")
-            return tweet_data # Return current data for other unexpected errors
-        else:
-            break # Break out of retry loop if successful
+            print(f"Error extracting tweet text for {url}: {e}")
+
+        # Extract image URLs; downloading happens in the separate download stage
+        try:
+            image_elements = driver.find_elements(By.XPATH, "//div[@data-testid='tweetPhoto']//img | //div[contains(@data-testid, 'tweet')]//img[contains(@src, 'media')]")
+            for img in image_elements:
+                img_src = img.get_attribute('src')
+                if img_src and "media" in img_src and img_src not in tweet_data["image_urls"]: # Ensure it's a media image
+                    tweet_data["image_urls"].append(img_src)
+            if not tweet_data["image_urls"]:
+                print(f"No images found for {url} using general XPaths.")
+        except NoSuchElementException:
+            print(f"No images found for {url} (NoSuchElementException).")
+        except Exception as e:
+            print(f"Error extracting images for {url}: {e}")
+
+        if tweet_data["text"] == "N/A" and not tweet_data["image_urls"]:
+            print(f"Warning: No tweet content (text or images) found for {url}. This might indicate a scraping issue or a non-tweet page.")
+    except WebDriverException:
+        raise # Includes TimeoutException; retried by the caller
+    except Exception as e:
+        print(f"An unexpected error occurred while scraping {url}: {e}")
+        metrics.incr("selenium.unexpected_errors")
     return tweet_data
 
-def download_image(image_url, tweet_id, image_index, output_dir="tweet_markdowns"):
-    """Downloads an image from a URL and returns its local path."""
-    
+def download_image(image_url, output_dir="tweet_markdowns", variant=None, max_bytes=None):
+    """
+    Downloads an image into output_dir under its content-addressed name and
+    returns its local path. Blocking helper for one-off use; the scraping
+    pipeline uses ImageDownloader.
+    """
+    image_url = image_store.apply_variant(image_url, variant)
     retries = 0
     while retries < MAX_RETRIES:
         try:
-            response = requests.get(image_url, stream=True)
+            response = get_http_session().get(image_url, timeout=HTTP_TIMEOUT)
             response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
 
-            # Extract file extension from URL or default to .jpg
-            file_extension = os.path.splitext(image_url.split('?')[0])[1]
-            if not file_extension:
-                file_extension = ".jpg" # Default if no extension found
-
-            image_filename = f"{tweet_id}_image_{image_index}{file_extension}"
-            local_image_path = os.path.join(output_dir, image_filename)
-
-            with open(local_image_path, 'wb') as out_file:
-                for chunk in response.iter_content(chunk_size=8192):
-                    out_file.write(chunk)
+            ext = image_store.image_extension(image_url, response.headers.get("Content-Type"))
+            data, ext = image_store.shrink_to_budget(response.content, ext, max_bytes)
+            local_image_path, _ = image_store.store_bytes(data, ext, output_dir)
             print(f"Downloaded image: {local_image_path}")
             return local_image_path
         except requests.exceptions.RequestException as e:
@@ -167,12 +390,8 @@ def download_image(image_url, tweet_id, image_index, output_dir="tweet_markdowns
             wait_time = INITIAL_WAIT_TIME * (2 ** (retries - 1)) + random.uniform(0, 2)
             print(f"Error downloading image {image_url}: {e}. Retrying in {wait_time:.2f} seconds (Attempt {retries}/{MAX_RETRIES}).")
             time.sleep(wait_time)
-            if retries == MAX_RETRIES:
-                print(f"Max retries reached for image {image_url}. Skipping.")
-                return None
-        else:
-            break # Break out of retry loop if successful
-    return local_image_path if retries < MAX_RETRIES else None
+    print(f"Max retries reached for image {image_url}. Skipping.")
+    return None
 
 def format_tweet_as_markdown(tweet_data):
     markdown_content = f"## Original Tweet URL: {tweet_data['url']}\n\n"
@@ -187,83 +406,770 @@ def format_tweet_as_markdown(tweet_data):
     markdown_content += "---\n\n" # Separator for tweets
     return markdown_content
 
-# Constant for driver rotation
-SCRAPE_BATCH_SIZE = 20 # Restart driver after this many scrapes
+# Browser recycling: a worker keeps its Chrome and tab for as long as their
+# memory stays in check, instead of restarting after a fixed number of scrapes
+MEMORY_CHECK_INTERVAL = 5 # Pages between memory measurements
+TAB_RECYCLE_GROWTH = 150 * 1024 * 1024 # Growth in bytes that gets the tab replaced by a fresh one
+BROWSER_RECYCLE_GROWTH = 400 * 1024 * 1024 # Growth in bytes that gets Chrome restarted
+MAX_PAGES_PER_BROWSER = 500 # Restart regardless, in case memory cannot be measured
+
+def _process_tree_rss(pid):
+    """
+    Resident memory in bytes of pid and all its descendants (ChromeDriver,
+    Chrome and its renderers), read from /proc. None where /proc is unavailable.
+    """
+    try:
+        parents = {}
+        for entry in os.listdir('/proc'):
+            if entry.isdigit():
+                try:
+                    with open(f'/proc/{entry}/stat', 'rb') as f:
+                        stat = f.read()
+                except OSError:
+                    continue
+                # The command name may contain spaces; the fields after it do not
+                parents[int(entry)] = int(stat[stat.rfind(b')') + 2:].split()[1])
+        tree, frontier = {pid}, [pid]
+        while frontier:
+            parent = frontier.pop()
+            children = [p for p, pp in parents.items() if pp == parent and p not in tree]
+            tree.update(children)
+            frontier.extend(children)
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        total = 0
+        for p in tree:
+            try:
+                with open(f'/proc/{p}/statm') as f:
+                    total += int(f.read().split()[1]) * page_size
+            except (OSError, ValueError, IndexError):
+                continue
+        return total
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def browser_memory(driver):
+    """
+    Memory used by driver's browser in bytes: the RSS of its whole process
+    tree where /proc is available, else the current page's JS heap.
+    None if neither can be measured.
+    """
+    service = getattr(driver, 'service', None)
+    process = getattr(service, 'process', None)
+    if process is not None:
+        rss = _process_tree_rss(process.pid)
+        if rss:
+            return rss
+    try:
+        page_metrics = driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]
+        return int(next(m["value"] for m in page_metrics if m["name"] == "JSHeapTotalSize"))
+    except (WebDriverException, AttributeError, KeyError, StopIteration, TypeError):
+        return None
+
+class BrowserSession:
+    """
+    One worker's Chrome, started on first use and kept warm across tweets.
+    Every MEMORY_CHECK_INTERVAL pages its memory is compared with the
+    footprint it had when fresh: moderate growth swaps the tab for a new
+    one (cheap, frees the renderer), larger growth or MAX_PAGES_PER_BROWSER
+    pages restart Chrome.
+    """
+    def __init__(self, lean=True, prefix=""):
+        self.lean = lean
+        self.prefix = prefix
+        self.driver = None
+        self.pages = 0
+        self._baseline = None
+
+    def get(self):
+        """Returns a ready driver, starting Chrome if needed, or None if it cannot be started."""
+        if self.driver is None:
+            self.driver = setup_driver(self.lean)
+            self.pages = 0
+            self._baseline = None
+        return self.driver
+
+    def restart(self, reason):
+        print(f"{self.prefix} Restarting ChromeDriver ({reason})...")
+        metrics.incr("driver.restarts")
+        self.quit()
+        return self.get()
+
+    def page_done(self):
+        """Called after each page load; recycles the tab or browser when due."""
+        self.pages += 1
+        if self.pages >= MAX_PAGES_PER_BROWSER:
+            self.restart(f"{self.pages} pages")
+            return
+        if self._baseline is not None and self.pages % MEMORY_CHECK_INTERVAL:
+            return
+        memory = browser_memory(self.driver)
+        if memory is None:
+            return
+        if self._baseline is None:
+            self._baseline = memory
+            return
+        growth = memory - self._baseline
+        if growth > BROWSER_RECYCLE_GROWTH:
+            metrics.incr("driver.memory_recycles")
+            self.restart(f"memory grew by {growth // (1024 * 1024)} MB")
+        elif growth > TAB_RECYCLE_GROWTH:
+            # If the growth is not the tab's, the next checks escalate to a restart
+            self._new_tab()
+
+    def _new_tab(self):
+        try:
+            old = self.driver.current_window_handle
+            self.driver.switch_to.new_window('tab')
+            new = self.driver.current_window_handle
+            self.driver.switch_to.window(old)
+            self.driver.close()
+            self.driver.switch_to.window(new)
+            if self.lean:
+                enable_resource_blocking(self.driver) # Blocking is per tab
+            metrics.incr("driver.tab_recycles")
+        except WebDriverException as e:
+            self.restart(f"tab recycle failed: {e}")
+
+    def quit(self):
+        if self.driver:
+            try:
+                self.driver.quit()
+            except WebDriverException:
+                pass
+            self.driver = None
+
+class BrowserPool:
+    """
+    Idle BrowserSessions kept warm between runs of main(), e.g. by the watch
+    daemon, so a build does not pay for starting Chrome. Scrape workers
+    acquire() a session when they start and release() it, Chrome still
+    running, once the queue has drained; close() quits them all.
+    """
+    def __init__(self, lean=True):
+        self.lean = lean
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def warm(self, count):
+        """Starts Chrome in idle sessions until count are running. Returns how many are."""
+        while self.size() < count:
+            browser = BrowserSession(lean=self.lean)
+            if browser.get() is None:
+                break
+            self.release(browser)
+        return self.size()
+
+    def acquire(self, lean=True, prefix=""):
+        """Returns an idle session with the given lean setting, or a new (not yet started) one."""
+        with self._lock:
+            browser = next((b for b in self._idle if b.lean == lean), None)
+            if browser:
+                self._idle.remove(browser)
+        if browser:
+            metrics.incr("driver.warm_reuses")
+        else:
+            browser = BrowserSession(lean=lean)
+        browser.prefix = prefix
+        return browser
+
+    def release(self, browser):
+        """Keeps browser for the next run if its Chrome is still responsive, otherwise quits it."""
+        if browser.driver is None:
+            return
+        try:
+            browser.driver.current_window_handle
+        except WebDriverException:
+            browser.quit()
+            return
+        with self._lock:
+            self._idle.append(browser)
+
+    def size(self):
+        with self._lock:
+            return len(self._idle)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for browser in idle:
+            browser.quit()
+
+# Number of concurrent headless Chrome instances used by main()
+NUM_WORKERS = 1
+CONVERSATION_BATCH_LIMIT = 20 # Most tweets by one author a worker takes off the queue at once
+
+class MarkdownWriter:
+    """
+    Thread-safe sink shared by all scrape workers. Writes each scraped tweet
+    atomically to tweet_<id>.md inside output_dir and, given a BuildJournal,
+    records the tweet as done once its file is in place.
+    """
+    def __init__(self, output_dir="tweet_markdowns", journal=None):
+        self.output_dir = output_dir
+        self.journal = journal
+        self.written = []
+        self._output = OutputWriter(output_dir)
+        self._lock = threading.Lock()
+
+    def path_for(self, url):
+        return self._output.path(tweet_markdown_filename(extract_tweet_id(url)))
+
+    def write(self, tweet_data):
+        markdown_output = format_tweet_as_markdown(tweet_data)
+        name = tweet_markdown_filename(extract_tweet_id(tweet_data['url']))
+
+        with metrics.span("markdown.write"):
+            output_filename = self._output.write_text(name, markdown_output)
+        with self._lock:
+            self.written.append(output_filename)
+        metrics.incr("tweets.written")
+        if self.journal:
+            self.journal.mark(tweet_data['url'], build_journal.DONE)
+        print(f"Generated Markdown: {output_filename}")
+        return output_filename
+
+class _ScrapeQueue:
+    """
+    Work queue shared by the scrape workers. put() can delay an item, so a
+    URL that has to back off waits here while the workers keep going with
+    other URLs. get() returns a batch: the next ready item plus, given a
+    key function, up to batch_limit - 1 other ready items with the same key
+    (e.g. tweets of one conversation), or None once the feeder has finished,
+    nothing is waiting and no worker holds a batch that might still be retried.
+    Given a priority function, the next ready item is the one it ranks lowest
+    rather than the oldest.
+    Once budget has expired, get() returns None and every item queued, now or
+    later, goes to dropped instead of a worker.
+    """
+    def __init__(self, key=None, batch_limit=1, priority=None, budget=None):
+        self._cond = threading.Condition()
+        self._ready = collections.deque()
+        self._delayed = [] # (ready_at, sequence, item)
+        self._sequence = 0
+        self._in_flight = 0
+        self._feeding = True
+        self._key = key
+        self._batch_limit = batch_limit
+        self._priority = priority
+        self._budget = budget
+        self.dropped = []
+
+    def put(self, item, delay=0):
+        with self._cond:
+            if self._budget and self._budget.expired():
+                self.dropped.append(item)
+            elif delay > 0:
+                self._sequence += 1
+                heapq.heappush(self._delayed, (time.monotonic() + delay, self._sequence, item))
+            else:
+                self._ready.append(item)
+            self._cond.notify_all()
+
+    def close(self):
+        """Signals that the feeder has queued every URL."""
+        with self._cond:
+            self._feeding = False
+            self._cond.notify_all()
+
+    def get(self):
+        with self._cond:
+            while True:
+                if self._budget and self._budget.expired():
+                    self.dropped.extend(self._ready)
+                    self.dropped.extend(item for _, _, item in sorted(self._delayed))
+                    self._ready.clear()
+                    self._delayed = []
+                    return None
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    self._ready.append(heapq.heappop(self._delayed)[2])
+                if self._ready:
+                    self._in_flight += 1
+                    return self._take_batch()
+                if not self._feeding and not self._delayed and not self._in_flight:
+                    return None
+                timeouts = [self._delayed[0][0] - now] if self._delayed else []
+                if self._budget and self._budget.remaining() is not None:
+                    timeouts.append(self._budget.remaining())
+                self._cond.wait(min(timeouts) if timeouts else None)
+
+    def _take_batch(self):
+        """Pops the next ready item and the ready items sharing its key. Caller holds _cond."""
+        if self._priority and len(self._ready) > 1:
+            first = min(self._ready, key=self._priority)
+            self._ready.remove(first)
+            self._ready.appendleft(first)
+        batch = [self._ready.popleft()]
+        key = self._key(batch[0]) if self._key else None
+        if key is None:
+            return batch
+        rest = collections.deque()
+        while self._ready:
+            item = self._ready.popleft()
+            if len(batch) < self._batch_limit and self._key(item) == key:
+                batch.append(item)
+            else:
+                rest.append(item)
+        self._ready = rest
+        return batch
+
+    def task_done(self):
+        """Called once per batch returned by get()."""
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def drain(self):
+        """Removes and returns every item still queued, including those waiting to be retried."""
+        with self._cond:
+            items = list(self._ready) + [item for _, _, item in sorted(self._delayed)]
+            self._ready.clear()
+            self._delayed = []
+            return items
+
+def _give_up(url, reason, journal=None, budget=None):
+    if journal:
+        journal.mark(url, build_journal.FAILED)
+    if budget:
+        budget.skip(url, "tweets", reason)
+
+def _retry_later(url_queue, item, reason, prefix, journal=None, delay=None, budget=None, paced=False):
+    """
+    Puts item back on url_queue after delay seconds (an exponential backoff
+    by default), or gives up once it has used MAX_RETRIES attempts or the
+    retry would start after the URL's or the run's deadline in budget.
+    A paced item only waits for its request slot, so it keeps its attempt
+    count.
+    """
+    i, url, attempt = item
+    if paced:
+        metrics.incr("tweet.paced") # Not printed; a busy host turns many URLs away many times
+        url_queue.put(item, delay=delay)
+        return
+    attempt += 1
+    if attempt >= MAX_RETRIES:
+        print(f"{prefix} Max retries reached for {url} ({reason}). Skipping.")
+        metrics.incr("tweet.gave_up")
+        _give_up(url, f"{reason}; gave up after {attempt} attempts", journal, budget)
+        return
+    wait_time = delay if delay is not None else INITIAL_WAIT_TIME * (2 ** (attempt - 1)) + random.uniform(0, 2)
+    if budget and not budget.allows(url, wait_time):
+        print(f"{prefix} {reason} while scraping {url}. No time left to retry it. Skipping.")
+        metrics.incr("tweet.deadline_exceeded")
+        _give_up(url, f"{reason}; deadline reached after {attempt} attempt(s)", journal, budget)
+        return
+    print(f"{prefix} {reason} while scraping {url}. Retrying in {wait_time:.2f} seconds (Attempt {attempt}/{MAX_RETRIES}).")
+    metrics.incr("tweet.retries")
+    url_queue.put((i, url, attempt), delay=wait_time)
+
+class _PageHarvest:
+    """
+    Tweets seen on pages the workers have loaded, keyed by status ID, so a
+    URL whose tweet already appeared in another tweet's conversation is
+    attributed from there instead of being loaded again.
+    """
+    def __init__(self):
+        self._tweets = {}
+        self._lock = threading.Lock()
+
+    def add(self, page_tweets):
+        with self._lock:
+            for tweet_id, tweet_data in page_tweets.items():
+                self._tweets.setdefault(tweet_id, tweet_data)
+
+    def pop(self, url):
+        """Returns the harvested tweet_data for url (with url as its URL), or None."""
+        with self._lock:
+            tweet_data = self._tweets.pop(extract_tweet_id(url), None)
+        if tweet_data is None or (tweet_data["text"] == "N/A" and not tweet_data["image_urls"]):
+            return None
+        return dict(tweet_data, url=url, images=[])
+
+def _conversation_key(page_urls, fast_path=True):
+    """
+    Returns the _ScrapeQueue key function. Tweets waiting for a page load
+    (every tweet, without the fast path) are batched by author, as the
+    tweets of a thread share one and one loaded page shows the whole
+    thread; the fast path exposes no conversation before its request.
+    Tweets still to be tried on the fast path go one at a time, so one
+    prolific author's tweets are spread over the workers.
+    """
+    def key(item):
+        if fast_path and item[1] not in page_urls:
+            return None
+        return url_utils.tweet_author(item[1])
+    return key
+
+def _newest_first(item):
+    tweet_id = extract_tweet_id(item[1])
+    return -int(tweet_id) if tweet_id.isdigit() else 0
 
-def main(urls_to_scrape=None):
+def _scrape_worker(worker_id, url_queue, writer, downloader, total, fast_path=True, cache=None, on_complete=None,
+                   journal=None, limiter=None, lean=True, harvest=None, browser_pool=None, budget=None,
+                   page_urls=None):
+    """
+    Pulls batches of (index, url, attempt) items off url_queue until it
+    returns None, and handles each batch in this order:
+
+    1. Tweets already done in a resumed journal are skipped, and so are
+       tweets started MAX_ATTEMPTS times without finishing. Cached tweets
+       are restored without any network access.
+    2. With fast_path, a tweet not tried yet arrives on its own and goes to
+       the HTTP fast path. If that cannot render it, its URL is added to
+       page_urls and it goes back on the queue, where tweets needing a
+       page load are batched by author, which is how the tweets of one
+       thread arrive together.
+    3. A batch of such tweets is loaded in the browser newest first, since
+       a reply's page shows the thread above it. Every tweet on a loaded
+       page goes into harvest, so URLs found there (from this batch or any
+       other) need no page load of their own.
+
+    The worker's BrowserSession (kept warm and recycled by memory use) is
+    only started once a URL needs a page load; given a browser_pool, it is
+    taken from the pool and handed back warm at the end. If Chrome cannot
+    be started, only the URLs that need the browser are given up.
+
+    Requests are paced per host by limiter without blocking: a URL whose
+    host has no request slot open, or that is rate limited or times out,
+    goes back on the queue with a delay instead of holding up the worker.
+    Image downloads and the markdown write are handed to the downloader,
+    so the worker never waits on media I/O. With a budget, page waits are
+    cut to the time left for the URL, a URL past its deadline is given
+    up, and once the run budget has expired the rest of the batch goes
+    back to url_queue, which drops it.
+    """
+    prefix = f"[worker {worker_id}]"
+    budget = budget or RunBudget()
+    browser = browser_pool.acquire(lean, prefix) if browser_pool else BrowserSession(lean=lean, prefix=prefix)
+    harvest = harvest if harvest is not None else _PageHarvest()
+    page_urls = page_urls if page_urls is not None else set()
+    browser_unavailable = False # Set once Chrome fails to start; the worker then only serves the fast path
+
+    def finish(url, tweet_data):
+        if tweet_data and (tweet_data["text"] != "N/A" or tweet_data["image_urls"]): # Only save if some content was scraped
+            # The markdown is finalized once the tweet's images have landed
+            downloader.submit(tweet_data, extract_tweet_id(url), writer.output_dir, on_complete or writer.write)
+        else:
+            print(f"{prefix} Skipping Markdown creation for {url} due to no content scraped.")
+            metrics.incr("tweets.empty")
+            _give_up(url, "no content scraped", journal, budget)
+
+    def past_deadline(url):
+        if not budget.expired(url):
+            return False
+        print(f"{prefix} Deadline reached for {url}. Skipping.")
+        metrics.incr("tweet.deadline_exceeded")
+        _give_up(url, "deadline reached", journal, budget)
+        return True
+
+    def paced(item, request_url):
+        """
+        Takes limiter's slot for request_url on behalf of item's tweet.
+        Returns False if no slot is open yet, in which case item is back on
+        url_queue until one is (or given up if that is too late).
+        """
+        if not limiter:
+            return True
+        url = item[1]
+        delay = limiter.acquire(request_url)
+        if not delay:
+            return True
+        max_delay = budget.remaining(url)
+        if max_delay is not None and delay >= max_delay:
+            out_of_time(url)
+            return False
+        _retry_later(url_queue, item, f"Waiting for a {urlsplit(request_url).hostname} request slot", prefix,
+                     journal, delay, budget, paced=True)
+        return False
+
+    def out_of_time(url):
+        """Gives up on a URL whose next request slot opens after its deadline or the run's."""
+        url_left = budget.remaining(url)
+        run_left = budget.remaining()
+        if run_left is not None and run_left <= url_left:
+            reason = "run budget spent before a request slot opened"
+        else:
+            reason = "deadline reached before a request slot opened"
+        print(f"{prefix} No time left to scrape {url}. Skipping.")
+        metrics.incr("tweet.deadline_exceeded")
+        _give_up(url, reason, journal, budget)
+
+    try:
+        while True:
+            batch = url_queue.get()
+            if batch is None:
+                break
+            try:
+                if len(batch) > 1:
+                    metrics.incr("tweet.batched", len(batch))
+                needs_browser = []
+                for item in batch:
+                    if budget.expired():
+                        url_queue.put(item)
+                        continue
+                    i, url, attempt = item
+                    tweet_id = extract_tweet_id(url)
+
+                    if attempt == 0 and not budget.attempted(url): # Not back from waiting for a request slot
+                        if journal:
+                            state = journal.state(url)
+                            if state == build_journal.DONE and os.path.exists(writer.path_for(url)):
+                                print(f"{prefix} Already done ({i+1}/{total}): {url}")
+                                metrics.incr("journal.skipped_done")
+                                continue
+                            if state != build_journal.DONE and journal.attempts(url) >= build_journal.MAX_ATTEMPTS:
+                                print(f"{prefix} Giving up on {url} after {journal.attempts(url)} attempts.")
+                                metrics.incr("journal.skipped_failed")
+                                _give_up(url, f"gave up after {journal.attempts(url)} attempts in earlier runs",
+                                         journal, budget)
+                                continue
+                            journal.mark(url, build_journal.PENDING)
+
+                        if cache and tweet_id != "unknown_tweet":
+                            with metrics.span("tweet_cache.restore"):
+                                cached = cache.restore(tweet_id, url, writer.output_dir)
+                            if cached:
+                                print(f"{prefix} Cache hit ({i+1}/{total}): {url}")
+                                metrics.incr("tweet_cache.hits")
+                                writer.write(cached)
+                                continue
+                            metrics.incr("tweet_cache.misses")
+
+                        budget.attempt(url)
+                        print(f"{prefix} Scraping ({i+1}/{total}): {url}")
+                    elif past_deadline(url):
+                        continue
+                    elif attempt:
+                        print(f"{prefix} Retrying ({i+1}/{total}, attempt {attempt + 1}): {url}")
+
+                    tweet_data = None
+                    if fast_path and url not in page_urls:
+                        if not paced(item, TWEET_API_BASE):
+                            continue
+                        try:
+                            tweet_data = fetch_tweet_via_http(url, limiter=limiter, budget=budget)
+                        except RateLimited as e:
+                            if attempt + 1 < MAX_RETRIES:
+                                # The limiter has already slowed the endpoint down and paces the retry
+                                _retry_later(url_queue, item, "Fast path rate limited", prefix, journal,
+                                             e.retry_after if e.retry_after is not None else 0, budget)
+                                continue
+                            # Out of fast-path retries; let the browser have a go
+                        metrics.incr("tweet.fast_path_hits" if tweet_data else "tweet.fast_path_misses")
+                        if tweet_data is None:
+                            # Back on the queue, to be batched with the author's other tweets waiting for a page
+                            page_urls.add(url)
+                            url_queue.put(item)
+                            continue
+                    if tweet_data is None:
+                        needs_browser.append(item)
+                    else:
+                        finish(url, tweet_data)
+
+                needs_browser.sort(key=_newest_first)
+                while needs_browser:
+                    item = needs_browser.pop(0)
+                    i, url, attempt = item
+                    tweet_data = harvest.pop(url)
+                    if tweet_data:
+                        print(f"{prefix} Found in an already loaded conversation ({i+1}/{total}): {url}")
+                        metrics.incr("tweet.conversation_hits")
+                        finish(url, tweet_data)
+                        continue
+                    if budget.expired():
+                        url_queue.put(item)
+                        continue
+                    if past_deadline(url):
+                        continue
+
+                    driver = None if browser_unavailable else browser.get()
+                    if not driver:
+                        if not browser_unavailable:
+                            print(f"{prefix} Failed to set up ChromeDriver. Only the fast path is used from now on.")
+                            browser_unavailable = True
+                        print(f"{prefix} No browser to scrape {url}. Skipping.")
+                        metrics.incr("tweet.browser_unavailable")
+                        _give_up(url, "browser unavailable", journal, budget)
+                        continue
+
+                    if not paced(item, url):
+                        continue
+                    page_tweets = {}
+                    try:
+                        with metrics.span("tweet.scrape"):
+                            tweet_data = scrape_tweet(driver, url, page_tweets, budget.timeout(PAGE_TIMEOUT, url))
+                        if limiter:
+                            limiter.success(url)
+                    except TimeoutException as e:
+                        metrics.incr("selenium.timeouts")
+                        try:
+                            rate_limited = "rate limit" in driver.page_source.lower()
+                        except WebDriverException:
+                            rate_limited = False
+                        if limiter:
+                            if rate_limited:
+                                limiter.throttled(url)
+                            else:
+                                limiter.timed_out(url)
+                        _retry_later(url_queue, item, "Rate limit" if rate_limited else f"Timeout ({e.msg or 'page did not load'})",
+                                     prefix, journal, budget=budget)
+                        continue
+                    except WebDriverException as e:
+                        print(f"{prefix} Fatal WebDriver error during scrape of {url}: {e}. Attempting driver restart.")
+                        metrics.incr("selenium.webdriver_errors")
+                        if not browser.restart("WebDriver error"):
+                            print(f"{prefix} Failed to set up ChromeDriver after error. Only the fast path is used "
+                                  f"from now on.")
+                            browser_unavailable = True
+                        _retry_later(url_queue, item, "WebDriver error", prefix, journal, budget=budget)
+                        continue
+                    browser.page_done()
+                    page_tweets.pop(extract_tweet_id(url), None)
+                    harvest.add(page_tweets)
+                    finish(url, tweet_data)
+            finally:
+                url_queue.task_done()
+    finally:
+        if browser_pool:
+            browser_pool.release(browser)
+        else:
+            browser.quit()
+
+def main(urls_to_scrape=None, num_workers=NUM_WORKERS, output_dir="tweet_markdowns", fast_path=True,
+         cache_dir=DEFAULT_CACHE_DIR, journal=None, lean=True, image_variant=None, image_max_bytes=None,
+         browser_pool=None, budget=None, link_counts=None):
     """
     Main function to orchestrate tweet scraping.
     Args:
-        urls_to_scrape (list, optional): A list of Twitter/X URLs to scrape.
-                                         If None, URLs are read from 'ai_news_links.txt'.
+        urls_to_scrape (iterable, optional): Twitter/X URLs to scrape. May be a
+                                             generator; workers start on the first URL
+                                             while it is still producing.
+                                             If None, URLs are read from 'ai_news_links.txt'.
+        num_workers (int): Number of concurrent ChromeDriver instances.
+        output_dir (str): Directory the tweet markdowns and images are written to.
+        fast_path (bool): Try the browser-free HTTP endpoint before Selenium.
+        cache_dir (str, optional): Directory of the persistent tweet cache.
+                                   Pass None to disable caching.
+        journal (BuildJournal, optional): Progress journal updated as tweets finish.
+                                          If it was resumed, finished tweets and
+                                          images already in output_dir are kept.
+        lean (bool): Block media, fonts and trackers in the browsers (see BLOCKED_URL_PATTERNS).
+        image_variant (str, optional): Size requested for X-hosted images, one of
+                                       image_store.VARIANTS. None keeps the scraped URL.
+        image_max_bytes (int, optional): Re-encode images larger than this (needs Pillow).
+        browser_pool (BrowserPool, optional): Warm browsers to use and keep running
+                                              after the run, instead of starting and
+                                              quitting Chrome in every worker.
+        budget (RunBudget, optional): Run budget and per-URL deadlines. Once the run
+                                      budget expires no new URL is started, and the
+                                      URLs left over are recorded as skipped in it,
+                                      along with every URL that could not be scraped.
+        link_counts (dict, optional): Times each tweet is linked in the issue, by
+                                      url_utils.dedup_key; may still be filling up
+                                      while the URLs stream in. Tweets linked more
+                                      often are scraped first, then earlier ones.
+    Returns the URLs that were never scraped because every worker stopped.
+    They are marked failed in journal, so a resumed build scrapes them, and
+    recorded as skipped in budget.
     """
-    if urls_to_scrape:
+    if urls_to_scrape is not None:
         tweet_urls = urls_to_scrape
     else:
         urls = read_urls_from_file('ai_news_links.txt')
         if not urls:
             print("No URLs found in 'ai_news_links.txt'.")
-            return
+            return []
 
         tweet_urls = filter_tweet_urls(urls)
         if not tweet_urls:
             print("No Twitter/X URLs found in the provided file or list.")
-            return
+            return []
+
+    # Generators are consumed while the workers run, so their size is unknown up front
+    total = len(tweet_urls) if hasattr(tweet_urls, "__len__") else "?"
+    if total != "?":
+        num_workers = min(num_workers, total)
+    num_workers = max(1, num_workers)
+    writer = MarkdownWriter(output_dir, journal)
+    limiter = get_rate_limiter()
+    cache = TweetCache(cache_dir) if cache_dir else None
+    downloader = ImageDownloader(session=get_http_session(), reuse_existing=bool(journal and journal.resumed),
+                                 rate_limiter=limiter, variant=image_variant, max_bytes=image_max_bytes,
+                                 store=cache, budget=budget)
+
+    def on_complete(tweet_data):
+        writer.write(tweet_data)
+        # A tweet missing images is scraped again next time rather than cached without them
+        if cache and not tweet_data.get("images_missing"):
+            cache.put(extract_tweet_id(tweet_data['url']), tweet_data)
+
+    budget = budget or RunBudget()
+    link_counts = link_counts if link_counts is not None else {}
+    dedup_keys = {}
+
+    def priority(item):
+        i, url, attempt = item
+        key = dedup_keys.get(url)
+        if key is None:
+            key = dedup_keys[url] = url_utils.dedup_key(url)
+        return -link_counts.get(key, 1), i
 
-    driver = None
-    scrape_counter = 0
+    page_urls = set() # Tweets the fast path could not serve; they wait for a page load
+    url_queue = _ScrapeQueue(key=_conversation_key(page_urls, fast_path), batch_limit=CONVERSATION_BATCH_LIMIT,
+                             priority=priority, budget=budget)
+    harvest = _PageHarvest()
+    feed_errors = []
 
+    def feed():
+        try:
+            for i, url in enumerate(tweet_urls):
+                url_queue.put((i, url, 0))
+        except Exception as e:
+            feed_errors.append(e)
+        finally:
+            url_queue.close() # Workers stop once the queue has drained
+
+    print(f"Scraping {total} tweets with {num_workers} worker(s)...")
+    feeder = threading.Thread(target=feed, name="tweet-scraper-feeder", daemon=True)
+    workers = [
+        threading.Thread(
+            target=_scrape_worker,
+            args=(worker_id, url_queue, writer, downloader, total, fast_path, cache, on_complete, journal, limiter,
+                  lean, harvest, browser_pool, budget, page_urls),
+            name=f"tweet-scraper-{worker_id}",
+            daemon=True,
+        )
+        for worker_id in range(num_workers)
+    ]
     try:
-        for i, url in enumerate(tweet_urls):
-            # Driver rotation logic
-            if driver is None or scrape_counter >= SCRAPE_BATCH_SIZE:
-                if driver:
-                    print(f"Restarting ChromeDriver after {scrape_counter} scrapes...")
-                    driver.quit()
-                driver = setup_driver()
-                if not driver:
-                    print("Failed to set up ChromeDriver. Exiting.")
-                    return
-                scrape_counter = 0 # Reset counter after driver restart
-
-            print(f"Scraping ({i+1}/{len(tweet_urls)}): {url}")
-            
-            tweet_data = None
-            try:
-                tweet_data = scrape_tweet(driver, url)
-            except WebDriverException as e:
-                print(f"Fatal WebDriver error during scrape of {url}: {e}. Attempting driver restart.")
-                if driver:
-                    driver.quit()
-                driver = setup_driver()
-                if not driver:
-                    print("Failed to set up ChromeDriver after error. Exiting.")
-                    return
-                # Re-attempt scrape with new driver, or just log and continue
-                # For simplicity, we'll just log and continue to the next URL
-                # A more robust solution might re-add the URL to a retry queue
-                tweet_data = {"url": url, "text": "N/A", "images": []} # Mark as failed
-
-            if tweet_data and (tweet_data["text"] != "N/A" or tweet_data["images"]): # Only save if some content was scraped
-                markdown_output = format_tweet_as_markdown(tweet_data)
-                tweet_id_match = re.search(r'status/(\d+)', tweet_data['url'])
-                tweet_id = tweet_id_match.group(1) if tweet_id_match else "unknown_tweet"
-                output_filename = os.path.join("tweet_markdowns", f"tweet_{tweet_id}.md")
-                
-                os.makedirs("tweet_markdowns", exist_ok=True)
-                with open(output_filename, 'w', encoding='utf-8') as f:
-                    f.write(markdown_output)
-                print(f"Generated Markdown: {output_filename}")
-            else:
-                print(f"Skipping Markdown creation for {url} due to no content scraped.")
-            
-            scrape_counter += 1
-            # Add a small delay between tweet scrapes to reduce rate limit issues
-            time.sleep(random.uniform(2, 5)) # Wait between 2 and 5 seconds
+        feeder.start()
+        for worker in workers:
+            worker.start()
+        feeder.join()
+        for worker in workers:
+            worker.join()
+        print("Waiting for image downloads to finish...")
+        downloader.close()
+        if feed_errors:
+            raise feed_errors[0]
+        if url_queue.dropped:
+            print(f"Run budget spent; skipped {len(url_queue.dropped)} URL(s) that were not scraped in time.")
+            metrics.incr("tweet.budget_skipped", len(url_queue.dropped))
+            for i, url, attempt in sorted(url_queue.dropped):
+                _give_up(url, "run budget spent" if attempt == 0 else "run budget spent while retrying",
+                         journal, budget)
+        unscraped = [url for i, url, attempt in sorted(url_queue.drain())]
+        if unscraped:
+            print(f"Warning: {len(unscraped)} URL(s) were never scraped because every worker stopped.")
+            metrics.incr("tweet.unscraped", len(unscraped))
+            for url in unscraped:
+                _give_up(url, "never scraped: every worker stopped", journal, budget)
+        return unscraped
     finally:
-        if driver:
-            driver.quit()
-        print("Scraping complete.")
+        if cache:
+            cache.close()
+        print(f"Scraping complete. Wrote {len(writer.written)} markdown file(s).")
+        print("Request rates (per second): " + ", ".join(f"{host}={rate}" for host, rate in limiter.rates().items()))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,146 @@
+import re
+from urllib.parse import urlsplit, urlunsplit, unquote_plus
+
+# Query parameters that only carry click tracking and never change the page
+TRACKING_PARAMS = frozenset({
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid",
+    "ref_src", "ref_url", "_hsenc", "_hsmi", "mkt_tok", "yclid",
+})
+TRACKING_PREFIXES = ("utm_",)
+
+# Registrable domains (and all their subdomains) mapped to a category
+DOMAIN_CATEGORIES = {
+    "twitter.com": "twitter",
+    "x.com": "twitter",
+    "fxtwitter.com": "twitter",
+    "vxtwitter.com": "twitter",
+    "fixupx.com": "twitter",
+    "discord.com": "discord",
+    "discordapp.com": "discord",
+    "discord.gg": "discord",
+}
+
+TWEET_PATH_RE = re.compile(r'^/(?:(?P<user>[A-Za-z0-9_]{1,15})|i(?:/web)?)/status(?:es)?/(?P<id>\d+)')
+DISCORD_MESSAGE_PATH_RE = re.compile(r'^/channels/(?P<guild>\d+|@me)/(?P<channel>\d+)/(?P<message>\d+)')
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class DomainMatcher:
+    """
+    Suffix-based host classifier. "mobile.twitter.com" matches the
+    "twitter.com" entry, but "notx.com" or "x.com.evil.io" do not match
+    "x.com". Lookups walk the host's labels right to left against a dict
+    built once up front, so each check costs a few hash lookups.
+    """
+    def __init__(self, categories, default="other"):
+        self._categories = {domain.lower().strip('.'): category for domain, category in categories.items()}
+        self.default = default
+
+    def match(self, host):
+        labels = (host or "").lower().rstrip('.').split('.')
+        for i in range(len(labels)):
+            category = self._categories.get('.'.join(labels[i:]))
+            if category:
+                return category
+        return self.default
+
+
+DOMAIN_MATCHER = DomainMatcher(DOMAIN_CATEGORIES)
+
+
+def classify_url(url):
+    """
+    Returns "twitter" for Twitter/X links, "discord" for Discord links and
+    "other" for everything else.
+    """
+    return DOMAIN_MATCHER.match(urlsplit(url.strip()).hostname)
+
+
+def tweet_id(url):
+    """Returns the status ID of a Twitter/X status URL, or None for any other URL."""
+    parts = urlsplit(url.strip())
+    if DOMAIN_MATCHER.match(parts.hostname) != "twitter":
+        return None
+    match = TWEET_PATH_RE.match(parts.path)
+    return match.group('id') if match else None
+
+
+def tweet_author(url):
+    """
+    Returns the lower-cased screen name in a Twitter/X status URL, or None
+    for /i/status/ links and any other URL.
+    """
+    parts = urlsplit(url.strip())
+    if DOMAIN_MATCHER.match(parts.hostname) != "twitter":
+        return None
+    match = TWEET_PATH_RE.match(parts.path)
+    user = match.group('user').lower() if match and match.group('user') else None
+    return None if user == "i" else user # /i/status/ and /i/web/status/ links name no author
+
+
+def discord_message(url):
+    """
+    Returns (guild_id, channel_id, message_id) of a Discord message link
+    (https://discord.com/channels/<guild>/<channel>/<message>), or None for
+    invites, channel links and any other URL. guild_id is "@me" for DMs.
+    """
+    parts = urlsplit(url.strip())
+    if DOMAIN_MATCHER.match(parts.hostname) != "discord":
+        return None
+    match = DISCORD_MESSAGE_PATH_RE.match(parts.path)
+    return (match.group('guild'), match.group('channel'), match.group('message')) if match else None
+
+
+def _is_tracking_param(pair):
+    key = unquote_plus(pair.split('=', 1)[0]).lower()
+    return key in TRACKING_PARAMS or key.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url):
+    """
+    Normalizes a URL so that trivially different spellings compare equal:
+    lower-cased scheme and host, no default port or fragment, tracking
+    query parameters removed. Twitter/X status links on any host variant
+    (twitter.com, mobile.twitter.com, x.com, /i/web/status/...) become
+    https://x.com/<user>/status/<id>.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip('.')
+
+    status = TWEET_PATH_RE.match(parts.path) if DOMAIN_MATCHER.match(host) == "twitter" else None
+    if status:
+        user = status.group('user') or "i"
+        return f"https://x.com/{user}/status/{status.group('id')}"
+
+    netloc = f"[{host}]" if ':' in host else host
+    try:
+        port = parts.port
+    except ValueError: # Malformed port; leave the authority as written
+        port, netloc = None, parts.netloc.lower()
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    if parts.username and '@' not in netloc:
+        netloc = f"{parts.username}{':' + parts.password if parts.password else ''}@{netloc}"
+
+    # Filter the raw key=value pairs so the remaining ones keep their original encoding
+    query = [pair for pair in parts.query.split('&') if pair and not _is_tracking_param(pair)]
+    return urlunsplit((scheme, netloc, parts.path or "/", '&'.join(query), ""))
+
+
+def dedup_key(url):
+    """Key under which two canonical URLs count as the same source."""
+    status_id = tweet_id(url)
+    if status_id:
+        return f"tweet:{status_id}"
+    return canonicalize_url(url)
+
+
+def dedupe_urls(urls):
+    """Generator that canonicalizes urls and yields each distinct one once, in first-seen order."""
+    seen = set()
+    for url in urls:
+        key = dedup_key(url)
+        if key not in seen:
+            seen.add(key)
+            yield canonicalize_url(url)